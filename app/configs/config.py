@@ -1,34 +1,189 @@
 import os
+import atexit
 import logging
-from logging.handlers import RotatingFileHandler
+import multiprocessing
+import queue
+import threading
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
 
+LOG_FORMAT = "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+# The createdAt, updatedAt and ingestedAt timestamps of the stored documents
+TIMESTAMP_FORMAT = "%Y-%m-%dT%H:%M:%S.%f+00:0"
 
-def configure_logging():
+_log_listener = None
+_log_listener_lock = threading.Lock()
+_log_handlers = ()
+# Records of the extraction worker processes, written by the handlers of the parent process
+_worker_log_queue = None
+
+
+class _DeferredFlushMixin:
     """
-    This function is used for configuring the root logger
+    The records are written to the stream without a flush per record, the queue listener flushes
+    the handlers once the queue is drained so a burst of records is flushed in one go
     """
-    # Configure the root logger
-    logging.basicConfig(
-        level=logging.DEBUG,
-        format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
-    )
 
-    # Create a file handler for the .log file
-    file_handler = RotatingFileHandler(
-        os.path.join(InternalConfig.ASSETS_DIR_PATH, "app.log"),
-        maxBytes=1024 * 1024,
-        backupCount=5,
-    )
-    file_handler.setLevel(logging.DEBUG)
-    file_handler.setFormatter(
-        logging.Formatter("%(asctime)s - %(name)s - %(levelname)s - %(message)s")
-    )
+    def flush(self):
+        pass
+
+    def flush_buffered(self):
+        super().flush()
+
+
+class _BufferedStreamHandler(_DeferredFlushMixin, logging.StreamHandler):
+    pass
+
+
+class _BufferedRotatingFileHandler(_DeferredFlushMixin, RotatingFileHandler):
+    pass
+
+
+class _BatchingQueueListener(QueueListener):
+    def dequeue(self, block):
+        if block and self.queue.empty():
+            self.flush()
+        return self.queue.get(block)
+
+    def flush(self):
+        for handler in self.handlers:
+            getattr(handler, "flush_buffered", handler.flush)()
+
+    def stop(self):
+        super().stop()
+        self.flush()
+
+
+def configure_logging(level: str = None):
+    """
+    This function is used for configuring the root logger, the records are put on a queue and written to stdout
+    and the rotating .log file by a background listener thread so the callers never wait for the disk.
+    Only the first call configures the logging, the next ones are no-ops
+
+    Args:
+        - level : str (the level of the root logger, LOG_LEVEL by default)
+    """
+    global _log_listener, _log_handlers
+    with _log_listener_lock:
+        # A worker process forwards its records to the parent process, see configure_worker_logging
+        if _log_listener is not None or _worker_log_queue is not None:
+            return
+
+        formatter = logging.Formatter(LOG_FORMAT)
+        stream_handler = _BufferedStreamHandler()
+        stream_handler.setFormatter(formatter)
+
+        # Create a file handler for the .log file
+        file_handler = _BufferedRotatingFileHandler(
+            os.path.join(InternalConfig.ASSETS_DIR_PATH, "app.log"),
+            maxBytes=1024 * 1024,
+            backupCount=5,
+        )
+        file_handler.setFormatter(formatter)
+
+        log_queue = queue.SimpleQueue()
+        root_logger = logging.getLogger("")
+        root_logger.setLevel(level or InternalConfig.LOG_LEVEL)
+        root_logger.addHandler(QueueHandler(log_queue))
+
+        _log_handlers = (stream_handler, file_handler)
+        _log_listener = _BatchingQueueListener(log_queue, *_log_handlers)
+        _log_listener.start()
+        # Writes the queued records before the interpreter exits
+        atexit.register(_log_listener.stop)
+
+
+def worker_log_queue():
+    """
+    This function is used for getting the queue the spawned worker processes put their records on, the records are
+    written by the stdout and .log handlers of this process so only one process writes to the rotating .log file.
+    The queue and its listener are created on the first call
+
+    Returns:
+        - multiprocessing.Queue (the queue to pass to configure_worker_logging)
+    """
+    global _worker_log_queue
+    configure_logging()
+    with _log_listener_lock:
+        if _worker_log_queue is None:
+            _worker_log_queue = multiprocessing.get_context("spawn").Queue()
+            worker_listener = _BatchingQueueListener(_worker_log_queue, *_log_handlers)
+            worker_listener.start()
+            atexit.register(worker_listener.stop)
+        return _worker_log_queue
+
 
-    # Add the file handler to the root logger
-    logging.getLogger("").addHandler(file_handler)
+def configure_worker_logging(log_queue, level: str = None):
+    """
+    This function is used for configuring the root logger of a worker process, the records are put on the queue of
+    the parent process instead of being written by the worker
+
+    Args:
+        - log_queue : multiprocessing.Queue (the queue returned by worker_log_queue in the parent process)
+        - level : str (the level of the root logger, LOG_LEVEL by default)
+    """
+    global _worker_log_queue
+    with _log_listener_lock:
+        if _log_listener is not None or _worker_log_queue is not None:
+            return
+        root_logger = logging.getLogger("")
+        root_logger.setLevel(level or InternalConfig.LOG_LEVEL)
+        root_logger.addHandler(QueueHandler(log_queue))
+        _worker_log_queue = log_queue
 
 
 class InternalConfig:
+    LOG_LEVEL = os.environ.get("LOG_LEVEL", "INFO").upper()
     MONGO_HOST = os.environ.get("MONGO_HOST", "localhost")
+    MONGO_URI = f"mongodb://{MONGO_HOST}:27017/test"
+    # Connection pool of every process, see connect_mongo
+    MONGO_MAX_POOL_SIZE = int(os.environ.get("MONGO_MAX_POOL_SIZE", 100))
+    MONGO_MIN_POOL_SIZE = int(os.environ.get("MONGO_MIN_POOL_SIZE", 0))
+    MONGO_MAX_IDLE_TIME_MS = int(
+        os.environ.get("MONGO_MAX_IDLE_TIME_MS", 5 * 60 * 1000)
+    )
+    MONGO_SERVER_SELECTION_TIMEOUT_MS = int(
+        os.environ.get("MONGO_SERVER_SELECTION_TIMEOUT_MS", 30 * 1000)
+    )
     ASSETS_DIR_PATH = os.environ.get("ASSETS_DIR_PATH", "assets")
     MISTRAL_API_KEY = os.environ.get("MISTRAL_API_KEY", None)
+    MISTRAL_ENDPOINT = os.environ.get("MISTRAL_ENDPOINT", "https://api.mistral.ai")
+    LLM_CLIENT_POOL_SIZE = int(os.environ.get("LLM_CLIENT_POOL_SIZE", 16))
+    # Seconds a pooled LLM client is kept without a request
+    LLM_CLIENT_TTL = float(os.environ.get("LLM_CLIENT_TTL", 60 * 60))
+    # Estimated tokens of a whole LLM parser request, the prompt with its example takes about 2000 of them
+    LLM_CHUNK_TOKEN_BUDGET = int(os.environ.get("LLM_CHUNK_TOKEN_BUDGET", 6000))
+    LLM_MAX_CONCURRENCY = int(os.environ.get("LLM_MAX_CONCURRENCY", 4))
+    LLM_CHUNK_RETRIES = int(os.environ.get("LLM_CHUNK_RETRIES", 2))
+    EXTRACTION_CHUNK_SIZE = int(os.environ.get("EXTRACTION_CHUNK_SIZE", 1000))
+    # insert_new keeps the existing products untouched, update_changed overwrites the changed fields,
+    # delta only writes the products whose fingerprint changed
+    BULK_WRITE_MODE = os.environ.get("BULK_WRITE_MODE", "insert_new")
+    EXTRACTION_WORKERS = int(os.environ.get("EXTRACTION_WORKERS", 1))
+    # Plain xml feeds bigger than this are memory mapped instead of read through a buffer
+    FEED_MMAP_THRESHOLD = int(os.environ.get("FEED_MMAP_THRESHOLD", 64 * 1024 * 1024))
+    # auto uses inotify when it's available and polls the assets directory otherwise, inotify or polling forces one
+    WATCHER_MODE = os.environ.get("WATCHER_MODE", "auto")
+    # Seconds a changed file must stay untouched before it's extracted
+    WATCHER_DEBOUNCE = float(os.environ.get("WATCHER_DEBOUNCE", 2))
+    WATCHER_POLL_INTERVAL = float(os.environ.get("WATCHER_POLL_INTERVAL", 5))
+    WATCHER_WORKERS = int(os.environ.get("WATCHER_WORKERS", 2))
+    WATCHER_RECONCILE_INTERVAL = float(
+        os.environ.get("WATCHER_RECONCILE_INTERVAL", 60 * 60)
+    )
+    EXTRACTION_JOB_WORKERS = int(os.environ.get("EXTRACTION_JOB_WORKERS", 2))
+    EXTRACTION_JOB_QUEUE_SIZE = int(os.environ.get("EXTRACTION_JOB_QUEUE_SIZE", 8))
+    EXTRACTION_JOB_HISTORY = int(os.environ.get("EXTRACTION_JOB_HISTORY", 1000))
+    UPLOAD_CHUNK_SIZE = int(os.environ.get("UPLOAD_CHUNK_SIZE", 1024 * 1024))
+    # Number of received chunks waiting for the parser before the upload is slowed down
+    UPLOAD_QUEUE_SIZE = int(os.environ.get("UPLOAD_QUEUE_SIZE", 16))
+    PRODUCT_CACHE_SIZE = int(os.environ.get("PRODUCT_CACHE_SIZE", 10000))
+    PRODUCT_CACHE_TTL = float(os.environ.get("PRODUCT_CACHE_TTL", 300))
+    # How often the product readers check whether another process wrote products, see ProductVersionStore
+    PRODUCT_VERSION_CHECK_INTERVAL = float(
+        os.environ.get("PRODUCT_VERSION_CHECK_INTERVAL", 1.0)
+    )
+    KEYWORD_ALIAS_CACHE_SIZE = int(os.environ.get("KEYWORD_ALIAS_CACHE_SIZE", 10000))
+    # The detail names the extractor resolved, the misses are asked again after the TTL so the new aliases are used
+    DETAIL_NAME_CACHE_SIZE = int(os.environ.get("DETAIL_NAME_CACHE_SIZE", 1000))
+    DETAIL_NAME_CACHE_TTL = float(os.environ.get("DETAIL_NAME_CACHE_TTL", 300))
+    KEYWORD_SIMILARITY_CUTOFF = float(os.environ.get("KEYWORD_SIMILARITY_CUTOFF", 0.85))
@@ -0,0 +1,284 @@
+import logging
+import time
+from typing import Callable, Dict, Iterable, List, Set, Union
+
+from app.configs.config import InternalConfig
+from app.database.catalog_stats import CatalogStatsStore
+from app.database.mongo_odm import Product
+from app.database.product_record import ProductRecord
+from app.database.product_version import product_version_store
+from app.utils.iter_utils import chunked
+from app.utils.metrics_utils import (
+    INGESTION_BATCH_SIZE,
+    INGESTION_PRODUCTS,
+    INGESTION_STAGE_SECONDS,
+    MONGO_ROUND_TRIPS,
+)
+
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
+
+logger = logging.getLogger(__name__)
+
+
+class BulkProductWriter:
+    """
+    Writes product records or dicts to mongo in unordered bulk_write batches of upserts keyed on stock_code,
+    the catalog stats are updated from every written batch when a CatalogStatsStore is given and the shared
+    product version is bumped after every batch that changed products
+    """
+
+    INSERT_NEW = "insert_new"
+    UPDATE_CHANGED = "update_changed"
+    DELTA = "delta"
+    MODES = (INSERT_NEW, UPDATE_CHANGED, DELTA)
+
+    def __init__(
+        self,
+        mode: str = None,
+        batch_size: int = None,
+        on_written: Callable[[List[dict]], None] = None,
+        catalog_stats: CatalogStatsStore = None,
+    ):
+        self.mode = mode or InternalConfig.BULK_WRITE_MODE
+        if self.mode not in self.MODES:
+            raise TypeError(
+                f"Unknown bulk write mode :: {self.mode}, expected one of {self.MODES}"
+            )
+        self.batch_size = batch_size or InternalConfig.EXTRACTION_CHUNK_SIZE
+        # Called with the product dicts that were inserted or updated, e.g. to invalidate the caches
+        self.on_written = on_written
+        self.catalog_stats = catalog_stats
+        self.product_version = product_version_store
+
+    def _to_mongo(self, product_doc: Union[ProductRecord, dict]) -> dict:
+        """
+        This function validates the product against the Product schema and converts it to a raw mongo document,
+        the records of the extractor are encoded directly and the dicts go through the Product document
+
+        Args:
+            - product_doc : ProductRecord or dict
+
+        Returns:
+            - mongo_doc : dict (without _id)
+        """
+        if isinstance(product_doc, ProductRecord):
+            return product_doc.to_mongo()
+        mongo_product_doc = Product(**product_doc)
+        mongo_product_doc.validate()
+        mongo_doc = mongo_product_doc.to_mongo().to_dict()
+        mongo_doc.pop("_id", None)
+        return mongo_doc
+
+    def _build_operation(self, mongo_doc: dict) -> UpdateOne:
+        """
+        This function builds the upsert for a product regarding the selected mode,
+        insert_new only writes the product if the stock_code is new, update_changed and delta also overwrite the fields
+        of the existing products while keeping createdAt
+
+        Args:
+            - mongo_doc : dict (see _to_mongo)
+
+        Returns:
+            - UpdateOne
+        """
+        stock_code_filter = {"stock_code": mongo_doc["stock_code"]}
+        if self.mode == self.INSERT_NEW:
+            return UpdateOne(
+                stock_code_filter, {"$setOnInsert": mongo_doc}, upsert=True
+            )
+
+        fields = {key: value for key, value in mongo_doc.items() if key != "createdAt"}
+        return UpdateOne(
+            stock_code_filter,
+            {"$set": fields, "$setOnInsert": {"createdAt": mongo_doc["createdAt"]}},
+            upsert=True,
+        )
+
+    def _fetch_fingerprints(self, file_path: str) -> Dict[str, str]:
+        """
+        This function fetches the fingerprints of all the products of a file with a single query
+
+        Args:
+            - file_path : str
+
+        Returns:
+            - fingerprints : Dict[str, str] (stock_code to fingerprint)
+        """
+        MONGO_ROUND_TRIPS.inc(operation="find")
+        return {
+            doc["stock_code"]: doc.get("fingerprint")
+            for doc in Product._get_collection().find(
+                {"file_path": file_path}, {"_id": 0, "stock_code": 1, "fingerprint": 1}
+            )
+        }
+
+    def write_batch(
+        self,
+        products: List[dict],
+        on_batch_groups: Callable[[List[tuple]], None] = None,
+    ) -> dict:
+        """
+        This function sends the given products to mongo with a single unordered bulk_write
+
+        Args:
+            - products : List[Dict]
+            - on_batch_groups : Callable (optional, called with the catalog stats groups of the batch before
+              the products are written, see CatalogStatsStore.recompute_groups)
+
+        Returns:
+            - counts : dict (inserted, matched and modified counts of the batch)
+
+        Raises:
+            - TypeError indicating something is wrong with the exception
+        """
+        counts = {"inserted": 0, "matched": 0, "modified": 0}
+        if not products:
+            return counts
+        start = time.perf_counter()
+        # The unordered upserts of a repeated stock_code would be applied in any order and counted once per
+        # occurrence by the catalog stats, only the last occurrence in the feed is written
+        products = list(
+            {
+                product_doc["stock_code"]: product_doc for product_doc in products
+            }.values()
+        )
+        mongo_docs = [self._to_mongo(product_doc) for product_doc in products]
+        previous = None
+        if self.catalog_stats is not None and self.mode != self.INSERT_NEW:
+            # The stored values are needed for the deltas of the overwritten products
+            previous = self.catalog_stats.fetch_previous(
+                mongo_doc["stock_code"] for mongo_doc in mongo_docs
+            )
+        if self.catalog_stats is not None and on_batch_groups is not None:
+            on_batch_groups(self.catalog_stats.affected_groups(mongo_docs, previous))
+        operations = [self._build_operation(mongo_doc) for mongo_doc in mongo_docs]
+        try:
+            result = Product._get_collection().bulk_write(operations, ordered=False)
+        except BulkWriteError as exc:
+            raise TypeError(
+                f"Bulk write failed for {len(exc.details.get('writeErrors', []))} products... :: {exc.details}"
+            )
+        finally:
+            MONGO_ROUND_TRIPS.inc(operation="bulk_write")
+        INGESTION_STAGE_SECONDS.observe(time.perf_counter() - start, stage="write")
+        INGESTION_BATCH_SIZE.observe(len(products))
+        counts.update(
+            {
+                "inserted": result.upserted_count,
+                "matched": result.matched_count,
+                "modified": result.modified_count,
+            }
+        )
+        # Only the upserted products are written in insert_new mode, the keys are the indexes of the operations
+        written_indexes = (
+            list(result.upserted_ids)
+            if self.mode == self.INSERT_NEW
+            else range(len(products))
+        )
+        if self.catalog_stats is not None:
+            self._apply_catalog_stats(
+                [mongo_docs[index] for index in written_indexes], previous
+            )
+        if counts["inserted"] or counts["modified"]:
+            self._bump_product_version()
+        if self.on_written is not None:
+            self.on_written([products[index] for index in written_indexes])
+        return counts
+
+    def _bump_product_version(self) -> None:
+        # The products are already written, a failure only leaves the caches of the other processes stale
+        # until their PRODUCT_CACHE_TTL
+        try:
+            self.product_version.bump(invalidated_locally=self.on_written is not None)
+        except Exception as exc:
+            logger.error(f"Error while bumping the product version :: {exc}")
+
+    def _apply_catalog_stats(self, mongo_docs: List[dict], previous: dict) -> None:
+        # The products are already written, a failure only leaves the stats behind until they are rebuilt
+        start = time.perf_counter()
+        try:
+            self.catalog_stats.apply(mongo_docs, previous)
+        except Exception as exc:
+            logger.error(
+                f"Error while updating the catalog stats, rebuild them with rebuild_catalog_stats.py :: {exc}"
+            )
+        INGESTION_STAGE_SECONDS.observe(time.perf_counter() - start, stage="stats")
+
+    def write(
+        self,
+        products: Iterable[dict],
+        file_path: str = None,
+        on_batch: Callable[[dict], None] = None,
+        resumed_stock_codes: Set[str] = None,
+        on_batch_groups: Callable[[List[tuple]], None] = None,
+    ) -> dict:
+        """
+        This function consumes the products in batches of batch_size and writes every batch with write_batch.
+        In delta mode the stored fingerprints of the file are fetched once and only the added or changed products
+        are written, the products of the file that are missing in the feed are counted as removed
+
+        Args:
+            - products : Iterable[Dict] (list or generator of dictionary of products)
+            - file_path : str (required in delta mode)
+            - on_batch : Callable (optional progress callback, called with the counts of every batch)
+            - resumed_stock_codes : Set[str] (the products of the feed committed before a resume, they are skipped
+              by the products iterable and aren't counted as removed, it can be filled while the products are consumed)
+            - on_batch_groups : Callable (optional, see write_batch)
+
+        Returns:
+            - report : dict (summed counts and the per batch counts)
+        """
+        report = {"products": 0, "inserted": 0, "matched": 0, "modified": 0}
+        report["batches"] = []
+        if self.mode == self.DELTA:
+            if file_path is None:
+                raise TypeError("The file path is required for the delta write mode...")
+            fingerprints = self._fetch_fingerprints(file_path)
+            seen_stock_codes = set()
+            report.update({"added": 0, "changed": 0, "unchanged": 0, "removed": 0})
+
+        for batch_number, batch in enumerate(chunked(products, self.batch_size), 1):
+            batch_size = len(batch)
+            INGESTION_PRODUCTS.inc(batch_size)
+            if self.mode == self.DELTA:
+                start = time.perf_counter()
+                seen_stock_codes.update(
+                    product_doc["stock_code"] for product_doc in batch
+                )
+                batch = [
+                    product_doc
+                    for product_doc in batch
+                    if fingerprints.get(product_doc["stock_code"])
+                    != product_doc["fingerprint"]
+                ]
+                INGESTION_STAGE_SECONDS.observe(
+                    time.perf_counter() - start, stage="dedupe"
+                )
+            counts = self.write_batch(batch, on_batch_groups)
+            counts.update({"batch": batch_number, "size": batch_size})
+            logger.info(
+                f"Bulk write batch {batch_number} done :: size={batch_size} inserted={counts['inserted']} "
+                f"matched={counts['matched']} modified={counts['modified']}"
+            )
+            report["batches"].append(counts)
+            if on_batch is not None:
+                on_batch(counts)
+            report["products"] += batch_size
+            for key in ("inserted", "matched", "modified"):
+                report[key] += counts[key]
+
+        if self.mode == self.DELTA:
+            # Every written product is either upserted or matched
+            written = report["inserted"] + report["matched"]
+            report["added"] = report["inserted"]
+            report["changed"] = written - report["inserted"]
+            report["unchanged"] = report["products"] - written
+            report["removed"] = len(
+                set(fingerprints) - seen_stock_codes - (resumed_stock_codes or set())
+            )
+            logger.info(
+                f"Delta ingestion done for {file_path} :: added={report['added']} changed={report['changed']} "
+                f"unchanged={report['unchanged']} removed={report['removed']}"
+            )
+        return report
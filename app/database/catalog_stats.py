@@ -0,0 +1,324 @@
+import logging
+from datetime import datetime
+from typing import Dict, Iterable, List
+
+from app.configs.config import TIMESTAMP_FORMAT
+from app.database.mongo_odm import CatalogStats, Product
+from app.utils.metrics_utils import MONGO_ROUND_TRIPS
+
+from pymongo import DeleteOne, UpdateOne
+
+logger = logging.getLogger(__name__)
+
+GROUP_FIELDS = ("product_type", "series", "status")
+# The product fields the summaries are computed from
+STATS_FIELDS = GROUP_FIELDS + ("quantity", "is_discounted", "price")
+# The products without a value are counted under "N/A"
+GROUP_ID = {field: {"$ifNull": [f"${field}", "N/A"]} for field in GROUP_FIELDS}
+# The summary of a group computed from its products, see rebuild and recompute_groups
+SUMMARY_ACCUMULATORS = {
+    "count": {"$sum": 1},
+    "total_quantity": {"$sum": "$quantity"},
+    "discounted_count": {"$sum": {"$cond": [{"$eq": ["$is_discounted", True]}, 1, 0]}},
+    "min_price": {"$min": "$price"},
+    "max_price": {"$max": "$price"},
+}
+
+
+def _group_key(product_doc: dict) -> tuple:
+    return tuple(
+        "N/A" if product_doc.get(field) is None else product_doc[field]
+        for field in GROUP_FIELDS
+    )
+
+
+def _group_filter(group_key: tuple) -> dict:
+    return {
+        field: {"$in": [value, None]} if value == "N/A" else value
+        for field, value in zip(GROUP_FIELDS, group_key)
+    }
+
+
+def _stats_values(product_doc: dict) -> tuple:
+    return tuple(product_doc.get(field) for field in STATS_FIELDS)
+
+
+class CatalogStatsStore:
+    """
+    Keeps the CatalogStats summaries, the product count, total quantity, discounted count and the price range
+    per (product_type, series, status) group, up to date from the written products.
+    The counts and the quantities are applied as deltas of the previous and the new values of every product, so a product
+    whose status flips between Active and Deactive moves from one group to the other.
+    The price range only widens with the deltas, the groups that lost a product on their min or max price are
+    recomputed from the products. rebuild recomputes all the summaries from scratch.
+    The previous values and the deltas aren't read and applied atomically, two processes overwriting the same products
+    at the same time can leave the summaries behind until they are rebuilt with rebuild_catalog_stats.py
+    """
+
+    def fetch_previous(self, stock_codes: Iterable[str]) -> Dict[str, dict]:
+        """
+        This function fetches the stored stats fields of the given products with a single query,
+        it's called before the products are overwritten
+
+        Args:
+            - stock_codes : Iterable[str]
+
+        Returns:
+            - previous : Dict[str, dict] (stock_code to the stored fields, the new products are missing)
+        """
+        projection = {"_id": 0, "stock_code": 1}
+        projection.update({field: 1 for field in STATS_FIELDS})
+        MONGO_ROUND_TRIPS.inc(operation="find")
+        return {
+            doc["stock_code"]: doc
+            for doc in Product._get_collection().find(
+                {"stock_code": {"$in": list(stock_codes)}}, projection
+            )
+        }
+
+    def affected_groups(
+        self, written_docs: List[dict], previous: Dict[str, dict] = None
+    ) -> List[tuple]:
+        """
+        This function returns the groups whose summaries the written products change, the groups they join
+        and the groups they leave
+
+        Args:
+            - written_docs : List[dict] (the mongo documents about to be written)
+            - previous : Dict[str, dict] (the stored fields before the write, see fetch_previous)
+
+        Returns:
+            - group_keys : List[tuple]
+        """
+        group_keys = {_group_key(product_doc) for product_doc in written_docs}
+        group_keys.update(_group_key(old_doc) for old_doc in (previous or {}).values())
+        return sorted(group_keys)
+
+    def recompute_groups(self, group_keys: Iterable[tuple]) -> None:
+        """
+        This function replaces the summaries of the given groups with the ones computed from the stored products,
+        e.g. the groups of a batch whose products were written but whose deltas may not be. The groups left
+        without products are removed like rebuild does
+
+        Args:
+            - group_keys : Iterable[tuple]
+        """
+        group_keys = sorted({tuple(group_key) for group_key in group_keys})
+        if not group_keys:
+            return
+        MONGO_ROUND_TRIPS.inc(operation="aggregate")
+        summaries = {
+            _group_key(doc.pop("_id")): doc
+            for doc in Product._get_collection().aggregate(
+                [
+                    {"$match": {"$or": [_group_filter(key) for key in group_keys]}},
+                    {"$group": dict({"_id": GROUP_ID}, **SUMMARY_ACCUMULATORS)},
+                ]
+            )
+        }
+        updated_at = datetime.now().strftime(TIMESTAMP_FORMAT)
+        operations = []
+        for group_key in group_keys:
+            group_filter = dict(zip(GROUP_FIELDS, group_key))
+            summary = summaries.get(group_key)
+            if summary is None:
+                operations.append(DeleteOne(group_filter))
+                continue
+            update = {"$set": dict(summary, updatedAt=updated_at)}
+            if summary.get("min_price") is None:
+                # Unset instead of null, $min and $max never replace a null
+                update["$set"].pop("min_price")
+                update["$set"].pop("max_price")
+                update["$unset"] = {"min_price": "", "max_price": ""}
+            operations.append(UpdateOne(group_filter, update, upsert=True))
+        MONGO_ROUND_TRIPS.inc(operation="bulk_write")
+        CatalogStats._get_collection().bulk_write(operations, ordered=False)
+        logger.info(f"Recomputed the catalog stats of {len(group_keys)} groups")
+
+    def apply(self, written_docs: List[dict], previous: Dict[str, dict] = None) -> None:
+        """
+        This function applies the deltas of the written products to the summaries with a single bulk_write
+
+        Args:
+            - written_docs : List[dict] (the mongo documents that were inserted or overwritten)
+            - previous : Dict[str, dict] (the stored fields before the write, see fetch_previous)
+        """
+        previous = previous or {}
+        # Group key to [count, total_quantity, discounted_count] deltas and [min_price, max_price] of the added products
+        deltas = {}
+        price_bounds = {}
+        # Group key to the prices of the products that left the group or changed their price
+        departed_prices = {}
+
+        def add(group_key: tuple, product_doc: dict, sign: int):
+            delta = deltas.setdefault(group_key, [0, 0, 0])
+            delta[0] += sign
+            delta[1] += sign * (product_doc.get("quantity") or 0)
+            delta[2] += sign * bool(product_doc.get("is_discounted"))
+
+        # The previous values are read once per batch, a repeated stock_code is only counted with its last value
+        written_docs = {doc["stock_code"]: doc for doc in written_docs}.values()
+        for product_doc in written_docs:
+            old_doc = previous.get(product_doc["stock_code"])
+            if old_doc is not None:
+                if _stats_values(old_doc) == _stats_values(product_doc):
+                    continue
+                old_key = _group_key(old_doc)
+                add(old_key, old_doc, -1)
+                departed_prices.setdefault(old_key, set()).add(old_doc.get("price"))
+            group_key = _group_key(product_doc)
+            add(group_key, product_doc, 1)
+            price = product_doc.get("price")
+            if price is not None:
+                bounds = price_bounds.setdefault(group_key, [price, price])
+                bounds[0], bounds[1] = min(bounds[0], price), max(bounds[1], price)
+
+        if not deltas:
+            return
+        updated_at = datetime.now().strftime(TIMESTAMP_FORMAT)
+        operations = []
+        for group_key, (count, total_quantity, discounted_count) in deltas.items():
+            update = {
+                "$inc": {
+                    "count": count,
+                    "total_quantity": total_quantity,
+                    "discounted_count": discounted_count,
+                },
+                "$set": {"updatedAt": updated_at},
+            }
+            if group_key in price_bounds:
+                update["$min"] = {"min_price": price_bounds[group_key][0]}
+                update["$max"] = {"max_price": price_bounds[group_key][1]}
+            operations.append(
+                UpdateOne(dict(zip(GROUP_FIELDS, group_key)), update, upsert=True)
+            )
+        MONGO_ROUND_TRIPS.inc(operation="bulk_write")
+        CatalogStats._get_collection().bulk_write(operations, ordered=False)
+        if departed_prices:
+            self._refresh_price_bounds(departed_prices, updated_at)
+
+    def _refresh_price_bounds(
+        self, departed_prices: Dict[tuple, set], updated_at: str
+    ) -> None:
+        """
+        This function recomputes the price range of the groups whose min or max price left the group,
+        the products are already written so the range is computed from the stored products
+        """
+        collection = CatalogStats._get_collection()
+        MONGO_ROUND_TRIPS.inc(operation="find")
+        stale_groups = [
+            _group_key(stats_doc)
+            for stats_doc in collection.find(
+                {"$or": [dict(zip(GROUP_FIELDS, key)) for key in departed_prices]},
+                {"_id": 0},
+            )
+            if stats_doc.get("count", 0) <= 0
+            or stats_doc.get("min_price") in departed_prices[_group_key(stats_doc)]
+            or stats_doc.get("max_price") in departed_prices[_group_key(stats_doc)]
+        ]
+        if not stale_groups:
+            return
+        MONGO_ROUND_TRIPS.inc(operation="aggregate")
+        price_bounds = {
+            _group_key(doc["_id"]): (doc["min_price"], doc["max_price"])
+            for doc in Product._get_collection().aggregate(
+                [
+                    {"$match": {"$or": [_group_filter(key) for key in stale_groups]}},
+                    {
+                        "$group": {
+                            "_id": GROUP_ID,
+                            "min_price": {"$min": "$price"},
+                            "max_price": {"$max": "$price"},
+                        }
+                    },
+                ]
+            )
+        }
+        operations = []
+        for group_key in stale_groups:
+            bounds = price_bounds.get(group_key)
+            if bounds is None:
+                # Unset instead of null, $min and $max never replace a null
+                update = {
+                    "$unset": {"min_price": "", "max_price": ""},
+                    "$set": {"updatedAt": updated_at},
+                }
+            else:
+                update = {
+                    "$set": {
+                        "min_price": bounds[0],
+                        "max_price": bounds[1],
+                        "updatedAt": updated_at,
+                    }
+                }
+            operations.append(UpdateOne(dict(zip(GROUP_FIELDS, group_key)), update))
+        MONGO_ROUND_TRIPS.inc(operation="bulk_write")
+        collection.bulk_write(operations, ordered=False)
+
+    def rebuild(self) -> int:
+        """
+        This function recomputes all the summaries from the products with one aggregation,
+        the summaries are replaced at once by $out so the readers never see a partial state.
+        The deltas applied by the bulk writes between the aggregation and the $out are lost, it's run by
+        rebuild_catalog_stats.py while no ingestion is running
+
+        Returns:
+            - groups : int (number of the rebuilt summaries)
+        """
+        MONGO_ROUND_TRIPS.inc(operation="aggregate")
+        Product._get_collection().aggregate(
+            [
+                {"$group": dict({"_id": GROUP_ID}, **SUMMARY_ACCUMULATORS)},
+                {
+                    "$project": dict(
+                        {"_id": 0},
+                        **{field: f"$_id.{field}" for field in GROUP_FIELDS},
+                        count=1,
+                        total_quantity=1,
+                        discounted_count=1,
+                        min_price=1,
+                        max_price=1,
+                        updatedAt={
+                            "$literal": datetime.now().strftime(TIMESTAMP_FORMAT)
+                        },
+                    )
+                },
+                # $out keeps the indexes of the existing collection
+                {"$out": CatalogStats._get_collection_name()},
+            ]
+        )
+        groups = CatalogStats.objects.count()
+        logger.info(f"Rebuilt the catalog stats :: {groups} groups")
+        return groups
+
+    def summary(self) -> dict:
+        """
+        This function reads the summaries, the cost only depends on the number of groups, not of the products
+
+        Returns:
+            - summary : dict (the groups and the totals of the catalog, with the discount shares)
+        """
+        MONGO_ROUND_TRIPS.inc(operation="find")
+        groups = list(
+            CatalogStats._get_collection().find(
+                {"count": {"$gt": 0}}, {"_id": 0, "updatedAt": 0}
+            )
+        )
+        totals = {"count": 0, "total_quantity": 0, "discounted_count": 0}
+        prices = []
+        for group in groups:
+            group["discount_share"] = group["discounted_count"] / group["count"]
+            for key in totals:
+                totals[key] += group[key]
+            prices.extend(
+                price
+                for price in (group.get("min_price"), group.get("max_price"))
+                if price is not None
+            )
+        totals["discount_share"] = (
+            totals["discounted_count"] / totals["count"] if totals["count"] else 0.0
+        )
+        totals["min_price"] = min(prices) if prices else None
+        totals["max_price"] = max(prices) if prices else None
+        groups.sort(key=_group_key)
+        return {"groups": groups, "totals": totals}
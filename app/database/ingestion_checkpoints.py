@@ -0,0 +1,102 @@
+import logging
+from datetime import datetime
+from typing import Dict, List
+
+from app.configs.config import TIMESTAMP_FORMAT
+from app.database.mongo_odm import IngestionCheckpoint
+from app.utils.metrics_utils import MONGO_ROUND_TRIPS
+
+logger = logging.getLogger(__name__)
+
+
+class IngestionCheckpointStore:
+    """
+    Keeps the IngestionCheckpoint of every feed of a file while the file is being ingested, the number of the products
+    that are committed is saved after every written batch so a restarted ingestion continues after them.
+    The catalog stats groups of a batch are saved before its products are written, a restarted ingestion recomputes
+    them since the process may have stopped between the products and their stats.
+    The checkpoints are only valid for the content they were saved for, they are dropped when the content hash of the
+    file changes and when the file is recorded in the ingestion manifest
+    """
+
+    def load(self, file_path: str, content_hash: str) -> Dict[str, dict]:
+        """
+        This function fetches the checkpoints of the feeds of the file with a single query,
+        the checkpoints of a previous content of the file are dropped
+
+        Args:
+            - file_path : str
+            - content_hash : str (the current content hash of the file, see file_content_hash)
+
+        Returns:
+            - checkpoints : Dict[str, dict] (feed path to the committed_products, completed and pending_groups fields)
+        """
+        MONGO_ROUND_TRIPS.inc(operation="find")
+        checkpoints = {}
+        stale = False
+        for checkpoint in (
+            IngestionCheckpoint.objects(file_path=file_path)
+            .only(
+                "feed_path",
+                "content_hash",
+                "committed_products",
+                "completed",
+                "pending_groups",
+            )
+            .as_pymongo()
+        ):
+            if checkpoint["content_hash"] != content_hash:
+                stale = True
+                continue
+            checkpoints[checkpoint["feed_path"]] = checkpoint
+        if stale:
+            logger.info(
+                f"Dropping the checkpoints of the previous content of {file_path}"
+            )
+            MONGO_ROUND_TRIPS.inc(operation="delete")
+            IngestionCheckpoint.objects(
+                file_path=file_path, content_hash__ne=content_hash
+            ).delete()
+        return checkpoints
+
+    def save(
+        self,
+        feed_path: str,
+        file_path: str,
+        content_hash: str,
+        committed_products: int,
+        completed: bool = False,
+        pending_groups: List[tuple] = None,
+    ) -> None:
+        """
+        This function upserts the checkpoint of a feed, it's called after the products are written
+        so a checkpoint never counts a product that isn't committed, and with the pending groups before they are written
+
+        Args:
+            - feed_path : str (the file path or the archive member of the feed, see open_feeds)
+            - file_path : str
+            - content_hash : str
+            - committed_products : int (number of the first products of the feed that are written)
+            - completed : bool (all the products of the feed are written)
+            - pending_groups : List[tuple] (the catalog stats groups of the batch about to be written)
+        """
+        MONGO_ROUND_TRIPS.inc(operation="update")
+        IngestionCheckpoint.objects(feed_path=feed_path).update_one(
+            set__file_path=file_path,
+            set__content_hash=content_hash,
+            set__committed_products=committed_products,
+            set__completed=completed,
+            set__pending_groups=[list(group_key) for group_key in pending_groups or []],
+            set__updatedAt=datetime.now().strftime(TIMESTAMP_FORMAT),
+            upsert=True,
+        )
+
+    def clear(self, file_path: str) -> None:
+        """
+        This function drops the checkpoints of a file, it's called once the file is recorded in the manifest
+
+        Args:
+            - file_path : str
+        """
+        MONGO_ROUND_TRIPS.inc(operation="delete")
+        IngestionCheckpoint.objects(file_path=file_path).delete()
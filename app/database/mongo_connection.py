@@ -0,0 +1,24 @@
+from app.configs.config import InternalConfig
+
+from mongoengine import connect, disconnect
+
+
+def connect_mongo():
+    """
+    This function opens the default mongo connection of the process with the pool settings of InternalConfig,
+    it's called by the entrypoints instead of at import so importing the app doesn't need a database
+
+    Returns:
+        - client : MongoClient
+    """
+    return connect(
+        host=InternalConfig.MONGO_URI,
+        maxPoolSize=InternalConfig.MONGO_MAX_POOL_SIZE,
+        minPoolSize=InternalConfig.MONGO_MIN_POOL_SIZE,
+        maxIdleTimeMS=InternalConfig.MONGO_MAX_IDLE_TIME_MS,
+        serverSelectionTimeoutMS=InternalConfig.MONGO_SERVER_SELECTION_TIMEOUT_MS,
+    )
+
+
+def disconnect_mongo() -> None:
+    disconnect()
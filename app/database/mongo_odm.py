@@ -5,6 +5,8 @@ from mongoengine import (
     BooleanField,
     DecimalField,
     DateTimeField,
+    FloatField,
+    IntField,
 )
 
 
@@ -25,6 +27,92 @@ class Product(Document):
     fabric = StringField()
     model_measurements = StringField()
     product_measurements = StringField()
+    product_info = StringField()
     createdAt = StringField(required=True)
     updatedAt = StringField(required=True)
     file_path = StringField(required=True)
+    fingerprint = StringField()
+    # Turkish folded copies of the searched fields, see fold_turkish
+    search_name = StringField()
+    search_fabric = StringField()
+    search_product_info = StringField()
+
+    meta = {
+        "indexes": [
+            {"fields": ["stock_code"], "unique": True},
+            "file_path",
+            # Listing filters of GET /api/products, the equality fields first and _id last so the keyset pagination
+            # reads the matches in _id order without a SORT stage. Every filter combination has an index whose
+            # fields are all equality filters of it, the price range and the other filters are checked on the fetch.
+            # The price range alone is read from the _id index, see benchmarks/check_listing_indexes.py
+            ("product_type", "id"),
+            ("status", "id"),
+            ("is_discounted", "id"),
+            ("series", "id"),
+            ("color", "id"),
+            ("product_type", "status", "id"),
+            ("status", "is_discounted", "id"),
+            # GET /api/search, the fields are already folded so the text index doesn't stem them
+            {
+                "fields": [
+                    "$search_name",
+                    "$search_fabric",
+                    "$search_product_info",
+                ],
+                "default_language": "none",
+                "weights": {
+                    "search_name": 10,
+                    "search_fabric": 5,
+                    "search_product_info": 3,
+                },
+            },
+        ]
+    }
+
+
+class IngestionManifest(Document):
+    file_path = StringField(required=True, unique=True)
+    size = IntField(required=True)
+    mtime = FloatField(required=True)
+    content_hash = StringField(required=True)
+    ingestedAt = StringField(required=True)
+
+
+class IngestionCheckpoint(Document):
+    # The progress of a feed that is being ingested, dropped once its file is recorded in the manifest.
+    # committed_products is the number of the first products of the feed that are already written,
+    # pending_groups are the catalog stats groups of the batch being written, saved before its products
+    feed_path = StringField(required=True, unique=True)
+    file_path = StringField(required=True)
+    content_hash = StringField(required=True)
+    committed_products = IntField(default=0)
+    completed = BooleanField(default=False)
+    pending_groups = ListField(ListField(StringField()))
+    updatedAt = StringField()
+
+    meta = {"indexes": ["file_path"]}
+
+
+class ProductVersion(Document):
+    # A single counter bumped after every product write of any process, the product caches are dropped when it changes
+    name = StringField(primary_key=True)
+    version = IntField(default=0)
+
+
+class CatalogStats(Document):
+    # One summary per (product_type, series, status) group, kept up to date by the bulk writes of the extractor
+    product_type = StringField(required=True)
+    series = StringField(required=True)
+    status = StringField(required=True)
+    count = IntField(default=0)
+    total_quantity = FloatField(default=0)
+    discounted_count = IntField(default=0)
+    min_price = FloatField()
+    max_price = FloatField()
+    updatedAt = StringField()
+
+    meta = {
+        "indexes": [
+            {"fields": ["product_type", "series", "status"], "unique": True},
+        ]
+    }
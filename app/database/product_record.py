@@ -0,0 +1,147 @@
+import decimal
+from typing import Any, Iterable
+
+from app.database.mongo_odm import Product
+
+from mongoengine import BooleanField, DecimalField, ListField, StringField
+
+STRING, DECIMAL, BOOLEAN, STRING_LIST = "string", "decimal", "boolean", "string_list"
+
+
+def _field_kind(field) -> str:
+    if isinstance(field, StringField):
+        return STRING
+    if isinstance(field, DecimalField):
+        return DECIMAL
+    if isinstance(field, BooleanField):
+        return BOOLEAN
+    if isinstance(field, ListField) and isinstance(field.field, StringField):
+        return STRING_LIST
+    raise TypeError(f"Unsupported Product field for ProductRecord :: {field.name}")
+
+
+# (name, kind, required, default, quantize exponent) of every Product field in the Product order,
+# derived from the Product schema so the records are validated and encoded the same way
+PRODUCT_SCHEMA = tuple(
+    (
+        name,
+        _field_kind(field),
+        field.required,
+        field.default,
+        (
+            decimal.Decimal(".%s" % ("0" * field.precision))
+            if isinstance(field, DecimalField)
+            else None
+        ),
+    )
+    for name, field in Product._fields.items()
+    if name != "id"
+)
+
+
+class ProductRecord:
+    """
+    Compact representation of a product on the ingestion path. The records are validated against the
+    Product constraints and encoded straight to the raw mongo documents, the Product document stays the
+    schema of the reads. The fields can be read like a dict, e.g. record["stock_code"] or record.get("price")
+    """
+
+    __slots__ = tuple(name for name, *_ in PRODUCT_SCHEMA)
+
+    def __init__(self, **fields):
+        for name, _, _, default, _ in PRODUCT_SCHEMA:
+            if name in fields:
+                setattr(self, name, fields.pop(name))
+            else:
+                setattr(self, name, default() if callable(default) else default)
+        if fields:
+            raise TypeError(f"Unknown product fields :: {', '.join(sorted(fields))}")
+
+    def __getitem__(self, name: str) -> Any:
+        try:
+            return getattr(self, name)
+        except (AttributeError, TypeError):
+            raise KeyError(name)
+
+    def __contains__(self, name: str) -> bool:
+        return name in self.__slots__
+
+    def __eq__(self, other) -> bool:
+        if not isinstance(other, ProductRecord):
+            return NotImplemented
+        return self.to_dict() == other.to_dict()
+
+    def __repr__(self) -> str:
+        return f"ProductRecord(stock_code={self.stock_code!r})"
+
+    def get(self, name: str, default: Any = None) -> Any:
+        return getattr(self, name, default) if name in self.__slots__ else default
+
+    def keys(self) -> tuple:
+        return self.__slots__
+
+    def to_dict(self, exclude: Iterable[str] = ()) -> dict:
+        """
+        This function returns the fields of the record as a dict
+
+        Args:
+            - exclude : Iterable[str] (the fields to leave out)
+
+        Returns:
+            - product_dict : dict
+        """
+        return {
+            name: getattr(self, name) for name in self.__slots__ if name not in exclude
+        }
+
+    def to_mongo(self) -> dict:
+        """
+        This function validates the record and encodes it to the raw mongo document, it's equal to
+        Product(**fields).validate() and Product.to_mongo() without the Document machinery.
+        The booleans are converted like BooleanField.to_python does
+        The decimals are stored as floats rounded half up to the precision of their field, the missing
+        optional fields are left out
+
+        Returns:
+            - mongo_doc : dict (without _id)
+
+        Raises:
+            - TypeError indicating which field is invalid
+        """
+        mongo_doc = {}
+        for name, kind, required, default, exponent in PRODUCT_SCHEMA:
+            value = getattr(self, name)
+            if value is None:
+                # Same as the Product document, None falls back to the default of the field
+                value = default() if callable(default) else default
+            if value is None:
+                if required:
+                    raise TypeError(
+                        f"Invalid product {self.stock_code} :: {name} is required"
+                    )
+                continue
+            if kind == STRING:
+                valid = isinstance(value, str)
+            elif kind == DECIMAL:
+                try:
+                    value = float(
+                        decimal.Decimal("%s" % value).quantize(
+                            exponent, rounding=decimal.ROUND_HALF_UP
+                        )
+                    )
+                    valid = True
+                except (TypeError, ValueError, decimal.InvalidOperation):
+                    valid = False
+            elif kind == BOOLEAN:
+                value, valid = bool(value), True
+            else:
+                valid = isinstance(value, (list, tuple)) and all(
+                    isinstance(item, str) for item in value
+                )
+                value = list(value) if valid else value
+            if not valid:
+                raise TypeError(
+                    f"Invalid product {self.stock_code} :: {name}={value!r} is not a valid {kind}"
+                )
+            mongo_doc[name] = value
+        return mongo_doc
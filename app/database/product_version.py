@@ -0,0 +1,89 @@
+import logging
+import threading
+
+from app.database.mongo_odm import ProductVersion
+from app.utils.metrics_utils import MONGO_ROUND_TRIPS
+
+from pymongo import ReturnDocument
+
+logger = logging.getLogger(__name__)
+
+
+class ProductVersionStore:
+    """
+    Keeps the version of the products shared by the processes that write and read them. The writers bump it after
+    every write that changed products, e.g. the API, periodic_task.py and the extraction workers, and the product
+    readers compare it to drop the cached entries that another process made stale.
+    The versions bumped by the writes whose cached entries the process already invalidated itself are remembered,
+    the readers of the same process skip them so their precise invalidation isn't replaced by dropping the whole cache
+    """
+
+    NAME = "products"
+
+    def __init__(self):
+        self._local_versions = set()
+        self._lock = threading.Lock()
+
+    def bump(self, invalidated_locally: bool = False) -> int:
+        """
+        This function increments the version, it's called after the products are written
+
+        Args:
+            - invalidated_locally : bool (the caches of the process are already invalidated for the written products,
+              e.g. by the on_written callback of the writer)
+
+        Returns:
+            - version : int (the version after the write)
+        """
+        MONGO_ROUND_TRIPS.inc(operation="update")
+        product_version = ProductVersion._get_collection().find_one_and_update(
+            {"_id": self.NAME},
+            {"$inc": {"version": 1}},
+            upsert=True,
+            return_document=ReturnDocument.AFTER,
+        )
+        version = product_version["version"]
+        if invalidated_locally:
+            with self._lock:
+                self._local_versions.add(version)
+        return version
+
+    def current(self) -> int:
+        """
+        This function reads the version with a single lookup by _id
+
+        Returns:
+            - version : int (0 before the first write)
+        """
+        product_version = ProductVersion._get_collection().find_one(
+            {"_id": self.NAME}, {"version": 1}
+        )
+        return 0 if product_version is None else product_version.get("version", 0)
+
+    def changed_elsewhere(self, seen_version: int, version: int) -> bool:
+        """
+        This function tells if one of the versions after seen_version up to version was bumped by a write that
+        this process didn't invalidate itself, the remembered versions up to version are forgotten
+
+        Args:
+            - seen_version : int
+            - version : int
+
+        Returns:
+            - changed : bool
+        """
+        with self._lock:
+            changed = any(
+                bumped_version not in self._local_versions
+                for bumped_version in range(seen_version + 1, version + 1)
+            )
+            self._local_versions = {
+                local_version
+                for local_version in self._local_versions
+                if local_version > version
+            }
+        return changed
+
+
+# Shared by the writers and the readers of the process, see bump
+product_version_store = ProductVersionStore()
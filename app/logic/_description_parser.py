@@ -0,0 +1,110 @@
+import logging
+from html.parser import HTMLParser
+from typing import List
+
+logger = logging.getLogger(__name__)
+
+VOID_TAGS = frozenset(
+    ["area", "base", "br", "col", "embed", "hr", "img", "input", "link", "meta"]
+    + ["param", "source", "track", "wbr"]
+)
+
+
+class _ListItemTextParser(HTMLParser):
+    """
+    Single pass HTML parser collecting the stripped texts of the <li> tags, the same way
+    BeautifulSoup's find_all("li") + get_text(strip=True) does, without building a tree
+    """
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.items = []
+        self.malformed = False
+        self._open_tags = []
+        self._open_items = []
+
+    def handle_starttag(self, tag, attrs):
+        if tag in VOID_TAGS:
+            return
+        self._open_tags.append(tag)
+        if tag == "li":
+            self.items.append([])
+            self._open_items.append(self.items[-1])
+
+    def handle_startendtag(self, tag, attrs):
+        self.handle_starttag(tag, attrs)
+        if tag not in VOID_TAGS:
+            self.handle_endtag(tag)
+
+    def handle_endtag(self, tag):
+        if self._open_tags and self._open_tags[-1] == tag:
+            self._open_tags.pop()
+            if tag == "li":
+                self._open_items.pop()
+        elif self._open_items or tag == "li":
+            # Implicitly closed tags around an <li> are resolved differently by every parser
+            self.malformed = True
+        elif tag in self._open_tags:
+            del self._open_tags[self._open_tags.index(tag) :]
+
+    def handle_data(self, data):
+        if self._open_items:
+            if "&" in data:
+                # Either an escaped "&" or an unknown entity, BeautifulSoup keeps the latter without ";"
+                self.malformed = True
+            text = data.strip()
+            if text:
+                # Nested <li> texts belong to the outer items as well
+                for item in self._open_items:
+                    item.append(text)
+
+    def close(self):
+        super().close()
+        if self._open_items:
+            self.malformed = True
+
+
+def _parse_items_with_html_parser(description_data: str) -> List[str]:
+    parser = _ListItemTextParser()
+    parser.feed(description_data)
+    parser.close()
+    if parser.malformed:
+        raise ValueError("Unbalanced <li> tags")
+    return ["".join(item) for item in parser.items]
+
+
+def _parse_items_with_beautifulsoup(description_data: str) -> List[str]:
+    # Imported on the first malformed description, most of the processes never need it
+    from bs4 import BeautifulSoup
+
+    soup = BeautifulSoup(description_data, "html.parser")
+    return [item.get_text(strip=True) for item in soup.find_all("li")]
+
+
+def parse_description(description_data: str) -> dict:
+    """
+    This function splits the <li> texts of the description at the first ":" to a dict,
+    the texts without ":" are collected in the additional_info list.
+    BeautifulSoup is only used as a fallback when the HTML can't be parsed in a single pass
+
+    Args:
+        - description_data: str (a line of data inside the CDATA block, html features and tags are here)
+
+    Returns:
+        - info_dict : dict
+    """
+    try:
+        items = _parse_items_with_html_parser(description_data)
+    except Exception as exc:
+        logger.debug(f"Falling back to BeautifulSoup for the description :: {exc}")
+        items = _parse_items_with_beautifulsoup(description_data)
+
+    info_dict = {"additional_info": []}
+    for item in items:
+        parts = item.split(":", 1)  # Split at the first occurrence of ':'
+        if len(parts) == 2:
+            key, value = parts
+            info_dict[key.strip()] = value.strip()
+        else:
+            info_dict["additional_info"].append(item)
+    return info_dict
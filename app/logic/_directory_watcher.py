@@ -0,0 +1,303 @@
+import ctypes
+import ctypes.util
+import logging
+import os
+import select
+import struct
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterable, List, Set, Tuple
+
+from app.configs.config import InternalConfig
+from app.logic._feed_readers import is_feed_file
+
+logger = logging.getLogger(__name__)
+
+# See inotify(7)
+IN_MODIFY = 0x00000002
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_Q_OVERFLOW = 0x00004000
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+INOTIFY_EVENT_HEADER = struct.Struct("iIII")
+
+
+class _InotifySource:
+    """
+    Reports the changed file names of the directory with inotify, only available on linux
+    """
+
+    def __init__(self, directory: str):
+        libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+        if not hasattr(libc, "inotify_init1"):
+            raise OSError("inotify isn't available on this platform")
+        self._fd = libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self._fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        watch = libc.inotify_add_watch(
+            self._fd,
+            os.fsencode(directory),
+            IN_MODIFY | IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE,
+        )
+        if watch < 0:
+            errno = ctypes.get_errno()
+            os.close(self._fd)
+            raise OSError(errno, f"inotify_add_watch failed for {directory}")
+
+    def wait(self, timeout: float) -> Tuple[Set[str], bool]:
+        """
+        This function blocks until the directory changes or the timeout passes
+
+        Args:
+            - timeout : float (seconds)
+
+        Returns:
+            - changed : Tuple[Set[str], bool] (the changed file names and whether events were lost)
+        """
+        readable, _, _ = select.select([self._fd], [], [], timeout)
+        names, overflow = set(), False
+        if not readable:
+            return names, overflow
+        try:
+            data = os.read(self._fd, 64 * 1024)
+        except BlockingIOError:
+            return names, overflow
+        offset = 0
+        while offset < len(data):
+            _, mask, _, length = INOTIFY_EVENT_HEADER.unpack_from(data, offset)
+            offset += INOTIFY_EVENT_HEADER.size
+            if mask & IN_Q_OVERFLOW:
+                overflow = True
+            elif length:
+                names.add(os.fsdecode(data[offset : offset + length].rstrip(b"\0")))
+            offset += length
+        return names, overflow
+
+    def close(self):
+        os.close(self._fd)
+
+
+class _PollingSource:
+    """
+    Reports the changed file names of the directory by comparing the size and mtime of its files,
+    the fallback of the platforms and file systems without inotify
+    """
+
+    def __init__(self, directory: str, interval: float):
+        self._directory = directory
+        self._interval = interval
+        self._next_scan = 0.0
+        self._snapshot = self._scan()
+
+    def _scan(self) -> Dict[str, tuple]:
+        with os.scandir(self._directory) as entries:
+            return {
+                entry.name: (entry.stat().st_size, entry.stat().st_mtime_ns)
+                for entry in entries
+                if entry.is_file()
+            }
+
+    def wait(self, timeout: float) -> Tuple[Set[str], bool]:
+        time.sleep(max(0.0, min(timeout, self._next_scan - time.monotonic())))
+        if time.monotonic() < self._next_scan:
+            return set(), False
+        self._next_scan = time.monotonic() + self._interval
+        snapshot = self._scan()
+        names = {
+            name
+            for name, state in snapshot.items()
+            if self._snapshot.get(name) != state
+        }
+        self._snapshot = snapshot
+        return names, False
+
+    def close(self):
+        pass
+
+
+class DirectoryWatcher:
+    """
+    Watches the assets directory and ingests the new and modified feed files within seconds.
+    The changes are reported by inotify, or by a polling scan when inotify isn't available. A file is
+    extracted once it has no new events for the debounce period and its size and mtime are stable, so
+    partially written files are skipped. The files that are ready at the same time are extracted together on a
+    bounded thread pool, so a burst of files is spread over the EXTRACTION_WORKERS processes of the extractor,
+    a file is never extracted twice at the same time.
+    A reconciliation scan runs on start, after lost events and every WATCHER_RECONCILE_INTERVAL seconds, the files
+    missing from the ingestion manifest are handled like changed files
+    """
+
+    # The longest blocking wait so stop() is noticed quickly, and the shortest one so the files
+    # waiting for a running extraction don't spin the loop
+    MAX_WAIT = 1.0
+    MIN_WAIT = 0.05
+
+    def __init__(
+        self,
+        extractor,
+        directory: str = None,
+        mode: str = None,
+        debounce: float = None,
+        max_workers: int = None,
+        poll_interval: float = None,
+        reconcile_interval: float = None,
+    ):
+        self.extractor = extractor
+        self.directory = directory or InternalConfig.ASSETS_DIR_PATH
+        self.mode = mode or InternalConfig.WATCHER_MODE
+        self.debounce = (
+            InternalConfig.WATCHER_DEBOUNCE if debounce is None else debounce
+        )
+        self.poll_interval = poll_interval or InternalConfig.WATCHER_POLL_INTERVAL
+        self.reconcile_interval = (
+            reconcile_interval or InternalConfig.WATCHER_RECONCILE_INTERVAL
+        )
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers or InternalConfig.WATCHER_WORKERS,
+            thread_name_prefix="directory-watcher",
+        )
+        # File path to (last event time, size and mtime at that time)
+        self._pending = {}
+        self._in_flight = set()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _open_source(self):
+        if self.mode in ("auto", "inotify"):
+            try:
+                source = _InotifySource(self.directory)
+                logger.info(f"Watching {self.directory} with inotify")
+                return source
+            except (OSError, AttributeError) as exc:
+                if self.mode == "inotify":
+                    raise
+                logger.warning(f"inotify isn't available, polling instead :: {exc}")
+        logger.info(f"Polling {self.directory} every {self.poll_interval}s")
+        return _PollingSource(self.directory, self.poll_interval)
+
+    @staticmethod
+    def _stat(file_path: str):
+        try:
+            stat = os.stat(file_path)
+        except FileNotFoundError:
+            return None
+        return stat.st_size, stat.st_mtime_ns
+
+    def _mark_changed(self, file_names: Iterable[str], now: float) -> None:
+        for file_name in file_names:
+            if is_feed_file(file_name):
+                file_path = os.path.join(self.directory, file_name)
+                self._pending[file_path] = (now, self._stat(file_path))
+
+    def _submit_ready_files(self, now: float) -> None:
+        ready_files = []
+        for file_path, (changed_at, state) in list(self._pending.items()):
+            if now - changed_at < self.debounce:
+                continue
+            current_state = self._stat(file_path)
+            if current_state is None:
+                # Deleted or moved away before it settled
+                del self._pending[file_path]
+                continue
+            if current_state != state:
+                # Still being written
+                self._pending[file_path] = (now, current_state)
+                continue
+            with self._lock:
+                if file_path in self._in_flight:
+                    # Checked again after another debounce period
+                    self._pending[file_path] = (now, current_state)
+                    continue
+                self._in_flight.add(file_path)
+            del self._pending[file_path]
+            ready_files.append(file_path)
+        if ready_files:
+            self._executor.submit(self._extract, ready_files)
+
+    def _extract(self, file_paths: List[str]) -> None:
+        try:
+            self.extractor.extract_changed_files(file_paths)
+        except Exception as exc:
+            logger.error(
+                f"Error while extracting the watched files {', '.join(file_paths)} :: {exc}"
+            )
+        finally:
+            with self._lock:
+                self._in_flight.difference_update(file_paths)
+
+    def _reconcile(self, now: float) -> None:
+        # The files missing from the manifest go through the same debounce and in flight checks as the events,
+        # so a file that is still being written or already being extracted isn't extracted again
+        logger.info(f"Reconciling {self.directory} with the ingestion manifest")
+        try:
+            file_paths = [
+                os.path.join(self.directory, file_name)
+                for file_name in os.listdir(self.directory)
+                if is_feed_file(file_name)
+            ]
+            unrecorded_files = self.extractor.find_unrecorded_files(file_paths)
+        except Exception as exc:
+            logger.error(f"Error while reconciling {self.directory} :: {exc}")
+            return
+        with self._lock:
+            # Their debounce isn't restarted, the running extractions cover their files
+            known_files = set(self._pending) | self._in_flight
+        self._mark_changed(
+            (
+                os.path.basename(file_path)
+                for file_path in unrecorded_files
+                if file_path not in known_files
+            ),
+            now,
+        )
+
+    def _next_timeout(self, now: float, next_reconcile: float) -> float:
+        deadlines = [next_reconcile] + [
+            changed_at + self.debounce for changed_at, _ in self._pending.values()
+        ]
+        return max(self.MIN_WAIT, min(min(deadlines) - now, self.MAX_WAIT))
+
+    def run(self) -> None:
+        """
+        This function watches the directory until stop() is called, it blocks the calling thread
+        """
+        source = self._open_source()
+        try:
+            self._reconcile(time.monotonic())
+            next_reconcile = time.monotonic() + self.reconcile_interval
+            while not self._stop.is_set():
+                file_names, overflow = source.wait(
+                    self._next_timeout(time.monotonic(), next_reconcile)
+                )
+                now = time.monotonic()
+                self._mark_changed(file_names, now)
+                if overflow or now >= next_reconcile:
+                    if overflow:
+                        logger.warning("inotify events were lost, reconciling...")
+                    self._reconcile(now)
+                    next_reconcile = time.monotonic() + self.reconcile_interval
+                self._submit_ready_files(now)
+        finally:
+            source.close()
+
+    def start(self) -> None:
+        """
+        This function starts watching the directory on a background thread
+        """
+        self._thread = threading.Thread(
+            target=self.run, name="directory-watcher", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self) -> None:
+        """
+        This function stops watching and waits for the running extractions
+        """
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        self._executor.shutdown(wait=True)
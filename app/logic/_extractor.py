@@ -1,41 +1,142 @@
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from datetime import datetime
-from typing import Union
-import re
+from typing import BinaryIO, Callable, Dict, Iterable, Iterator, List, Set, Union
 import os
 import logging
-
-from app.database.mongo_odm import Product
-from app.configs.config import InternalConfig, configure_logging
+import multiprocessing
+import time
+
+from app.database.bulk_writer import BulkProductWriter
+from app.database.catalog_stats import CatalogStatsStore
+from app.database.ingestion_checkpoints import IngestionCheckpointStore
+from app.database.mongo_connection import connect_mongo
+from app.database.mongo_odm import IngestionManifest, Product
+from app.database.product_record import ProductRecord
+from app.configs.config import (
+    TIMESTAMP_FORMAT,
+    InternalConfig,
+    configure_worker_logging,
+    worker_log_queue,
+)
+from app.logic._description_parser import parse_description
+from app.logic._feed_readers import is_feed_file, open_feeds
+from app.logic._field_mapping import ProductFieldMapper, search_text
+from app.logic._keyword_resolver import PRODUCT_DETAIL_KEYS
+from app.utils.cache_utils import MISSING, LRUTTLCache
+from app.utils.file_utils import file_content_hash
+from app.utils.iter_utils import chunked
+from app.utils.metrics_utils import (
+    INGESTION_PRODUCTS_PER_SECOND,
+    INGESTION_STAGE_SECONDS,
+    MONGO_ROUND_TRIPS,
+    timed_iter,
+)
+
+from pymongo import UpdateOne
 
 import xml.etree.ElementTree as ET
-from bs4 import BeautifulSoup
 
-configure_logging()
 logger = logging.getLogger(__name__)
 
+# The fields of GET /api/search that the products ingested before the search existed are missing
+SEARCH_BACKFILL_FIELDS = (
+    "product_info",
+    "search_name",
+    "search_fabric",
+    "search_product_info",
+)
+
+
+class ProductElementStream:
+    """
+    Picks the completed <Product> elements out of streaming parse events, it keeps its state between the calls
+    so the events of an XMLPullParser can be consumed while the data is still arriving
+    """
+
+    def __init__(self):
+        self._root = None
+        self._depth = 0
+
+    def consume(self, events: Iterable[tuple]) -> Iterator[ET.Element]:
+        """
+        This function yields the <Product> children of the root from the given ("start" / "end", element) events,
+        the root is cleared after every product so the consumed elements can be garbage collected
+
+        Args:
+            - events : Iterable[tuple] (iterparse or XMLPullParser.read_events() events)
+
+        Yields:
+            - product : ET.Element (only valid until the next one is requested)
+        """
+        for event, elem in events:
+            if event == "start":
+                if self._root is None:
+                    self._root = elem
+                self._depth += 1
+                continue
+            self._depth -= 1
+            # Only the direct children of the root are products, same as root.findall("Product")
+            if self._depth == 1 and elem.tag == "Product":
+                yield elem
+                self._root.clear()
+
 
 class Extractor:
-    def _extract_size_info_from_extras(self, info_list: list) -> Union[str, None]:
+    def __init__(
+        self,
+        write_mode: str = None,
+        on_products_written: Callable[[Union[List[dict], None]], None] = None,
+        detail_name_mapping: Dict[str, str] = None,
+        detail_name_resolver: Callable[[str], Union[str, None]] = None,
+    ):
+        # Called with the written product dicts, or None when they are unknown (written by worker processes)
+        self.on_products_written = on_products_written
+        # The catalog stats are kept up to date from every written batch
+        self.catalog_stats = CatalogStatsStore()
+        self.writer = BulkProductWriter(
+            mode=write_mode,
+            on_written=on_products_written,
+            catalog_stats=self.catalog_stats,
+        )
+        # The progress of the feeds being ingested, a restarted ingestion continues after the committed products
+        self.checkpoints = IngestionCheckpointStore()
+        # The unknown <ProductDetail> names of the supplier feeds to the known ones, e.g. {"Renk": "Color"},
+        # the names missing from the mapping are looked up with the resolver and kept for DETAIL_NAME_CACHE_TTL.
+        # The resolver is pickled to the worker processes so it must be picklable, e.g. KeywordResolver.resolve_known
+        self.detail_name_mapping = dict(detail_name_mapping or {})
+        self.detail_name_resolver = detail_name_resolver
+        self.resolved_detail_names = LRUTTLCache(
+            max_size=InternalConfig.DETAIL_NAME_CACHE_SIZE,
+            ttl=InternalConfig.DETAIL_NAME_CACHE_TTL,
+        )
+        self.field_mapper = ProductFieldMapper()
+
+    def _map_detail_names(self, product_details: dict) -> dict:
         """
-        This function extracts the sample size data from the given list of strings
+        This function renames the unknown detail names of a product to the known ones with the detail name mapping,
+        a name is never renamed over a detail the product already has
 
         Args:
-            - info_list : list
+            - product_details : dict (detail name to value)
+
         Returns:
-            - extracted_text : str (sample size info ex. S/36)
-            - None (indicating there is no info)
+            - product_details : dict (the same dict, renamed in place)
         """
-        try:
-            for item in info_list:
-                match = re.search(r"ürün(.*?)bedendir", item)
-
-                if match:
-                    extracted_text = match.group(1)
-                    logger.info("Extracted the sample size successfully")
-                    return extracted_text
-        except Exception as exc:
-            logger.warning(f"Couldn't extract the sample size... :: {exc}")
-            return None
+        for name in [
+            name for name in product_details if name not in PRODUCT_DETAIL_KEYS
+        ]:
+            key = self.detail_name_mapping.get(name, MISSING)
+            if key is MISSING:
+                key = self.resolved_detail_names.get(name)
+            if key is MISSING:
+                key = None
+                if self.detail_name_resolver is not None:
+                    key = self.detail_name_resolver(name)
+                    key = None if key is MISSING else key
+                self.resolved_detail_names.set(name, key)
+            if key in PRODUCT_DETAIL_KEYS and key not in product_details:
+                product_details[key] = product_details.pop(name)
+        return product_details
 
     def _extract_from_description(self, description_data: str) -> dict:
         """
@@ -52,33 +153,170 @@ class Extractor:
             - TypeError with the exception
         """
         try:
-            soup = BeautifulSoup(description_data, "html.parser")
-
-            # Extract text from <li> tags
-            items = [item.get_text(strip=True) for item in soup.find_all("li")]
-
-            # Create a dictionary
-            info_dict = {"additional_info": []}
-            for item in items:
-                parts = item.split(":", 1)  # Split at the first occurrence of ':'
-                if len(parts) == 2:
-                    key, value = parts
-                    info_dict[key.strip()] = value.strip()
-                else:
-                    info_dict["additional_info"] = info_dict["additional_info"] + [item]
-            logger.info("Extracted the description successfully")
+            start = time.perf_counter()
+            info_dict = parse_description(description_data)
+            INGESTION_STAGE_SECONDS.observe(
+                time.perf_counter() - start, stage="description"
+            )
             return info_dict
         except Exception as exc:
             raise TypeError(
                 f"Something went wrong during Description data extraction :: {exc}"
             )
 
+    def _iter_product_elements(
+        self, source: Union[str, BinaryIO]
+    ) -> Iterator[ET.Element]:
+        """
+        This function streams the <Product> elements of the XML file with iterparse instead of building the whole tree,
+        every element is cleared after it's consumed so the memory stays flat regardless of the file size
+
+        Args:
+            - source : str or BinaryIO (File path of the XML file or its content stream, see _feed_readers)
+
+        Yields:
+            - product : ET.Element (a completely parsed <Product> element, only valid until the next one is requested)
+        """
+        return ProductElementStream().consume(
+            ET.iterparse(source, events=("start", "end"))
+        )
+
+    def _read_raw_product(self, product: ET.Element, xml_path: str) -> dict:
+        """
+        This function reads the raw fields of a single <Product> element, the description is parsed
+        and the detail names are mapped but the values are left as they are, see ProductFieldMapper
+
+        Args:
+            - product : ET.Element (<Product> element of the XML file)
+            - xml_path : str (File path of the XML file)
+
+        Returns:
+            - raw_product : dict
+        """
+        image_paths = []
+        images = product.find("Images")
+        if images is not None:
+            image_paths = [image.get("Path") for image in images.findall("Image")]
+
+        product_details = {}
+        details = product.find("ProductDetails")
+        if details is not None:
+            product_details = {
+                detail.get("Name"): detail.get("Value")
+                for detail in details.findall("ProductDetail")
+            }
+            self._map_detail_names(product_details)
+
+        description_dict = {}
+        description = product.find("Description")
+        if description is not None:
+            description_dict = self._extract_from_description(description.text.strip())
+
+        return {
+            "stock_code": product.get("ProductId", "N/A"),
+            "name": product.get("Name", "N/A"),
+            "images": image_paths,
+            "details": product_details,
+            "description": description_dict,
+            "file_path": xml_path,
+        }
+
+    def _build_product_dict(self, product: ET.Element, xml_path: str) -> ProductRecord:
+        """
+        This function converts a single <Product> element to a dict as declared
+
+        Args:
+            - product : ET.Element (<Product> element of the XML file)
+            - xml_path : str (File path of the XML file)
+
+        Returns:
+            - product_record : ProductRecord (the product to be written to mongo)
+        """
+        return self.field_mapper.map_product(self._read_raw_product(product, xml_path))
+
+    def _iter_products_from_xml_file(
+        self,
+        xml_path: str,
+        source: Union[str, BinaryIO] = None,
+        skip: int = 0,
+        skipped_stock_codes: Set[str] = None,
+    ) -> Iterator[ProductRecord]:
+        """
+        This function is the streaming version of _extract_data_from_xml_file, it yields one product record per <Product>
+        without keeping the tree or the previous products in memory
+
+        Args:
+            - xml_path : str (File path of the XML file, the file path of the products)
+            - source : str or BinaryIO (the content stream of the feed when it isn't read from xml_path)
+            - skip : int (number of the first products to skip, they are parsed but not read nor mapped)
+            - skipped_stock_codes : Set[str] (optional, the stock codes of the skipped products are added to it)
+
+        Yields:
+            - product_record : ProductRecord (the product to be written to mongo)
+        """
+        elements = self._iter_product_elements(xml_path if source is None else source)
+        if skip:
+            elements = self._skip_product_elements(elements, skip, skipped_stock_codes)
+        return self.field_mapper.map_products(
+            self._read_raw_product(product, xml_path)
+            for product in timed_iter(elements, INGESTION_STAGE_SECONDS, stage="parse")
+        )
+
+    def _skip_product_elements(
+        self,
+        elements: Iterator[ET.Element],
+        skip: int,
+        skipped_stock_codes: Set[str] = None,
+    ) -> Iterator[ET.Element]:
+        """
+        This function drops the first skip elements, only their stock codes are read
+        """
+        for ordinal, product in enumerate(elements):
+            if ordinal >= skip:
+                yield product
+            elif skipped_stock_codes is not None:
+                skipped_stock_codes.add(product.get("ProductId", "N/A"))
+
+    def _iter_products_from_chunks(
+        self, chunks: Iterable[bytes], xml_path: str
+    ) -> Iterator[ProductRecord]:
+        """
+        This function parses the XML incrementally with XMLPullParser while the chunks arrive,
+        the products are yielded as soon as their </Product> tag is received
+
+        Args:
+            - chunks : Iterable[bytes] (the raw content of the XML file in any chunk size)
+            - xml_path : str (File path the content is written to)
+
+        Yields:
+            - product_record : ProductRecord (the product to be written to mongo)
+        """
+        return self.field_mapper.map_products(
+            self._iter_raw_products_from_chunks(chunks, xml_path)
+        )
+
+    def _iter_raw_products_from_chunks(
+        self, chunks: Iterable[bytes], xml_path: str
+    ) -> Iterator[dict]:
+        """
+        This function yields the raw products of the chunks as soon as their </Product> tag is received
+        """
+        parser = ET.XMLPullParser(events=("start", "end"))
+        elements = ProductElementStream()
+        for chunk in chunks:
+            parser.feed(chunk)
+            for product in elements.consume(parser.read_events()):
+                yield self._read_raw_product(product, xml_path)
+        parser.close()
+        for product in elements.consume(parser.read_events()):
+            yield self._read_raw_product(product, xml_path)
+
     def _extract_data_from_xml_file(
         self,
         xml_path: str,
     ) -> list:
         """
-        This function extracts all the data to a dict as declared
+        This function extracts all the data to a dict as declared, prefer _iter_products_from_xml_file for big files
 
         Args:
             xml_path : str (File path of the XML file)
@@ -86,171 +324,652 @@ class Extractor:
         Returns:
             products_list : List[Dict] (list of the documents to be written to mongo)
         """
+        return [
+            product_record.to_dict()
+            for product_record in self._iter_products_from_xml_file(xml_path)
+        ]
 
-        tree = ET.parse(xml_path)
-        root = tree.getroot()
-
-        # Create a list to store the dictionaries for each product
-        products_list = []
+    def _save_product_docs_to_mongo(
+        self,
+        products: Iterable[Union[ProductRecord, dict]],
+        write_mode: str = None,
+        file_path: str = None,
+        on_batch: Callable[[dict], None] = None,
+        resumed_stock_codes: Set[str] = None,
+        on_batch_groups: Callable[[List[tuple]], None] = None,
+    ) -> dict:
+        """
+        This funtion saves the documents to mongo with batched bulk upserts keyed on stock_code,
+        the products are consumed in bounded batches so a generator can be passed without materializing the whole file
 
-        # Iterate over each product
-        for product in root.findall("Product"):
-            images = product.find("Images")
-            if images is not None:
-                image_paths = [image.get("Path") for image in images.findall("Image")]
+        Args:
+            - products: Iterable[ProductRecord or Dict] (list or generator of the products)
+            - write_mode : str (overrides the write mode of the extractor, see BulkProductWriter.MODES)
+            - file_path : str (the file of the products, required in delta mode)
+            - on_batch : Callable (optional progress callback, called with the counts of every batch)
+            - resumed_stock_codes : Set[str] (the products committed before a resume, see BulkProductWriter.write)
+            - on_batch_groups : Callable (optional, see BulkProductWriter.write_batch)
 
-            details = product.find("ProductDetails")
-            if details is not None:
-                product_details = {
-                    detail.get("Name"): detail.get("Value")
-                    for detail in details.findall("ProductDetail")
-                }
+        Returns:
+            - report : dict (summed and per batch counts, see BulkProductWriter.write)
 
-            description = product.find("Description")
-            if description is not None:
-                description_dict = self._extract_from_description(
-                    description.text.strip()
+        Raises:
+            -  TypeError indicating something is wrong with the exception
+        """
+        try:
+            writer = self.writer
+            if write_mode is not None and write_mode != writer.mode:
+                writer = BulkProductWriter(
+                    mode=write_mode,
+                    on_written=self.on_products_written,
+                    catalog_stats=self.catalog_stats,
                 )
+            start = time.perf_counter()
+            report = writer.write(
+                products, file_path, on_batch, resumed_stock_codes, on_batch_groups
+            )
+            elapsed = time.perf_counter() - start
+            if report["products"] and elapsed > 0:
+                INGESTION_PRODUCTS_PER_SECOND.observe(report["products"] / elapsed)
+            logger.info(
+                f"Ingested {report['products']} products of {file_path} in {elapsed:.2f}s :: "
+                f"inserted={report['inserted']} matched={report['matched']} modified={report['modified']}"
+            )
+            return report
+        except Exception as exc:
+            raise TypeError(f"Error while saving documents to db... :: {exc}")
 
-            # Make a dynamic solution for Ürün Ölçümleri case
-            def return_valid_key(_key, _dict):
-                for __key in _dict.keys():
-                    if _key in __key:
-                        return __key
-                    else:
-                        None
+    def _ingest_feed(
+        self,
+        feed_path: str,
+        source: BinaryIO,
+        file_path: str,
+        write_mode: str = None,
+        on_batch: Callable[[dict], None] = None,
+        content_hash: str = None,
+        checkpoint: dict = None,
+    ) -> dict:
+        """
+        This function streams a single feed of the file to mongo. With a content hash the number of the committed
+        products is checkpointed after every written batch, and the products committed by a previous ingestion of the
+        same content are skipped. The upserts are idempotent so the batch written right before a crash is replayed
+        without changing the products. The catalog stats groups of every batch are checkpointed before its products
+        are written, a resume recomputes them from the products since the crash may have come before their deltas
 
-            # Converting float to handle the cases like "2,24"
-            def convert_to_float(_variable):
-                try:
-                    if "," in _variable or "." in _variable:
-                        return float(_variable.replace(",", "."))
-                    elif isinstance(_variable, int):
-                        return float(_variable)
-                    elif isinstance(_variable, str):
-                        return float(_variable)
-                    else:
-                        return _variable
-                except Exception as exc:
-                    raise TypeError(
-                        f"Error while converting variable:{_variable} :: {exc}"
-                    )
+        Args:
+            - feed_path : str (see open_feeds)
+            - source : BinaryIO
+            - file_path : str
+            - write_mode : str (overrides the write mode of the extractor)
+            - on_batch : Callable (optional progress callback, called with the counts of every written batch)
+            - content_hash : str (the content hash of the file, the feed isn't checkpointed without it)
+            - checkpoint : dict (the saved checkpoint of the feed, see IngestionCheckpointStore.load)
 
-            now = datetime.now()
-            formatted_now = now.strftime("%Y-%m-%dT%H:%M:%S.%f+00:0")
-            product_dict = {
-                "stock_code": product.get("ProductId", "N/A"),
-                "color": [product_details.get("Color", "N/A")],
-                "discounted_price": convert_to_float(
-                    product_details.get("DiscountedPrice", "N/A")
-                ),
-                "images": image_paths,
-                "is_discounted": (
-                    True
-                    if convert_to_float(product_details.get("DiscountedPrice", 0))
-                    < convert_to_float(product_details.get("Price", 0))
-                    else False
-                ),
-                "name": product.get("Name", "N/A"),
-                "price": convert_to_float(product_details.get("Price", "N/A")),
-                "price_unit": "USD",  # Couldn't find any logical way to get the unit.
-                "product_type": product_details.get("ProductType", "N/A"),
-                "quantity": int(product_details.get("Quantity", "N/A")),
-                "sample_size": self._extract_size_info_from_extras(
-                    description_dict.get("additional_info", None)
-                ),
-                "series": product_details.get("Series", "N/A"),
-                "status": (
-                    "Active"
-                    if int(product_details.get("Quantity", 0)) > 0
-                    else "Deactive"
-                ),
-                "fabric": description_dict.get(
-                    return_valid_key("Kumaş Bilgisi", description_dict), "N/A"
-                ),
-                "model_measurements": description_dict.get(
-                    return_valid_key("Model Ölçüleri", description_dict), "N/A"
-                ),
-                "product_measurements": description_dict.get(
-                    return_valid_key("Ürün Ölçüleri", description_dict), "N/A"
-                ),
-                "createdAt": formatted_now,
-                "updatedAt": formatted_now,
-                "file_path": xml_path,
+        Returns:
+            - report : dict (counts of the feed with the number of the resumed products, see BulkProductWriter.write)
+        """
+        checkpoint = checkpoint or {}
+        committed_products = checkpoint.get("committed_products", 0)
+        if checkpoint.get("completed"):
+            logger.info(
+                f"Skipping the ingested feed {feed_path} :: {committed_products} products"
+            )
+            return {
+                "products": 0,
+                "inserted": 0,
+                "matched": 0,
+                "modified": 0,
+                "resumed": committed_products,
             }
+        if committed_products:
             logger.info(
-                f"Created the product document successfully for {product.get('ProductId', 'N/A')}"
+                f"Resuming {feed_path} after {committed_products} committed products..."
+            )
+        if checkpoint.get("pending_groups"):
+            self.catalog_stats.recompute_groups(checkpoint["pending_groups"])
+
+        progress = {"committed_products": committed_products}
+
+        def on_feed_batch(counts: dict):
+            progress["committed_products"] += counts["size"]
+            if content_hash is not None:
+                self.checkpoints.save(
+                    feed_path, file_path, content_hash, progress["committed_products"]
+                )
+            if on_batch is not None:
+                on_batch(counts)
+
+        def on_feed_batch_groups(group_keys: List[tuple]):
+            self.checkpoints.save(
+                feed_path,
+                file_path,
+                content_hash,
+                progress["committed_products"],
+                pending_groups=group_keys,
             )
-            products_list.append(product_dict)
 
-        return products_list
+        resumed_stock_codes = set()
+        feed_report = self._save_product_docs_to_mongo(
+            self._iter_products_from_xml_file(
+                feed_path, source, committed_products, resumed_stock_codes
+            ),
+            write_mode,
+            feed_path,
+            on_feed_batch,
+            resumed_stock_codes,
+            on_feed_batch_groups if content_hash is not None else None,
+        )
+        feed_report.pop("batches")
+        feed_report["resumed"] = committed_products
+        if content_hash is not None:
+            # The next feeds of an archive may still fail, this one isn't parsed again on the resume
+            self.checkpoints.save(
+                feed_path,
+                file_path,
+                content_hash,
+                progress["committed_products"],
+                completed=True,
+            )
+        return feed_report
 
-    def _save_product_docs_to_mongo(self, products_list: list) -> None:
+    def _ingest_feed_file(
+        self,
+        file_path: str,
+        write_mode: str = None,
+        on_batch: Callable[[dict], None] = None,
+        content_hash: str = None,
+    ) -> dict:
         """
-        This funtion saves the documents to mongo using mongoengine odm
+        This function streams every XML feed of the file to mongo with the reader of its format,
+        the compressed feeds and the archive members are parsed while they are decompressed without temporary files.
+        With a content hash the ingestion continues from the checkpoints of the feeds, see _ingest_feed
 
         Args:
-            - product_list: List[Dict] (list of dictionary of products)
+            - file_path : str
+            - write_mode : str (overrides the write mode of the extractor)
+            - on_batch : Callable (optional progress callback, called with the counts of every written batch)
+            - content_hash : str (optional, the content hash of the file to checkpoint the ingestion)
 
         Returns:
-            - None
+            - report : dict (summed counts of all the feeds of the file, see BulkProductWriter.write)
 
         Raises:
-            -  TypeError indicating something is wrong with the exception
+            - TypeError indicating something is wrong with the exception
         """
-        try:
-            for product_doc in products_list:
-                matched_documents = Product.objects(
-                    stock_code=product_doc["stock_code"]
-                )
-                if not matched_documents:
-                    mongo_product_doc = Product(**product_doc)
-                    mongo_product_doc.save()
-                logger.info(
-                    f"XML extraction completed successfully for {product_doc['stock_code']}..."
+        checkpoints = {}
+        if content_hash is not None:
+            checkpoints = self.checkpoints.load(file_path, content_hash)
+        report = None
+        with open_feeds(file_path) as feeds:
+            for feed_path, source in feeds:
+                feed_report = self._ingest_feed(
+                    feed_path,
+                    source,
+                    file_path,
+                    write_mode,
+                    on_batch,
+                    content_hash,
+                    checkpoints.get(feed_path),
                 )
-        except Exception as exc:
-            raise TypeError(f"Error while saving documents to db... :: {exc}")
+                if report is None:
+                    report = feed_report
+                else:
+                    for key, value in feed_report.items():
+                        report[key] = report.get(key, 0) + value
+        if report is None:
+            raise TypeError(f"There is no XML feed in the file... :: {file_path}")
+        return report
 
-    def extract(self, file_name):
+    def extract(self, file_name: str, on_batch: Callable[[dict], None] = None) -> dict:
         """
-        This is the main function of extracting xml file
+        This is the main function of extracting xml file, plain, gzip, bz2 and zip feeds are supported,
+        see _feed_readers
 
         Args:
             - file_name : str (only the name of the file)
+            - on_batch : Callable (optional progress callback, called with the counts of every written batch)
 
         Returns:
-            - None
+            - report : dict (summed counts of the extraction, see BulkProductWriter.write)
 
         Raises:
             - TypeError indicating something is wrong with the exception
         """
-        if file_name.endswith(".xml"):
-            products_list = self._extract_data_from_xml_file(
-                os.path.join(InternalConfig.ASSETS_DIR_PATH, file_name)
-            )
-            self._save_product_docs_to_mongo(products_list)
+        if is_feed_file(file_name):
+            file_path = os.path.join(InternalConfig.ASSETS_DIR_PATH, file_name)
+            report = self._ingest_feed_file(file_path, on_batch=on_batch)
             logger.info("XML extraction completed successfully...")
+            return report
         else:
             raise TypeError(f"The requested file is not in XML format...")
 
-    def extract_periodically(self):
+    def extract_stream(
+        self,
+        chunks: Iterable[bytes],
+        file_name: str,
+        on_batch: Callable[[dict], None] = None,
+    ) -> dict:
+        """
+        This function extracts an XML file from its content chunks while they are being received,
+        see _iter_products_from_chunks
+
+        Args:
+            - chunks : Iterable[bytes]
+            - file_name : str (only the name of the file)
+            - on_batch : Callable (optional progress callback, called with the counts of every written batch)
+
+        Returns:
+            - report : dict (summed counts of the extraction, see BulkProductWriter.write)
         """
-        This function checks the directory for the unrecognized xml files and do the extraction accordingly
+        file_path = os.path.join(InternalConfig.ASSETS_DIR_PATH, file_name)
+        report = self._save_product_docs_to_mongo(
+            self._iter_products_from_chunks(chunks, file_path),
+            file_path=file_path,
+            on_batch=on_batch,
+        )
+        report.pop("batches")
+        logger.info("Streaming XML extraction completed successfully...")
+        return report
+
+    def _extract_file(
+        self, file_path: str, write_mode: str = None, content_hash: str = None
+    ) -> dict:
         """
+        This function extracts and saves a single file, the failures are returned instead of raised
+        so one bad file doesn't abort the others
+
+        Args:
+            - file_path : str
+            - write_mode : str (overrides the write mode of the extractor)
+            - content_hash : str (optional, the content hash of the file to checkpoint the ingestion)
 
+        Returns:
+            - file_report : dict (summed counts of the file or the error)
+        """
         try:
-            directory_list = os.listdir(InternalConfig.ASSETS_DIR_PATH)
-            xml_paths = [
-                os.path.join(InternalConfig.ASSETS_DIR_PATH, file)
-                for file in directory_list
-                if file.endswith(".xml")
-            ]
-            unique_names = Product.objects.distinct("file_path")
-            unrecognized_files_list = list(set(xml_paths) - set(unique_names))
-            for file_path in unrecognized_files_list:
-                product_list = self._extract_data_from_xml_file(file_path)
-                self._save_product_docs_to_mongo(product_list)
-            logger.info("Periodic XML extraction ran successfully...")
+            # The per batch counts are already logged, the report stays compact for the worker processes
+            file_report = self._ingest_feed_file(
+                file_path, write_mode, content_hash=content_hash
+            )
+            file_report["file_path"] = file_path
+            return file_report
         except Exception as exc:
-            logger.error(f"Error while running periodic extraction :: {exc}")
+            logger.error(f"Error while extracting {file_path} :: {exc}")
+            return {"file_path": file_path, "error": str(exc)}
+
+    def _extract_files(
+        self,
+        file_paths: List[str],
+        write_modes: Dict[str, str] = None,
+        content_hashes: Dict[str, str] = None,
+    ) -> List[dict]:
+        """
+        This function extracts the given files, in parallel worker processes when EXTRACTION_WORKERS is more than 1.
+        Every worker streams its file and writes the batches with its own mongo client
+
+        Args:
+            - file_paths : List[str]
+            - write_modes : Dict[str, str] (optional write mode per file path)
+            - content_hashes : Dict[str, str] (optional content hash per file path, to checkpoint the ingestion)
+
+        Returns:
+            - file_reports : List[Dict]
+        """
+        write_modes = write_modes or {}
+        content_hashes = content_hashes or {}
+        workers = min(InternalConfig.EXTRACTION_WORKERS, len(file_paths))
+        if workers <= 1:
+            return [
+                self._extract_file(
+                    file_path,
+                    write_modes.get(file_path),
+                    content_hashes.get(file_path),
+                )
+                for file_path in file_paths
+            ]
+
+        # spawn instead of fork, the mongo clients of the parent process aren't fork safe
+        with ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_extraction_worker,
+            initargs=(worker_log_queue(),),
+        ) as executor:
+            futures = {
+                executor.submit(
+                    _extract_file_in_worker,
+                    file_path,
+                    write_modes.get(file_path, self.writer.mode),
+                    self.detail_name_mapping,
+                    self.detail_name_resolver,
+                    content_hashes.get(file_path),
+                ): file_path
+                for file_path in file_paths
+            }
+            file_reports = []
+            for future in as_completed(futures):
+                try:
+                    file_reports.append(future.result())
+                except Exception as exc:
+                    # A crashed worker process only fails its own file
+                    logger.error(f"Error while extracting {futures[future]} :: {exc}")
+                    file_reports.append(
+                        {"file_path": futures[future], "error": str(exc)}
+                    )
+        if self.on_products_written is not None and any(
+            report.get("inserted") or report.get("modified") for report in file_reports
+        ):
+            self.on_products_written(None)
+        return file_reports
+
+    def find_unrecorded_files(self, file_paths: List[str]) -> List[str]:
+        """
+        This function returns the files that are missing from the ingestion manifest or whose size or mtime differs
+        from it, with a single query and without hashing them, see _find_changed_files for the full check
+
+        Args:
+            - file_paths : List[str]
+
+        Returns:
+            - file_paths : List[str]
+        """
+        MONGO_ROUND_TRIPS.inc(operation="find")
+        manifest = {
+            entry["file_path"]: (entry["size"], entry["mtime"])
+            for entry in IngestionManifest.objects(file_path__in=file_paths)
+            .only("file_path", "size", "mtime")
+            .as_pymongo()
+        }
+        unrecorded_files = []
+        for file_path in file_paths:
+            try:
+                stat = os.stat(file_path)
+            except FileNotFoundError:
+                continue
+            if manifest.get(file_path) != (stat.st_size, stat.st_mtime):
+                unrecorded_files.append(file_path)
+        return unrecorded_files
+
+    def _find_changed_files(self, file_paths: List[str]) -> Dict[str, dict]:
+        """
+        This function compares the files with the ingestion manifest and returns the new and modified ones.
+        Only the manifest entries of the given paths are fetched in one query, a file is hashed only when its
+        size or mtime differs from the manifest
+
+        Args:
+            - file_paths : List[str]
+
+        Returns:
+            - changed_files : Dict[str, Dict] (file path to the size, mtime, content_hash and modified flag)
+        """
+        MONGO_ROUND_TRIPS.inc(operation="find")
+        manifest = {
+            entry["file_path"]: entry
+            for entry in IngestionManifest.objects(file_path__in=file_paths)
+            .only("file_path", "size", "mtime", "content_hash")
+            .as_pymongo()
+        }
+        changed_files = {}
+        for file_path in file_paths:
+            stat = os.stat(file_path)
+            entry = manifest.get(file_path)
+            if (
+                entry is not None
+                and entry["size"] == stat.st_size
+                and entry["mtime"] == stat.st_mtime
+            ):
+                continue
+
+            content_hash = file_content_hash(file_path)
+            if entry is not None and entry["content_hash"] == content_hash:
+                # Touched but not changed, remember the new stat to skip the hashing next time
+                MONGO_ROUND_TRIPS.inc(operation="update")
+                IngestionManifest.objects(file_path=file_path).update_one(
+                    set__size=stat.st_size, set__mtime=stat.st_mtime
+                )
+                continue
+
+            changed_files[file_path] = {
+                "size": stat.st_size,
+                "mtime": stat.st_mtime,
+                "content_hash": content_hash,
+                "modified": entry is not None,
+            }
+        return changed_files
+
+    def record_ingested_file(self, file_path: str, file_state: dict) -> None:
+        """
+        This function upserts the manifest entry of a successfully ingested file and drops its checkpoints
+
+        Args:
+            - file_path : str
+            - file_state : dict (size, mtime and content_hash of the file as found by _find_changed_files)
+        """
+        MONGO_ROUND_TRIPS.inc(operation="update")
+        IngestionManifest.objects(file_path=file_path).update_one(
+            set__size=file_state["size"],
+            set__mtime=file_state["mtime"],
+            set__content_hash=file_state["content_hash"],
+            set__ingestedAt=datetime.now().strftime(TIMESTAMP_FORMAT),
+            upsert=True,
+        )
+        self.checkpoints.clear(file_path)
+
+    def discard_file(self, file_path: str) -> int:
+        """
+        This function deletes the products last written from a file along with its manifest entry and checkpoints,
+        e.g. the products a streaming extraction committed before its upload failed. The catalog stats of their groups
+        are recomputed, and a previous version of the file still on the disk is re-ingested by the next reconciliation
+        of the directory watcher since it isn't recorded anymore
+
+        Args:
+            - file_path : str
+
+        Returns:
+            - removed : int (number of the deleted products)
+        """
+        MONGO_ROUND_TRIPS.inc(operation="find")
+        product_docs = list(
+            Product._get_collection().find(
+                {"file_path": file_path},
+                dict.fromkeys(
+                    ("_id", "stock_code", "product_type", "series", "status"), 1
+                ),
+            )
+        )
+        removed = 0
+        if product_docs:
+            MONGO_ROUND_TRIPS.inc(operation="delete")
+            removed = (
+                Product._get_collection()
+                .delete_many({"_id": {"$in": [doc["_id"] for doc in product_docs]}})
+                .deleted_count
+            )
+            self.catalog_stats.recompute_groups(
+                self.catalog_stats.affected_groups(product_docs)
+            )
+            self.writer.product_version.bump(
+                invalidated_locally=self.on_products_written is not None
+            )
+            if self.on_products_written is not None:
+                self.on_products_written(product_docs)
+        MONGO_ROUND_TRIPS.inc(operation="delete")
+        IngestionManifest.objects(file_path=file_path).delete()
+        self.checkpoints.clear(file_path)
+        logger.info(f"Discarded {removed} products of {file_path}")
+        return removed
+
+    def extract_changed_files(self, file_paths: List[str]) -> List[dict]:
+        """
+        This function extracts the new and modified files among the given ones and records them in the ingestion
+        manifest, with the insert_new write mode the modified files are re-ingested with update_changed.
+        The ingestion of a file that was interrupted continues from its checkpoints if its content didn't change
+
+        Args:
+            - file_paths : List[str]
+
+        Returns:
+            - file_reports : List[Dict] (the reports of the extracted files, see _extract_file)
+        """
+        changed_files = self._find_changed_files(file_paths)
+        file_reports = self._extract_files(
+            list(changed_files),
+            {
+                file_path: BulkProductWriter.UPDATE_CHANGED
+                for file_path, file_state in changed_files.items()
+                if file_state["modified"]
+                and self.writer.mode == BulkProductWriter.INSERT_NEW
+            },
+            {
+                file_path: file_state["content_hash"]
+                for file_path, file_state in changed_files.items()
+            },
+        )
+        for report in file_reports:
+            if "error" not in report:
+                self.record_ingested_file(
+                    report["file_path"], changed_files[report["file_path"]]
+                )
+        return file_reports
+
+    def _set_search_fields(self, updates: List[tuple]) -> int:
+        """
+        This function writes the search fields of a batch of products with one unordered bulk_write, only the products
+        that don't have them yet are updated
+
+        Args:
+            - updates : List[tuple] (the filter of the product and the fields to set)
+
+        Returns:
+            - modified : int (number of the updated products)
+        """
+        if not updates:
+            return 0
+        MONGO_ROUND_TRIPS.inc(operation="bulk_write")
+        result = Product._get_collection().bulk_write(
+            [
+                UpdateOne(
+                    dict(product_filter, search_name={"$exists": False}),
+                    {"$set": fields},
+                )
+                for product_filter, fields in updates
+            ],
+            ordered=False,
+        )
+        if result.modified_count:
+            self.writer.product_version.bump(
+                invalidated_locally=self.on_products_written is not None
+            )
+        if self.on_products_written is not None and result.modified_count:
+            self.on_products_written(
+                [
+                    {"stock_code": product_filter["stock_code"]}
+                    for product_filter, _ in updates
+                ]
+            )
+        return result.modified_count
+
+    def backfill_search_fields(self, file_paths: List[str]) -> dict:
+        """
+        This function fills product_info and the search fields of the products ingested before they existed. The
+        product_info is read again from the feeds of the files, the products whose feed is gone only get the search
+        fields of their stored name and fabric. The fingerprints are left as they are, a product whose feed changed
+        since its ingestion is still updated by the next ingestion
+
+        Args:
+            - file_paths : List[str] (the feed files of the products, e.g. the files of the assets directory)
+
+        Returns:
+            - report : dict (number of the products updated from the feeds and from their stored fields)
+        """
+        batch_size = self.writer.batch_size
+        report = {"from_feeds": 0, "from_stored_fields": 0}
+        for file_path in file_paths:
+            try:
+                with open_feeds(file_path) as feeds:
+                    for feed_path, source in feeds:
+                        for product_records in chunked(
+                            self._iter_products_from_xml_file(feed_path, source),
+                            batch_size,
+                        ):
+                            report["from_feeds"] += self._set_search_fields(
+                                [
+                                    (
+                                        {
+                                            "stock_code": product_record.stock_code,
+                                            "file_path": feed_path,
+                                        },
+                                        {
+                                            field: product_record[field]
+                                            for field in SEARCH_BACKFILL_FIELDS
+                                        },
+                                    )
+                                    for product_record in product_records
+                                ]
+                            )
+            except Exception as exc:
+                logger.error(
+                    f"Error while backfilling the search fields of {file_path} :: {exc}"
+                )
+
+        while True:
+            MONGO_ROUND_TRIPS.inc(operation="find")
+            product_docs = list(
+                Product.objects(search_name__exists=False)
+                .only("stock_code", "name", "fabric")
+                .limit(batch_size)
+                .as_pymongo()
+            )
+            if not product_docs:
+                break
+            modified = self._set_search_fields(
+                [
+                    (
+                        {"stock_code": product_doc["stock_code"]},
+                        {
+                            "search_name": search_text(product_doc.get("name", "N/A")),
+                            "search_fabric": search_text(
+                                product_doc.get("fabric", "N/A")
+                            ),
+                            "search_product_info": "",
+                        },
+                    )
+                    for product_doc in product_docs
+                ]
+            )
+            if not modified:
+                break
+            report["from_stored_fields"] += modified
+        logger.info(
+            f"Backfilled the search fields of {report['from_feeds']} products from the feeds "
+            f"and {report['from_stored_fields']} from their stored fields"
+        )
+        return report
+
+
+def _init_extraction_worker(log_queue):
+    """
+    This function forwards the logging of a worker process to the parent process and opens its mongo connection
+
+    Args:
+        - log_queue : multiprocessing.Queue (the queue of the worker records, see worker_log_queue)
+    """
+    configure_worker_logging(log_queue)
+    connect_mongo()
+
+
+def _extract_file_in_worker(
+    file_path: str,
+    write_mode: str,
+    detail_name_mapping: Dict[str, str],
+    detail_name_resolver: Callable[[str], Union[str, None]] = None,
+    content_hash: str = None,
+) -> dict:
+    """
+    This function is the entrypoint of the worker processes, see Extractor._extract_files
+    """
+    return Extractor(
+        write_mode,
+        detail_name_mapping=detail_name_mapping,
+        detail_name_resolver=detail_name_resolver,
+    )._extract_file(file_path, content_hash=content_hash)
@@ -0,0 +1,127 @@
+import bz2
+import gzip
+import logging
+import mmap
+import os
+import zipfile
+from contextlib import contextmanager
+from typing import BinaryIO, Callable, ContextManager, Dict, Iterator, Tuple, Union
+
+from app.configs.config import InternalConfig
+
+logger = logging.getLogger(__name__)
+
+# A reader opens a feed file and yields its XML feeds as (feed path, binary stream) pairs,
+# the feed path is the file path of the products, e.g. "assets/feeds.zip/lonca.xml" for an archive member
+FeedReader = Callable[[str], ContextManager[Iterator[Tuple[str, BinaryIO]]]]
+
+_feed_readers: Dict[str, FeedReader] = {}
+
+
+def register_feed_reader(*suffixes: str) -> Callable[[FeedReader], FeedReader]:
+    """
+    This function registers the decorated reader for the file names ending with the given suffixes
+
+    Args:
+        - suffixes : str (e.g. ".xml.gz")
+
+    Returns:
+        - decorator
+    """
+
+    def decorator(reader: FeedReader) -> FeedReader:
+        for suffix in suffixes:
+            _feed_readers[suffix.lower()] = reader
+        return reader
+
+    return decorator
+
+
+def get_feed_reader(file_name: str) -> Union[FeedReader, None]:
+    """
+    This function returns the reader of the longest suffix the file name ends with
+
+    Args:
+        - file_name : str
+
+    Returns:
+        - reader : FeedReader or None (the file isn't a feed)
+    """
+    file_name = file_name.lower()
+    matching_suffixes = [
+        suffix for suffix in _feed_readers if file_name.endswith(suffix)
+    ]
+    if not matching_suffixes:
+        return None
+    return _feed_readers[max(matching_suffixes, key=len)]
+
+
+def is_feed_file(file_name: str) -> bool:
+    return get_feed_reader(file_name) is not None
+
+
+@contextmanager
+def open_feeds(file_path: str) -> Iterator[Iterator[Tuple[str, BinaryIO]]]:
+    """
+    This function opens the feeds of the file with its registered reader
+
+    Args:
+        - file_path : str
+
+    Returns:
+        - feeds : ContextManager of the (feed path, binary stream) pairs
+
+    Raises:
+        - TypeError indicating the file isn't a known feed format
+    """
+    reader = get_feed_reader(file_path)
+    if reader is None:
+        raise TypeError(
+            f"The requested file is not in a supported feed format... :: {', '.join(sorted(_feed_readers))}"
+        )
+    with reader(file_path) as feeds:
+        yield feeds
+
+
+@register_feed_reader(".xml")
+@contextmanager
+def _open_plain_feed(file_path: str) -> Iterator[Iterator[Tuple[str, BinaryIO]]]:
+    # The big files are memory mapped so the parser reads them from the page cache without the copies
+    # of the buffered reads, mmap can't map empty files
+    with open(file_path, "rb") as file:
+        size = os.fstat(file.fileno()).st_size
+        if size == 0 or size < InternalConfig.FEED_MMAP_THRESHOLD:
+            yield iter([(file_path, file)])
+            return
+        with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mapped_file:
+            yield iter([(file_path, mapped_file)])
+
+
+@register_feed_reader(".xml.gz")
+@contextmanager
+def _open_gzip_feed(file_path: str) -> Iterator[Iterator[Tuple[str, BinaryIO]]]:
+    with gzip.open(file_path, "rb") as file:
+        yield iter([(file_path, file)])
+
+
+@register_feed_reader(".xml.bz2")
+@contextmanager
+def _open_bz2_feed(file_path: str) -> Iterator[Iterator[Tuple[str, BinaryIO]]]:
+    with bz2.open(file_path, "rb") as file:
+        yield iter([(file_path, file)])
+
+
+@register_feed_reader(".zip")
+@contextmanager
+def _open_zip_feeds(file_path: str) -> Iterator[Iterator[Tuple[str, BinaryIO]]]:
+    with zipfile.ZipFile(file_path) as archive:
+
+        def iter_members():
+            for member in archive.infolist():
+                if member.is_dir() or not member.filename.lower().endswith(".xml"):
+                    continue
+                # Every member is decompressed while it's parsed, one at a time
+                with archive.open(member) as file:
+                    yield f"{file_path}/{member.filename}", file
+
+        yield iter_members()
@@ -0,0 +1,282 @@
+from datetime import datetime
+from functools import lru_cache
+from itertools import islice
+from typing import Iterable, Iterator, List, Tuple, Union
+import hashlib
+import json
+import logging
+import re
+import time
+
+from app.configs.config import TIMESTAMP_FORMAT, InternalConfig
+from app.database.product_record import ProductRecord
+from app.utils.metrics_utils import INGESTION_STAGE_SECONDS
+from app.utils.text_utils import fold_turkish
+
+logger = logging.getLogger(__name__)
+
+SAMPLE_SIZE_PATTERN = re.compile(r"ürün(.*?)bedendir")
+# The search fields are derived from the others
+FINGERPRINT_EXCLUDED_FIELDS = frozenset(
+    ["createdAt", "updatedAt", "fingerprint"]
+    + ["search_name", "search_fabric", "search_product_info"]
+)
+# json.dumps builds a new encoder on every call when any option is given
+FINGERPRINT_ENCODER = json.JSONEncoder(sort_keys=True, ensure_ascii=False)
+
+# The product fields read from the description and the description keys they are matched with,
+# a description key matches when it contains the given name, e.g. "Ürün Ölçüleri 2"
+DESCRIPTION_FIELDS = (
+    ("fabric", "Kumaş Bilgisi"),
+    ("model_measurements", "Model Ölçüleri"),
+    ("product_measurements", "Ürün Ölçüleri"),
+    ("product_info", "Ürün Bilgisi"),
+)
+
+
+def convert_to_float(value: Union[str, int, float]) -> float:
+    """
+    This function converts the price values of the feeds to float, the decimal separator may be "," e.g. "2,24"
+
+    Args:
+        - value : str or int or float
+
+    Returns:
+        - converted_value : float
+
+    Raises:
+        - TypeError indicating the value isn't a number
+    """
+    try:
+        if isinstance(value, str):
+            return float(value.replace(",", "."))
+        return float(value)
+    except Exception as exc:
+        raise TypeError(f"Error while converting variable:{value} :: {exc}")
+
+
+def convert_to_int(value: Union[str, int]) -> int:
+    """
+    This function converts the quantity values of the feeds to int
+
+    Raises:
+        - TypeError indicating the value isn't an integer
+    """
+    try:
+        return int(value)
+    except Exception as exc:
+        raise TypeError(f"Error while converting variable:{value} :: {exc}")
+
+
+@lru_cache(maxsize=1024)
+def match_description_keys(description_keys: Tuple[str, ...]) -> Tuple[str, ...]:
+    """
+    This function matches the description fields with the keys of a description, the feeds repeat the same
+    few key sets so every key set is scanned once and the matches are reused for the next products
+
+    Args:
+        - description_keys : Tuple[str, ...] (the keys of the description dict in order)
+
+    Returns:
+        - matched_keys : Tuple[str, ...] (the first matching key of every DESCRIPTION_FIELDS entry or None)
+    """
+    return tuple(
+        next((key for key in description_keys if name in key), None)
+        for _, name in DESCRIPTION_FIELDS
+    )
+
+
+def extract_sample_size(info_list: list) -> Union[str, None]:
+    """
+    This function extracts the sample size data from the given list of strings
+
+    Args:
+        - info_list : list
+    Returns:
+        - extracted_text : str (sample size info ex. S/36)
+        - None (indicating there is no info)
+    """
+    if not info_list:
+        return None
+    try:
+        for item in info_list:
+            match = SAMPLE_SIZE_PATTERN.search(item)
+
+            if match:
+                return match.group(1)
+    except Exception as exc:
+        logger.warning(f"Couldn't extract the sample size... :: {exc}")
+        return None
+
+
+def search_text(value: str) -> str:
+    """
+    This function folds a product field for the text index of the search, the missing values aren't indexed
+    """
+    return "" if value == "N/A" else fold_turkish(value)
+
+
+def fingerprint_product(product_dict: dict) -> str:
+    """
+    This function computes a stable fingerprint of the normalized product fields, the timestamps are left out
+    so an unchanged product in a re-delivered feed gets the same fingerprint
+
+    Args:
+        - product_dict : dict
+
+    Returns:
+        - fingerprint : str (sha1 hexdigest)
+    """
+    if not FINGERPRINT_EXCLUDED_FIELDS.isdisjoint(product_dict):
+        product_dict = {
+            key: value
+            for key, value in product_dict.items()
+            if key not in FINGERPRINT_EXCLUDED_FIELDS
+        }
+    return hashlib.sha1(FINGERPRINT_ENCODER.encode(product_dict).encode()).hexdigest()
+
+
+class ProductFieldMapper:
+    """
+    Maps the raw fields read from the <Product> elements to the product records. The raw products are
+    dicts with the stock_code, name, images, details, description and file_path keys.
+    The products are mapped in batches, every batch shares one timestamp and in columnar mode the prices and
+    quantities of the whole batch are converted column by column
+    """
+
+    def __init__(self, batch_size: int = None, columnar: bool = False):
+        self.batch_size = batch_size or InternalConfig.EXTRACTION_CHUNK_SIZE
+        self.columnar = columnar
+
+    @staticmethod
+    def timestamp() -> str:
+        return datetime.now().strftime(TIMESTAMP_FORMAT)
+
+    def _build_document(
+        self,
+        raw_product: dict,
+        price: float,
+        discounted_price: float,
+        quantity: int,
+        timestamp: str,
+    ) -> ProductRecord:
+        details = raw_product["details"]
+        description = raw_product["description"]
+        (
+            fabric_key,
+            model_measurements_key,
+            product_measurements_key,
+            product_info_key,
+        ) = match_description_keys(tuple(description))
+        name = raw_product["name"]
+        fabric = description.get(fabric_key, "N/A")
+        product_info = description.get(product_info_key, "N/A")
+        product_record = ProductRecord(
+            stock_code=raw_product["stock_code"],
+            color=[details.get("Color", "N/A")],
+            discounted_price=discounted_price,
+            images=raw_product["images"],
+            is_discounted=discounted_price < price,
+            name=name,
+            price=price,
+            price_unit="USD",  # Couldn't find any logical way to get the unit.
+            product_type=details.get("ProductType", "N/A"),
+            quantity=quantity,
+            sample_size=extract_sample_size(description.get("additional_info")),
+            series=details.get("Series", "N/A"),
+            status="Active" if quantity > 0 else "Deactive",
+            fabric=fabric,
+            model_measurements=description.get(model_measurements_key, "N/A"),
+            product_measurements=description.get(product_measurements_key, "N/A"),
+            product_info=product_info,
+            createdAt=timestamp,
+            updatedAt=timestamp,
+            file_path=raw_product["file_path"],
+            search_name=search_text(name),
+            search_fabric=search_text(fabric),
+            search_product_info=search_text(product_info),
+        )
+        product_record.fingerprint = fingerprint_product(
+            product_record.to_dict(exclude=FINGERPRINT_EXCLUDED_FIELDS)
+        )
+        return product_record
+
+    def map_product(self, raw_product: dict, timestamp: str = None) -> ProductRecord:
+        """
+        This function maps a single raw product, every numeric field is converted once
+
+        Args:
+            - raw_product : dict
+            - timestamp : str (createdAt / updatedAt, the current time by default)
+
+        Returns:
+            - product_record : ProductRecord (the product to be written to mongo)
+        """
+        details = raw_product["details"]
+        return self._build_document(
+            raw_product,
+            convert_to_float(details.get("Price", "N/A")),
+            convert_to_float(details.get("DiscountedPrice", "N/A")),
+            convert_to_int(details.get("Quantity", "N/A")),
+            timestamp or self.timestamp(),
+        )
+
+    def map_batch(
+        self, raw_products: List[dict], timestamp: str = None
+    ) -> List[ProductRecord]:
+        """
+        This function maps a batch of raw products with one timestamp, in columnar mode the numeric fields
+        are converted per column before the documents are built
+
+        Args:
+            - raw_products : List[dict]
+            - timestamp : str (createdAt / updatedAt of the batch, the current time by default)
+
+        Returns:
+            - product_records : List[ProductRecord]
+        """
+        timestamp = timestamp or self.timestamp()
+        if not self.columnar:
+            return [
+                self.map_product(raw_product, timestamp) for raw_product in raw_products
+            ]
+
+        details = [raw_product["details"] for raw_product in raw_products]
+        prices = list(
+            map(convert_to_float, [detail.get("Price", "N/A") for detail in details])
+        )
+        discounted_prices = list(
+            map(
+                convert_to_float,
+                [detail.get("DiscountedPrice", "N/A") for detail in details],
+            )
+        )
+        quantities = list(
+            map(convert_to_int, [detail.get("Quantity", "N/A") for detail in details])
+        )
+        return [
+            self._build_document(*columns, timestamp)
+            for columns in zip(raw_products, prices, discounted_prices, quantities)
+        ]
+
+    def map_products(self, raw_products: Iterable[dict]) -> Iterator[ProductRecord]:
+        """
+        This function maps a stream of raw products batch by batch, only one batch is kept in memory
+
+        Args:
+            - raw_products : Iterable[dict] (list or generator of the raw products)
+
+        Yields:
+            - product_record : ProductRecord (the product to be written to mongo)
+        """
+        raw_products = iter(raw_products)
+        while True:
+            batch = list(islice(raw_products, self.batch_size))
+            if not batch:
+                return
+            start = time.perf_counter()
+            product_records = self.map_batch(batch)
+            INGESTION_STAGE_SECONDS.observe(
+                time.perf_counter() - start, stage="normalize"
+            )
+            yield from product_records
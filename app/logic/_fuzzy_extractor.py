@@ -1,7 +1,17 @@
 import os
+import re
+import ast
+import asyncio
+import hashlib
 import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterator, List, Tuple
 
-from app.configs.config import InternalConfig, configure_logging
+from app.configs.config import InternalConfig
+from app.logic._extractor import ProductElementStream
+from app.logic._keyword_resolver import KeywordResolver
+from app.utils.cache_utils import MISSING, LRUTTLCache
 from app.utils.decyhper_utils import Cipher
 
 import xml.etree.ElementTree as ET
@@ -9,32 +19,83 @@ from langchain_mistralai.chat_models import ChatMistralAI
 from langchain import PromptTemplate
 from langchain.chains import LLMChain
 
-configure_logging()
 logger = logging.getLogger(__name__)
 
+# A line of the batched keyword answer, e.g. "Renk" => * Color *
+BATCH_ANSWER_PATTERN = re.compile(r'^\s*"(.*)"\s*=>\s*\*(.*?)\*')
+
+
+class LLMClientPool:
+    """
+    Keeps the models of the decrypted api keys and their chains keyed by the hash of the token, so the decryption
+    and the client with its keep-alive HTTP connections are reused across the requests.
+    The pool is bounded and the clients expire after LLM_CLIENT_TTL seconds without a request
+    """
+
+    def __init__(self, max_size: int = None, ttl: float = None):
+        self._clients = LRUTTLCache(
+            max_size=max_size or InternalConfig.LLM_CLIENT_POOL_SIZE,
+            ttl=ttl or InternalConfig.LLM_CLIENT_TTL,
+            sliding=True,
+        )
+        self._lock = threading.Lock()
+
+    def _get_entry(self, token: str) -> dict:
+        token_hash = hashlib.sha256(token.encode()).hexdigest()
+        entry = self._clients.get(token_hash)
+        if entry is MISSING:
+            with self._lock:
+                entry = self._clients.peek(token_hash)
+                if entry is MISSING:
+                    decrypted_api_key = Cipher(token).decrypt(
+                        InternalConfig.MISTRAL_API_KEY
+                    )
+                    entry = {
+                        "model": ChatMistralAI(
+                            mistral_api_key=decrypted_api_key,
+                            model="mistral-small",
+                            endpoint=InternalConfig.MISTRAL_ENDPOINT,
+                        ),
+                        "chains": {},
+                    }
+                    self._clients.set(token_hash, entry)
+        return entry
+
+    def get_chain(self, token: str, prompt_template: PromptTemplate) -> LLMChain:
+        entry = self._get_entry(token)
+        with self._lock:
+            chain = entry["chains"].get(prompt_template.template)
+            if chain is None:
+                chain = LLMChain(llm=entry["model"], prompt=prompt_template)
+                entry["chains"][prompt_template.template] = chain
+        return chain
+
+    def stats(self) -> dict:
+        return self._clients.stats()
+
+
+llm_client_pool = LLMClientPool()
+
 
 class LLMMixin:
-    def get_mistral_model(self, token: str):
+    client_pool = llm_client_pool
+
+    def get_chain(self, token: str) -> LLMChain:
         """
-        This function decrypts the api key with the provided token, and returns the model
+        This function returns the chain of the prompt template of the class for the model of the token
 
         Args:
             - token : str
 
         Returns:
-            ChatMistralAI (model to perform LLM)
+            LLMChain
         """
-        try:
-            decrypted_api_key = Cipher(token).decrypt(InternalConfig.MISTRAL_API_KEY)
-            return ChatMistralAI(
-                mistral_api_key=decrypted_api_key, model="mistral-small"
-            )
-        except Exception as exc:
-            logger.error(f"Getting model failed... :: {exc}")
+        return self.client_pool.get_chain(token, self.prompt_template)
 
 
 class FuzzyLLMKeyFinder(LLMMixin):
-    def __init__(self):
+    def __init__(self, resolver: KeywordResolver = None):
+        self.resolver = resolver or KeywordResolver()
         self.template = """
         Given the word, please choose only one of the strings below. Chosen word should have closest meaning. Give me the answer between two asteriks which is * your answer *. If anything that doesn't match, respond *None*. If anything matches, respond *your answer*
         1. Price
@@ -60,8 +121,39 @@ class FuzzyLLMKeyFinder(LLMMixin):
         please choose only one of the strings numerated above. Only give one word. Don't give me more than one answer. Chosen word should have closest meaning and string.
         Given word : "{keyword}", your answer :
         """
+        self.prompt_template = PromptTemplate(
+            input_variables=["keyword"],
+            template=self.template,
+        )
+        self.batch_template = """
+        For each given word below, please choose only one of the strings below. Chosen word should have closest meaning.
+        1. Price
+        2. DiscountedPrice
+        3. ProductType
+        4. Quantity
+        5. Color
+        6. Series
+        7. Season
+        8. Ürün Bilgisi
+        9. Kumaş Bilgisi
+        10. Ürün Ölçüleri
+        11. Model Ölçüleri
+        Give me one line for each given word in the same order as "given word" => * your answer *. If the given word doesn't match to anything, respond * None * for it.
+        Here are some examples:
+        "ÜrünBilgisi3" => * Ürün Bilgisi *
+        "Renk" => * Color *
+        "PType" => * ProductType *
+        "Union" => * None *
+        You must give me only the lines without any explanation. No explanation ever.
+        Given words :
+        {keywords}
+        """
+        self.batch_prompt_template = PromptTemplate(
+            input_variables=["keywords"],
+            template=self.batch_template,
+        )
 
-    def analyze_key(self, keyword: str, token: str) -> str:
+    def _analyze_key_with_llm(self, keyword: str, token: str) -> str:
         """
         This function resolves the keyword to get a more meaningful one using Mistral model with the prompt template defined at init function, its an experimental project
 
@@ -72,23 +164,103 @@ class FuzzyLLMKeyFinder(LLMMixin):
         Returns:
             - answer : str (the beautified output)
         """
+        chain = self.get_chain(token)
+        logger.info("Waiting for an output from the model, this might take a while...")
+        answer = chain.run(keyword)
+        if "None" in answer:
+            return None
+        else:
+            return (
+                answer.replace("* ", "").replace(" *", "").replace("*", "")
+            )  # workaround to get a more beautiful output
+
+    def _analyze_keys_with_llm(self, keywords: List[str], token: str) -> Dict[str, str]:
+        """
+        This function resolves all the keywords with a single prompt, the keywords the model skipped or
+        answered in an unexpected format are resolved one by one with parallel calls
+
+        Args:
+            - keywords : List[str]
+            - token : str (the token to decrypt secret api key)
+
+        Returns:
+            - answers : Dict[str, str] (keyword to the beautified output or None)
+        """
+        chain = self.client_pool.get_chain(token, self.batch_prompt_template)
+        logger.info(
+            f"Waiting for an output from the model for {len(keywords)} keywords, this might take a while..."
+        )
+        answer = chain.run("\n".join(f'"{keyword}"' for keyword in keywords))
+
+        answers = {}
+        for line in answer.splitlines():
+            match = BATCH_ANSWER_PATTERN.match(line)
+            if match and match.group(1) in keywords:
+                key = match.group(2).strip()
+                answers[match.group(1)] = None if key == "None" else key
+
+        skipped_keywords = [keyword for keyword in keywords if keyword not in answers]
+        if skipped_keywords:
+            logger.info(
+                f"Resolving {len(skipped_keywords)} keywords the model skipped one by one"
+            )
+            with ThreadPoolExecutor(
+                max_workers=InternalConfig.LLM_MAX_CONCURRENCY
+            ) as executor:
+                single_answers = executor.map(
+                    lambda keyword: self._analyze_key_with_llm(keyword, token),
+                    skipped_keywords,
+                )
+                answers.update(zip(skipped_keywords, single_answers))
+        return answers
+
+    def analyze_keys(
+        self, keywords: List[str], token: str
+    ) -> Tuple[Dict[str, str], List[str]]:
+        """
+        This function resolves a list of keywords, e.g. all the detail names of a feed, to the keys of the template.
+        The duplicates are resolved once, the known spellings locally and the unknown ones with a single prompt.
+        When the model can't be reached the known spellings are still resolved
+
+        Args:
+            - keywords : List[str]
+            - token : str (the token to decrypt secret api key)
+
+        Returns:
+            - mapping : Dict[str, str] (every keyword to its resolved key or None)
+            - unresolved : List[str] (the keywords the model couldn't be asked about, they are None in the mapping)
+        """
         try:
-            model = self.get_mistral_model(token)
-            prompt_template = PromptTemplate(
-                input_variables=["keyword"],
-                template=self.template,
+            mapping = self.resolver.resolve_many(
+                keywords,
+                lambda _keywords: self._analyze_keys_with_llm(_keywords, token),
             )
-            logger.info(
-                "Waiting for an output from the model, this might take a while..."
+            unresolved = [
+                keyword for keyword in dict.fromkeys(keywords) if keyword not in mapping
+            ]
+            mapping.update(dict.fromkeys(unresolved))
+            return mapping, unresolved
+        except Exception as exc:
+            raise TypeError(
+                f"Error occured while gettin the results from model :: {exc}"
+            )
+
+    def analyze_key(self, keyword: str, token: str) -> str:
+        """
+        This function resolves the keyword to one of the keys of the template, the known spellings are resolved locally
+        and only the unknown ones are sent to the model, see KeywordResolver
+
+        Args:
+            - keyword : str
+            - token : str (the token to decrypt secret api key)
+
+        Returns:
+            - answer : str (the resolved key or None)
+        """
+        try:
+            return self.resolver.resolve(
+                keyword, lambda _keyword: self._analyze_key_with_llm(_keyword, token)
             )
-            chain = LLMChain(llm=model, prompt=prompt_template)
-            answer = chain.run(keyword)
-            if "None" in answer:
-                return None
-            else:
-                return (
-                    answer.replace("* ", "").replace(" *", "").replace("*", "")
-                )  # workaround to get a more beautiful output
         except Exception as exc:
             logger.error(f"Error occured while gettin the result from model :: {exc}")
 
@@ -181,37 +353,168 @@ class LLMXMLParser(LLMMixin):
         Here's the xml file : start of xml * {xml_file_string} * end of xml
         Your answer as a Python list :
         """
+        self.prompt_template = PromptTemplate(
+            input_variables=["xml_file_string"],
+            template=self.template,
+        )
 
-    def parse_xml(self, token: str) -> list:
+    def parse_xml(self, token: str, file_name: str = "lonca-sample.xml") -> list:
         """
         This function gets the mistral model via decrypting the secret api key and returns a more meaningful dict regarding the template
 
         Args:
             - token : str
+            - file_name : str (only the name of the file in the assets folder)
 
         Returns:
             - a list of dict containing the data
         """
         try:
-            model = self.get_mistral_model(token)
+            chain = self.get_chain(token)
             # Read the XML from assets folder
-            tree = ET.parse(
-                os.path.join(InternalConfig.ASSETS_DIR_PATH, "lonca-sample.xml")
-            )
+            tree = ET.parse(os.path.join(InternalConfig.ASSETS_DIR_PATH, file_name))
             root = tree.getroot()
             # Convert XML file to string
             xml_string = ET.tostring(root, encoding="utf8", method="xml").decode()
-            prompt_template = PromptTemplate(
-                input_variables=["xml_string"],
-                template=self.template,
-            )
             logger.info(
                 "Waiting for an output from the model, this might take a while..."
             )
-            chain = LLMChain(llm=model, prompt=prompt_template)
             answer = chain.run(xml_string)
             return answer
         except Exception as exc:
             logger.error(
                 f"Error occured while getting the answer for LLM parser... :: {exc}"
             )
+
+    def _iter_xml_chunks(self, xml_path: str, token_budget: int) -> Iterator[str]:
+        """
+        This function groups the products of the file to <Products> documents that fit in the token budget,
+        a product bigger than the budget gets a chunk of its own
+
+        Args:
+            - xml_path : str
+            - token_budget : int (estimated as 4 characters per token)
+
+        Yields:
+            - chunk : str (an XML document of whole products)
+        """
+        char_budget = token_budget * 4
+        products, size = [], 0
+        for product in ProductElementStream().consume(
+            ET.iterparse(xml_path, events=("start", "end"))
+        ):
+            product_string = ET.tostring(product, encoding="unicode").strip()
+            if products and size + len(product_string) > char_budget:
+                yield "<Products>" + "".join(products) + "</Products>"
+                products, size = [], 0
+            products.append(product_string)
+            size += len(product_string)
+        if products:
+            yield "<Products>" + "".join(products) + "</Products>"
+
+    @staticmethod
+    def _parse_answer(answer: str) -> list:
+        """
+        This function reads the Python list of dicts out of the model answer
+
+        Args:
+            - answer : str
+
+        Returns:
+            - products : List[Dict]
+
+        Raises:
+            - TypeError when the answer doesn't contain a list of dicts
+        """
+        try:
+            products = ast.literal_eval(
+                answer[answer.index("[") : answer.rindex("]") + 1]
+            )
+        except (ValueError, SyntaxError) as exc:
+            raise TypeError(f"The answer isn't a Python list :: {exc}")
+        if not isinstance(products, list) or not all(
+            isinstance(product, dict) for product in products
+        ):
+            raise TypeError("The answer isn't a list of dicts")
+        return products
+
+    def _chunk_token_budget(self) -> int:
+        """
+        This function returns the tokens left for the products of a chunk, LLM_CHUNK_TOKEN_BUDGET is the size of the
+        whole request and the prompt template with its example takes a part of it
+        """
+        prompt_tokens = len(self.template.replace("{xml_file_string}", "")) // 4
+        token_budget = InternalConfig.LLM_CHUNK_TOKEN_BUDGET - prompt_tokens
+        if token_budget <= 0:
+            logger.warning(
+                f"The prompt takes {prompt_tokens} tokens, more than LLM_CHUNK_TOKEN_BUDGET, "
+                "every product is sent alone"
+            )
+        return max(token_budget, 0)
+
+    async def _parse_chunk(
+        self, chain: LLMChain, chunk: str, semaphore: asyncio.Semaphore
+    ) -> list:
+        """
+        This function sends a single chunk to the model, retrying only this chunk when it fails.
+        The slot of the semaphore is acquired by the caller and released once the chunk is done
+        """
+        try:
+            for attempt in range(InternalConfig.LLM_CHUNK_RETRIES + 1):
+                try:
+                    answer = await chain.arun(chunk)
+                    return self._parse_answer(answer)
+                except Exception as exc:
+                    if attempt == InternalConfig.LLM_CHUNK_RETRIES:
+                        raise
+                    logger.warning(f"Retrying the LLM parser chunk... :: {exc}")
+                    await asyncio.sleep(0.5 * 2**attempt)
+        finally:
+            semaphore.release()
+
+    async def parse_xml_batched(self, token: str, file_name: str) -> dict:
+        """
+        This function splits the file to product level chunks that fit in LLM_CHUNK_TOKEN_BUDGET with the prompt
+        and sends them to the model concurrently, at most LLM_MAX_CONCURRENCY at once. The chain is built and the file
+        is parsed on the default executor so the event loop isn't blocked, and the next chunk is only parsed when a
+        slot is free so at most LLM_MAX_CONCURRENCY chunks are kept in memory. The answers are merged in document order
+
+        Args:
+            - token : str
+            - file_name : str (only the name of the file in the assets folder)
+
+        Returns:
+            - result : dict (products as a list of dict and the indexes of the chunks that failed after the retries)
+        """
+        loop = asyncio.get_running_loop()
+        chain = await loop.run_in_executor(None, self.get_chain, token)
+        chunks = self._iter_xml_chunks(
+            os.path.join(InternalConfig.ASSETS_DIR_PATH, file_name),
+            self._chunk_token_budget(),
+        )
+        semaphore = asyncio.Semaphore(InternalConfig.LLM_MAX_CONCURRENCY)
+        tasks = []
+        try:
+            while True:
+                await semaphore.acquire()
+                chunk = await loop.run_in_executor(None, next, chunks, None)
+                if chunk is None:
+                    semaphore.release()
+                    break
+                tasks.append(
+                    asyncio.ensure_future(self._parse_chunk(chain, chunk, semaphore))
+                )
+        except BaseException:
+            for task in tasks:
+                task.cancel()
+            raise
+        logger.info(f"Sent {len(tasks)} chunks to the model...")
+        answers = await asyncio.gather(*tasks, return_exceptions=True)
+        products, failed_chunks = [], []
+        for index, answer in enumerate(answers):
+            if isinstance(answer, Exception):
+                logger.error(f"LLM parser chunk {index} failed :: {answer}")
+                failed_chunks.append(index)
+            else:
+                products.extend(answer)
+        return {"products": products, "failed_chunks": failed_chunks}
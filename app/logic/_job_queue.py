@@ -0,0 +1,154 @@
+import logging
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from datetime import datetime
+from typing import Iterable, Union
+
+from app.configs.config import InternalConfig
+
+logger = logging.getLogger(__name__)
+
+
+class JobQueueFullError(Exception):
+    pass
+
+
+class ExtractionJob:
+    QUEUED = "queued"
+    RUNNING = "running"
+    SUCCEEDED = "succeeded"
+    FAILED = "failed"
+
+    def __init__(self, file_name: str):
+        self.id = uuid.uuid4().hex
+        self.file_name = file_name
+        self.state = self.QUEUED
+        self.products_parsed = 0
+        self.products_written = 0
+        self.report = None
+        self.error = None
+        self.future = None
+        self.created_at = datetime.now()
+        self.started_at = None
+        self.finished_at = None
+        self._started = None
+        self._finished = None
+        self._created = time.perf_counter()
+
+    def on_batch(self, counts: dict) -> None:
+        """
+        This function is passed to the extractor to follow the progress batch by batch
+        """
+        self.products_parsed += counts["size"]
+        self.products_written += counts["inserted"] + counts["modified"]
+
+    def to_dict(self) -> dict:
+        queued_until = self._started or time.perf_counter()
+        return {
+            "job_id": self.id,
+            "file_name": self.file_name,
+            "state": self.state,
+            "products_parsed": self.products_parsed,
+            "products_written": self.products_written,
+            "report": self.report,
+            "error": self.error,
+            "created_at": self.created_at.isoformat(),
+            "started_at": self.started_at and self.started_at.isoformat(),
+            "finished_at": self.finished_at and self.finished_at.isoformat(),
+            "queued_seconds": round(queued_until - self._created, 3),
+            "running_seconds": self._started
+            and round((self._finished or time.perf_counter()) - self._started, 3),
+        }
+
+
+class ExtractionJobQueue:
+    """
+    Runs the extractions as background jobs on a bounded thread pool so the event loop is never blocked,
+    at most max_workers jobs run at once and at most max_pending more wait in the queue
+    """
+
+    def __init__(
+        self,
+        extractor,
+        max_workers: int = None,
+        max_pending: int = None,
+        history_size: int = None,
+    ):
+        self.extractor = extractor
+        max_workers = max_workers or InternalConfig.EXTRACTION_JOB_WORKERS
+        max_pending = (
+            InternalConfig.EXTRACTION_JOB_QUEUE_SIZE
+            if max_pending is None
+            else max_pending
+        )
+        self.history_size = history_size or InternalConfig.EXTRACTION_JOB_HISTORY
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="extraction-job"
+        )
+        self._slots = threading.BoundedSemaphore(max_workers + max_pending)
+        self._jobs = OrderedDict()
+        self._lock = threading.Lock()
+
+    def submit(self, file_name: str, chunks: Iterable[bytes] = None) -> ExtractionJob:
+        """
+        This function queues the extraction of the file
+
+        Args:
+            - file_name : str (only the name of the file)
+            - chunks : Iterable[bytes] (optional, the content of the file while it's being received)
+
+        Returns:
+            - job : ExtractionJob
+
+        Raises:
+            - JobQueueFullError when the running and the pending jobs reached the limit
+        """
+        if not self._slots.acquire(blocking=False):
+            raise JobQueueFullError(
+                "Too many extraction jobs are waiting, try again later..."
+            )
+        job = ExtractionJob(file_name)
+        with self._lock:
+            self._jobs[job.id] = job
+            # Forget the oldest finished jobs
+            while len(self._jobs) > self.history_size:
+                oldest_id, oldest_job = next(iter(self._jobs.items()))
+                if oldest_job.state not in (job.SUCCEEDED, job.FAILED):
+                    break
+                del self._jobs[oldest_id]
+        job.future = self._executor.submit(self._run, job, chunks)
+        return job
+
+    def get(self, job_id: str) -> Union[ExtractionJob, None]:
+        return self._jobs.get(job_id)
+
+    def _run(self, job: ExtractionJob, chunks: Iterable[bytes] = None) -> dict:
+        job.state = job.RUNNING
+        job.started_at = datetime.now()
+        job._started = time.perf_counter()
+        try:
+            if chunks is None:
+                job.report = self.extractor.extract(
+                    job.file_name, on_batch=job.on_batch
+                )
+            else:
+                job.report = self.extractor.extract_stream(
+                    chunks, job.file_name, on_batch=job.on_batch
+                )
+            job.state = job.SUCCEEDED
+            return job.report
+        except Exception as exc:
+            job.error = str(exc)
+            job.state = job.FAILED
+            logger.error(f"Extraction job {job.id} failed :: {exc}")
+            raise
+        finally:
+            job.finished_at = datetime.now()
+            job._finished = time.perf_counter()
+            self._slots.release()
+
+    def shutdown(self) -> None:
+        self._executor.shutdown(wait=False)
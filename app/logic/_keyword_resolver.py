@@ -0,0 +1,291 @@
+import difflib
+import json
+import logging
+import os
+import re
+import threading
+from typing import Callable, Dict, List, Union
+
+from app.configs.config import InternalConfig
+from app.utils.cache_utils import MISSING, LRUTTLCache
+
+logger = logging.getLogger(__name__)
+
+# Names of the <ProductDetail> elements and the keys of the description
+PRODUCT_DETAIL_KEYS = [
+    "Price",
+    "DiscountedPrice",
+    "ProductType",
+    "Quantity",
+    "Color",
+    "Series",
+    "Season",
+]
+DESCRIPTION_KEYS = [
+    "Ürün Bilgisi",
+    "Kumaş Bilgisi",
+    "Ürün Ölçüleri",
+    "Model Ölçüleri",
+]
+CANONICAL_KEYS = PRODUCT_DETAIL_KEYS + DESCRIPTION_KEYS
+
+# The examples of the LLM prompt and the usual supplier names
+KNOWN_ALIASES = {
+    "Renk": "Color",
+    "PType": "ProductType",
+    "Ürün Tipi": "ProductType",
+    "Sezon": "Season",
+    "Qty": "Quantity",
+    "Miktar": "Quantity",
+    "Stok": "Quantity",
+    "Ürün Miktarları": "Quantity",
+    "Fiyat": "Price",
+    "İndirimli Fiyat": "DiscountedPrice",
+    "Seri": "Series",
+    "Kumaş": "Kumaş Bilgisi",
+}
+
+TURKISH_ASCII_FOLDING = str.maketrans("İIıŞşÇçĞğÜüÖö", "iiissccgguuoo")
+NON_LETTERS_PATTERN = re.compile(r"[\W\d_]+")
+
+
+def normalize_keyword(keyword: str) -> str:
+    """
+    This function folds the keyword to compare the spellings, Turkish letters are folded to ASCII,
+    the case, the digits, the spaces and the punctuation are dropped. ex. "ÜrünBilgisi3" -> "urunbilgisi"
+
+    Args:
+        - keyword : str
+
+    Returns:
+        - normalized_keyword : str
+    """
+    return NON_LETTERS_PATTERN.sub(
+        "", keyword.translate(TURKISH_ASCII_FOLDING).casefold()
+    )
+
+
+class KeywordResolver:
+    """
+    Resolves a keyword to one of the canonical keys in tiers, exact and normalized lookups, string similarity
+    against the known aliases and only then the LLM, whose answers are kept in a persistent alias cache
+    """
+
+    def __init__(
+        self,
+        cache_path: str = None,
+        cache_size: int = None,
+        similarity_cutoff: float = None,
+    ):
+        self.cache_path = cache_path or os.path.join(
+            InternalConfig.ASSETS_DIR_PATH, "keyword_aliases.json"
+        )
+        self.similarity_cutoff = (
+            similarity_cutoff or InternalConfig.KEYWORD_SIMILARITY_CUTOFF
+        )
+        self.alias_cache = LRUTTLCache(
+            max_size=cache_size or InternalConfig.KEYWORD_ALIAS_CACHE_SIZE
+        )
+        self._lock = threading.Lock()
+        self.tier_hits = {
+            "exact": 0,
+            "normalized": 0,
+            "similarity": 0,
+            "cache": 0,
+            "llm": 0,
+        }
+
+        self.normalized_index = {}
+        for canonical_key in CANONICAL_KEYS:
+            self.normalized_index[normalize_keyword(canonical_key)] = canonical_key
+        for alias, canonical_key in KNOWN_ALIASES.items():
+            self.normalized_index[normalize_keyword(alias)] = canonical_key
+        self._load_alias_cache()
+
+    def _load_alias_cache(self) -> None:
+        try:
+            with open(self.cache_path, encoding="utf-8") as cache_file:
+                for keyword, canonical_key in json.load(cache_file).items():
+                    self.alias_cache.set(keyword, canonical_key)
+        except FileNotFoundError:
+            pass
+        except Exception as exc:
+            logger.warning(f"Couldn't load the keyword alias cache... :: {exc}")
+
+    def _save_alias_cache(self) -> None:
+        try:
+            aliases = {
+                keyword: self.alias_cache.peek(keyword)
+                for keyword in self.alias_cache.keys()
+            }
+            with open(self.cache_path, "w", encoding="utf-8") as cache_file:
+                json.dump(aliases, cache_file, ensure_ascii=False)
+        except Exception as exc:
+            logger.warning(f"Couldn't save the keyword alias cache... :: {exc}")
+
+    def __getstate__(self) -> dict:
+        # Picklable so the worker processes resolve the names like the parent, see Extractor._extract_files
+        state = dict(self.__dict__)
+        del state["_lock"]
+        return state
+
+    def __setstate__(self, state: dict) -> None:
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+    def resolve_known(self, keyword: str) -> Union[str, None, object]:
+        """
+        This function resolves the keyword with the exact, normalized and alias cache tiers only, a near miss
+        is never guessed so it's used for the field names of the ingestion
+
+        Args:
+            - keyword : str
+
+        Returns:
+            - canonical_key : str, None (known to match nothing) or MISSING (unknown)
+        """
+        if keyword in CANONICAL_KEYS:
+            self.tier_hits["exact"] += 1
+            return keyword
+
+        normalized_keyword = normalize_keyword(keyword)
+        canonical_key = self.normalized_index.get(normalized_keyword)
+        if canonical_key is not None:
+            self.tier_hits["normalized"] += 1
+            return canonical_key
+
+        canonical_key = self.alias_cache.get(normalized_keyword)
+        if canonical_key is not MISSING:
+            self.tier_hits["cache"] += 1
+        return canonical_key
+
+    def resolve_local(self, keyword: str) -> Union[str, None, object]:
+        """
+        This function resolves the keyword without the LLM, with the tiers of resolve_known and the string similarity
+
+        Args:
+            - keyword : str
+
+        Returns:
+            - canonical_key : str, None (known to match nothing) or MISSING (unknown, the LLM is needed)
+        """
+        canonical_key = self.resolve_known(keyword)
+        if canonical_key is not MISSING:
+            return canonical_key
+
+        close_matches = difflib.get_close_matches(
+            normalize_keyword(keyword),
+            self.normalized_index.keys(),
+            n=1,
+            cutoff=self.similarity_cutoff,
+        )
+        if close_matches:
+            self.tier_hits["similarity"] += 1
+            return self.normalized_index[close_matches[0]]
+        return MISSING
+
+    def remember(self, keyword: str, canonical_key: Union[str, None]) -> None:
+        """
+        This function stores a resolved keyword in the persistent alias cache
+
+        Args:
+            - keyword : str
+            - canonical_key : str or None
+        """
+        self.remember_many({keyword: canonical_key})
+
+    def remember_many(self, resolved_keywords: Dict[str, Union[str, None]]) -> None:
+        """
+        This function stores the resolved keywords in the persistent alias cache with a single save
+
+        Args:
+            - resolved_keywords : Dict[str, Union[str, None]] (keyword to canonical key)
+        """
+        with self._lock:
+            for keyword, canonical_key in resolved_keywords.items():
+                self.alias_cache.set(normalize_keyword(keyword), canonical_key)
+            self._save_alias_cache()
+
+    def to_canonical_key(self, answer: Union[str, None]) -> Union[str, None]:
+        """
+        This function maps an LLM answer to a canonical key, anything else is None
+        """
+        if not answer:
+            return None
+        return self.normalized_index.get(normalize_keyword(answer))
+
+    def resolve(
+        self, keyword: str, llm_resolve: Callable[[str], Union[str, None]]
+    ) -> Union[str, None]:
+        """
+        This function resolves the keyword with the local tiers first and calls llm_resolve only for the unknown ones,
+        the LLM answers are kept in the alias cache
+
+        Args:
+            - keyword : str
+            - llm_resolve : Callable (keyword to the LLM answer, any exception is raised to the caller)
+
+        Returns:
+            - canonical_key : str or None (indicating there is no match)
+        """
+        canonical_key = self.resolve_local(keyword)
+        if canonical_key is not MISSING:
+            return canonical_key
+
+        canonical_key = self.to_canonical_key(llm_resolve(keyword))
+        self.tier_hits["llm"] += 1
+        self.remember(keyword, canonical_key)
+        return canonical_key
+
+    def resolve_many(
+        self,
+        keywords: List[str],
+        llm_resolve_many: Callable[[List[str]], Dict[str, Union[str, None]]],
+    ) -> Dict[str, Union[str, None]]:
+        """
+        This function resolves a list of keywords, the duplicates are resolved once, the locally known ones
+        right away and all the unknown ones with a single llm_resolve_many call. When the call fails the local answers
+        are still returned, the unknown keywords are left out and aren't remembered
+
+        Args:
+            - keywords : List[str]
+            - llm_resolve_many : Callable (unknown keywords to their LLM answers)
+
+        Returns:
+            - mapping : Dict[str, Union[str, None]] (every resolved keyword to its canonical key or None)
+        """
+        mapping, unknown_keywords = {}, []
+        for keyword in dict.fromkeys(keywords):
+            canonical_key = self.resolve_local(keyword)
+            if canonical_key is MISSING:
+                unknown_keywords.append(keyword)
+            else:
+                mapping[keyword] = canonical_key
+
+        if unknown_keywords:
+            try:
+                answers = llm_resolve_many(unknown_keywords)
+            except Exception as exc:
+                logger.error(
+                    f"Couldn't resolve {len(unknown_keywords)} keywords with the model :: {exc}"
+                )
+                return mapping
+            resolved_keywords = {
+                keyword: self.to_canonical_key(answers.get(keyword))
+                for keyword in unknown_keywords
+            }
+            self.tier_hits["llm"] += len(unknown_keywords)
+            self.remember_many(resolved_keywords)
+            mapping.update(resolved_keywords)
+        return mapping
+
+    def stats(self) -> dict:
+        lookups = sum(self.tier_hits.values())
+        return {
+            "lookups": lookups,
+            "tier_hits": dict(self.tier_hits),
+            "local_hit_rate": (
+                round(1 - self.tier_hits["llm"] / lookups, 4) if lookups else None
+            ),
+            "alias_cache": self.alias_cache.stats(),
+        }
@@ -0,0 +1,335 @@
+import logging
+import threading
+import time
+from typing import Iterable, Union
+
+from app.configs.config import InternalConfig
+from app.database.mongo_odm import Product
+from app.database.product_version import ProductVersionStore, product_version_store
+from app.utils.cache_utils import MISSING, CacheBackend, LRUTTLCache
+from app.utils.text_utils import fold_turkish
+
+from bson import ObjectId
+from bson.errors import InvalidId
+
+logger = logging.getLogger(__name__)
+
+# The folded copies of the searched fields, only read by the text index
+SEARCH_FIELDS = ("search_name", "search_fabric", "search_product_info")
+# Heavy fields that aren't needed on the listing pages
+LISTING_EXCLUDED_FIELDS = (
+    "images",
+    "model_measurements",
+    "product_measurements",
+    "fingerprint",
+) + SEARCH_FIELDS
+# The facets counted by search_products
+SEARCH_FACETS = ("color", "product_type")
+
+
+def _matches_listing_filters(filters: dict, product_doc: dict) -> bool:
+    for key, value in filters.items():
+        if key == "color":
+            if value not in (product_doc.get("color") or []):
+                return False
+        elif key == "min_price":
+            if product_doc.get("price") is None or product_doc["price"] < value:
+                return False
+        elif key == "max_price":
+            if product_doc.get("price") is None or product_doc["price"] > value:
+                return False
+        elif product_doc.get(key) != value:
+            return False
+    return True
+
+
+class ProductReader:
+    """
+    Reads the products with a read-through cache in front of the lookups by stock_code and the listings,
+    the cached entries are invalidated by invalidate_products whenever the extractor of the process writes products.
+    The writes of the other processes are seen through the shared product version, it's read at most once every
+    PRODUCT_VERSION_CHECK_INTERVAL seconds and the whole cache is dropped when another process bumped it
+    """
+
+    DEFAULT_PAGE_SIZE = 50
+    MAX_PAGE_SIZE = 200
+
+    def __init__(
+        self, cache: CacheBackend = None, product_version: ProductVersionStore = None
+    ):
+        self.cache = cache or LRUTTLCache(
+            max_size=InternalConfig.PRODUCT_CACHE_SIZE,
+            ttl=InternalConfig.PRODUCT_CACHE_TTL,
+        )
+        self.product_version = product_version or product_version_store
+        self.version_check_interval = InternalConfig.PRODUCT_VERSION_CHECK_INTERVAL
+        self._seen_version = None
+        self._version_checked_at = None
+        self._version_lock = threading.Lock()
+
+    def _sync_version(self) -> None:
+        """
+        This function drops the cache when the products were written by another process since the last check,
+        the writes of this process are already invalidated by invalidate_products. The cache is kept until
+        PRODUCT_CACHE_TTL when the version can't be read
+        """
+        now = time.monotonic()
+        if (
+            self._version_checked_at is not None
+            and now - self._version_checked_at < self.version_check_interval
+        ):
+            return
+        with self._version_lock:
+            if (
+                self._version_checked_at is not None
+                and now - self._version_checked_at < self.version_check_interval
+            ):
+                return
+            self._version_checked_at = now
+            try:
+                version = self.product_version.current()
+            except Exception as exc:
+                logger.error(f"Error while reading the product version :: {exc}")
+                return
+            if self._seen_version is None:
+                # Nothing was cached before the first check
+                self.cache.clear()
+            elif (
+                version != self._seen_version
+                and self.product_version.changed_elsewhere(self._seen_version, version)
+            ):
+                logger.debug(
+                    f"The products were written by another process, version {version}, dropping the cache"
+                )
+                self.cache.clear()
+            self._seen_version = version
+
+    def list_products(
+        self,
+        product_type: str = None,
+        status: str = None,
+        is_discounted: bool = None,
+        series: str = None,
+        color: str = None,
+        min_price: float = None,
+        max_price: float = None,
+        cursor: str = None,
+        limit: int = DEFAULT_PAGE_SIZE,
+    ) -> dict:
+        """
+        This function lists the products matching the filters with keyset pagination on _id,
+        a page starts right after the cursor so deep pages cost the same as the first one
+
+        Args:
+            - product_type, status, is_discounted, series, color : exact match filters (optional)
+            - min_price, max_price : float (optional price range)
+            - cursor : str (next_cursor of the previous page)
+            - limit : int (page size, at most MAX_PAGE_SIZE)
+
+        Returns:
+            - page : dict (items and the next_cursor, None on the last page)
+
+        Raises:
+            - TypeError when the cursor isn't valid
+        """
+        listing_filters = {
+            "product_type": product_type,
+            "status": status,
+            "is_discounted": is_discounted,
+            "series": series,
+            "color": color,
+            "min_price": min_price,
+            "max_price": max_price,
+        }
+        listing_filters = {
+            key: value for key, value in listing_filters.items() if value is not None
+        }
+        limit = max(1, min(limit, self.MAX_PAGE_SIZE))
+        self._sync_version()
+        cache_key = ("listing", tuple(sorted(listing_filters.items())), cursor, limit)
+        cached = self.cache.get(cache_key)
+        if cached is not MISSING:
+            return cached["page"]
+
+        filters = dict(listing_filters)
+        if "min_price" in filters:
+            filters["price__gte"] = filters.pop("min_price")
+        if "max_price" in filters:
+            filters["price__lte"] = filters.pop("max_price")
+        if cursor is not None:
+            try:
+                filters["id__gt"] = ObjectId(cursor)
+            except (InvalidId, TypeError) as exc:
+                raise TypeError(f"Invalid cursor :: {exc}")
+
+        items = list(
+            Product.objects(**filters)
+            .exclude(*LISTING_EXCLUDED_FIELDS)
+            .order_by("id")
+            .limit(limit)
+            .as_pymongo()
+        )
+        for item in items:
+            item["_id"] = str(item["_id"])
+        page = {
+            "items": items,
+            "next_cursor": items[-1]["_id"] if len(items) == limit else None,
+        }
+        self.cache.set(
+            cache_key,
+            {
+                "page": page,
+                "filters": listing_filters,
+                "stock_codes": {item["stock_code"] for item in items},
+            },
+        )
+        return page
+
+    def search_products(
+        self,
+        query: str,
+        color: str = None,
+        product_type: str = None,
+        offset: int = 0,
+        limit: int = DEFAULT_PAGE_SIZE,
+    ) -> dict:
+        """
+        This function searches the products by the words of their name, fabric and product info with the weighted
+        text index, the query is folded like the indexed fields so "likralı", "LİKRALI" and "likrali" are the same.
+        Every word must match, the products are ordered by relevance and the color and product_type counts of
+        all the matching products are returned with the page in a single aggregation
+
+        Args:
+            - query : str (e.g. "kruvaze ceket")
+            - color, product_type : exact match filters (optional)
+            - offset : int (number of the skipped products)
+            - limit : int (page size, at most MAX_PAGE_SIZE)
+
+        Returns:
+            - results : dict (items, total and the facet counts)
+
+        Raises:
+            - TypeError when the query has no words
+        """
+        words = fold_turkish(query).split()
+        if not words:
+            raise TypeError(f"The search query has no words... :: {query!r}")
+        offset = max(0, offset)
+        limit = max(1, min(limit, self.MAX_PAGE_SIZE))
+        self._sync_version()
+        cache_key = ("search", tuple(words), color, product_type, offset, limit)
+        cached = self.cache.get(cache_key)
+        if cached is not MISSING:
+            return cached
+
+        # The quoted words are all required, the unquoted ones would match any of them
+        match = {"$text": {"$search": " ".join(f'"{word}"' for word in words)}}
+        if color is not None:
+            match["color"] = color
+        if product_type is not None:
+            match["product_type"] = product_type
+        facets = {
+            "items": [
+                {"$sort": {"score": -1, "_id": 1}},
+                {"$skip": offset},
+                {"$limit": limit},
+            ],
+            "total": [{"$count": "count"}],
+            # Every color of a product is counted
+            "color": [
+                {"$unwind": "$color"},
+                {"$group": {"_id": "$color", "count": {"$sum": 1}}},
+                {"$sort": {"count": -1, "_id": 1}},
+            ],
+            "product_type": [
+                {"$group": {"_id": "$product_type", "count": {"$sum": 1}}},
+                {"$sort": {"count": -1, "_id": 1}},
+            ],
+        }
+        result = next(
+            Product._get_collection().aggregate(
+                [
+                    {"$match": match},
+                    {"$addFields": {"score": {"$meta": "textScore"}}},
+                    {"$project": {field: 0 for field in LISTING_EXCLUDED_FIELDS}},
+                    {"$facet": facets},
+                ]
+            )
+        )
+        for item in result["items"]:
+            item["_id"] = str(item["_id"])
+        results = {
+            "items": result["items"],
+            "total": result["total"][0]["count"] if result["total"] else 0,
+            "facets": {
+                facet: {bucket["_id"]: bucket["count"] for bucket in result[facet]}
+                for facet in SEARCH_FACETS
+            },
+        }
+        self.cache.set(cache_key, results)
+        return results
+
+    def get_product(self, stock_code: str) -> Union[dict, None]:
+        """
+        This function returns the product with the given stock code
+
+        Args:
+            - stock_code : str
+
+        Returns:
+            - product : dict or None
+        """
+        self._sync_version()
+        cache_key = ("product", stock_code)
+        product = self.cache.get(cache_key)
+        if product is not MISSING:
+            return product
+
+        product = (
+            Product.objects(stock_code=stock_code)
+            .exclude("fingerprint", *SEARCH_FIELDS)
+            .as_pymongo()
+        ).first()
+        if product is not None:
+            product["_id"] = str(product["_id"])
+        # The misses are cached too, a new product invalidates its key when it's written
+        self.cache.set(cache_key, product)
+        return product
+
+    def invalidate_products(self, product_docs: Union[Iterable[dict], None]) -> None:
+        """
+        This function drops the cached entries affected by the written products, the product lookups by their
+        stock codes, the listings that contain them, the listings whose filters they match now and the search results.
+        None means the written products are unknown and the whole cache is dropped
+
+        Args:
+            - product_docs : Iterable[Dict] or None (the written product dicts)
+        """
+        if product_docs is None:
+            self.cache.clear()
+            return
+
+        product_docs = list(product_docs)
+        if not product_docs:
+            return
+        stock_codes = set()
+        for product_doc in product_docs:
+            stock_codes.add(product_doc["stock_code"])
+            self.cache.delete(("product", product_doc["stock_code"]))
+
+        for cache_key in self.cache.keys():
+            if cache_key[0] == "search":
+                # Any written product may match any query
+                self.cache.delete(cache_key)
+                continue
+            if cache_key[0] != "listing":
+                continue
+            listing = self.cache.peek(cache_key)
+            if listing is MISSING:
+                continue
+            if not stock_codes.isdisjoint(listing["stock_codes"]) or any(
+                _matches_listing_filters(listing["filters"], product_doc)
+                for product_doc in product_docs
+            ):
+                self.cache.delete(cache_key)
+        logger.debug(f"Invalidated the cached entries of {len(stock_codes)} products")
@@ -1,59 +1,293 @@
+import asyncio
+import hashlib
 import os
+import queue
+import uuid
+from typing import AsyncIterator, List
 
 from app.configs.config import InternalConfig
+from app.logic._directory_watcher import DirectoryWatcher
 from app.logic._extractor import Extractor
-from app.logic._fuzzy_extractor import FuzzyLLMKeyFinder, LLMXMLParser
+from app.logic._job_queue import ExtractionJobQueue, JobQueueFullError
+from app.logic._keyword_resolver import KeywordResolver
+from app.logic._product_reader import ProductReader
+from app.utils.lazy_utils import Lazy
 
-from fastapi import APIRouter, HTTPException, File, UploadFile
-from fastapi_utils.tasks import repeat_every
+from fastapi import APIRouter, Body, HTTPException, File, Request, UploadFile
+from starlette.concurrency import run_in_threadpool
 
 router = APIRouter()
-xml_extractor = Extractor()
-fuzzy_llm_key_finder = FuzzyLLMKeyFinder()
-llm_xml_parser = LLMXMLParser()
+product_reader = ProductReader()
+keyword_resolver = KeywordResolver()
+# The unknown detail names of the feeds are resolved with the known aliases, the batch endpoint teaches the rest
+xml_extractor = Extractor(
+    on_products_written=product_reader.invalidate_products,
+    detail_name_resolver=keyword_resolver.resolve_known,
+)
+extraction_job_queue = ExtractionJobQueue(xml_extractor)
+# Started and stopped by the lifespan of the app, see main.py
+directory_watcher = DirectoryWatcher(xml_extractor)
+
+
+def _create_fuzzy_llm_key_finder():
+    # The LLM stack is imported on the first request of the LLM routes, not on the startup
+    from app.logic._fuzzy_extractor import FuzzyLLMKeyFinder
+
+    return FuzzyLLMKeyFinder(resolver=keyword_resolver)
+
+
+def _create_llm_xml_parser():
+    from app.logic._fuzzy_extractor import LLMXMLParser
+
+    return LLMXMLParser()
+
+
+fuzzy_llm_key_finder = Lazy(_create_fuzzy_llm_key_finder)
+llm_xml_parser = Lazy(_create_llm_xml_parser)
 
 
 @router.get("/extract_xml")
 async def extract_xml(file_name: str):
     try:
-        result = xml_extractor.extract(file_name)
+        # Runs on the job queue so the event loop isn't blocked and the concurrency limit applies
+        job = extraction_job_queue.submit(file_name)
+        await asyncio.wrap_future(job.future)
         return {"result": "Successfully created products..."}
+    except JobQueueFullError as exc:
+        raise HTTPException(status_code=429, detail=str(exc))
     except Exception as exc:
         raise HTTPException(
             status_code=404, detail=f"Error while extracting XML data... :: {exc}"
         )
 
 
-@router.on_event("startup")
-@repeat_every(seconds=60 * 60)  # 1 hour
-async def periodic_xml_check() -> None:
+@router.post("/jobs")
+async def create_extraction_job(file_name: str):
+    try:
+        job = extraction_job_queue.submit(file_name)
+        return {"job_id": job.id, "state": job.state}
+    except JobQueueFullError as exc:
+        raise HTTPException(status_code=429, detail=str(exc))
+
+
+@router.get("/jobs/{job_id}")
+async def get_extraction_job(job_id: str):
+    job = extraction_job_queue.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Job not found... :: {job_id}")
+    return job.to_dict()
+
+
+def _put_chunk(chunk_queue: queue.Queue, chunk: bytes, job) -> bool:
+    """
+    This function hands a chunk to the extraction job, it waits while the parser is behind
+    and gives up if the job already stopped
+
+    Returns:
+        - bool (False when the job isn't consuming the chunks anymore)
+    """
+    while not job.future.done():
+        try:
+            chunk_queue.put(chunk, timeout=1)
+            return True
+        except queue.Full:
+            continue
+    return False
+
+
+async def _receive_feed(
+    chunks: AsyncIterator[bytes], file_name: str, ingest: bool
+) -> dict:
+    """
+    This function streams the received chunks to the assets directory with an incremental checksum,
+    with ingest the same chunks are fed to a streaming extraction job while the upload is still arriving.
+    The chunks are written to a hidden .part file the directory watcher ignores, it's renamed to the file name once
+    the upload is complete, and after the ingested file is recorded in the manifest so the watcher doesn't ingest it again.
+    When the upload fails the products the job already wrote have no file behind them, they are discarded once the job
+    stopped, see Extractor.discard_file
+    """
+    file_path = os.path.join(InternalConfig.ASSETS_DIR_PATH, file_name)
+    part_path = os.path.join(
+        InternalConfig.ASSETS_DIR_PATH, f".{file_name}.{uuid.uuid4().hex}.part"
+    )
+    checksum = hashlib.sha256()
+    size = 0
+    job = None
+    if ingest:
+        chunk_queue = queue.Queue(maxsize=InternalConfig.UPLOAD_QUEUE_SIZE)
+        job = extraction_job_queue.submit(file_name, iter(chunk_queue.get, None))
+    feeding = ingest
+    received = False
     try:
-        xml_extractor.extract_periodically()
+        with open(part_path, "wb") as buffer:
+            async for chunk in chunks:
+                buffer.write(chunk)
+                checksum.update(chunk)
+                size += len(chunk)
+                if feeding:
+                    feeding = await run_in_threadpool(
+                        _put_chunk, chunk_queue, chunk, job
+                    )
+        received = True
+    finally:
+        if ingest:
+            # End of the content, also unblocks the job when the upload is interrupted
+            await run_in_threadpool(_put_chunk, chunk_queue, None, job)
+        if not received:
+            if os.path.exists(part_path):
+                os.remove(part_path)
+            if ingest:
+                # Waits for the job to stop without raising its error, the error is kept on the job
+                await run_in_threadpool(job.future.exception)
+                await run_in_threadpool(xml_extractor.discard_file, file_path)
+
+    result = {"filename": file_name, "size": size, "sha256": checksum.hexdigest()}
+    try:
+        if ingest:
+            result["job_id"] = job.id
+            result["report"] = await asyncio.wrap_future(job.future)
+            # The rename keeps the mtime
+            await run_in_threadpool(
+                xml_extractor.record_ingested_file,
+                file_path,
+                {
+                    "size": size,
+                    "mtime": os.stat(part_path).st_mtime,
+                    "content_hash": result["sha256"],
+                },
+            )
+    finally:
+        # A failed ingestion is retried by the directory watcher
+        os.replace(part_path, file_path)
+    return result
+
+
+async def _iter_upload_file(file: UploadFile) -> AsyncIterator[bytes]:
+    while True:
+        chunk = await file.read(InternalConfig.UPLOAD_CHUNK_SIZE)
+        if not chunk:
+            return
+        yield chunk
+
+
+@router.post("/upload_xml_file")
+async def upload_xml_file(file: UploadFile = File(...), ingest: bool = False):
+    try:
+        return await _receive_feed(_iter_upload_file(file), file.filename, ingest)
+    except JobQueueFullError as exc:
+        raise HTTPException(status_code=429, detail=str(exc))
     except Exception as exc:
         raise HTTPException(
-            status_code=404, detail=f"Error while extracting XML data... :: {exc}"
+            status_code=404, detail=f"Error while uploading XML file... :: {exc}"
         )
 
 
-@router.post("/upload_xml_file")
-async def upload_xml_file(file: UploadFile = File(...)):
+@router.put("/upload_xml_stream/{file_name}")
+async def upload_xml_stream(file_name: str, request: Request, ingest: bool = True):
+    """
+    Raw request body upload, unlike the multipart upload the body isn't spooled before the handler runs
+    so the products are extracted while the upload is still arriving
+    """
     try:
-        with open(
-            os.path.join(InternalConfig.ASSETS_DIR_PATH, file.filename), "wb"
-        ) as buffer:
-            buffer.write(await file.read())
-        return {"filename": file.filename}
+        return await _receive_feed(request.stream(), file_name, ingest)
+    except JobQueueFullError as exc:
+        raise HTTPException(status_code=429, detail=str(exc))
     except Exception as exc:
         raise HTTPException(
             status_code=404, detail=f"Error while uploading XML file... :: {exc}"
         )
 
 
+@router.get("/products")
+async def list_products(
+    product_type: str = None,
+    status: str = None,
+    is_discounted: bool = None,
+    series: str = None,
+    color: str = None,
+    min_price: float = None,
+    max_price: float = None,
+    cursor: str = None,
+    limit: int = ProductReader.DEFAULT_PAGE_SIZE,
+):
+    try:
+        return await run_in_threadpool(
+            product_reader.list_products,
+            product_type=product_type,
+            status=status,
+            is_discounted=is_discounted,
+            series=series,
+            color=color,
+            min_price=min_price,
+            max_price=max_price,
+            cursor=cursor,
+            limit=limit,
+        )
+    except TypeError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+    except Exception as exc:
+        raise HTTPException(
+            status_code=404, detail=f"Error while listing products... :: {exc}"
+        )
+
+
+@router.get("/search")
+async def search_products(
+    q: str,
+    color: str = None,
+    product_type: str = None,
+    offset: int = 0,
+    limit: int = ProductReader.DEFAULT_PAGE_SIZE,
+):
+    try:
+        return await run_in_threadpool(
+            product_reader.search_products,
+            q,
+            color=color,
+            product_type=product_type,
+            offset=offset,
+            limit=limit,
+        )
+    except TypeError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+    except Exception as exc:
+        raise HTTPException(
+            status_code=404, detail=f"Error while searching products... :: {exc}"
+        )
+
+
+@router.get("/products/cache_stats")
+async def product_cache_stats():
+    return product_reader.cache.stats()
+
+
+@router.get("/catalog/stats")
+async def catalog_stats():
+    # Served from the summaries kept up to date by the extractor, rebuild them with rebuild_catalog_stats.py
+    try:
+        return await run_in_threadpool(xml_extractor.catalog_stats.summary)
+    except Exception as exc:
+        raise HTTPException(
+            status_code=404, detail=f"Error while reading the catalog stats... :: {exc}"
+        )
+
+
+@router.get("/products/{stock_code}")
+async def get_product(stock_code: str):
+    product = await run_in_threadpool(product_reader.get_product, stock_code)
+    if product is None:
+        raise HTTPException(
+            status_code=404, detail=f"Product not found... :: {stock_code}"
+        )
+    return product
+
+
 @router.get("/fuzzy_keyword_finder")
 async def fuzzy_keyword_finder(keyword: str, token: str):
     try:
 
-        result = fuzzy_llm_key_finder.analyze_key(keyword, token)
+        finder = await run_in_threadpool(fuzzy_llm_key_finder.get)
+        result = await run_in_threadpool(finder.analyze_key, keyword, token)
 
         return {"result": result}
     except Exception as exc:
@@ -62,10 +296,46 @@ async def fuzzy_keyword_finder(keyword: str, token: str):
         )
 
 
+@router.post("/fuzzy_keyword_finder/batch")
+async def fuzzy_keyword_finder_batch(
+    keywords: List[str] = Body(...),
+    token: str = Body(...),
+    apply_to_extractor: bool = Body(False),
+):
+    try:
+        finder = await run_in_threadpool(fuzzy_llm_key_finder.get)
+        mapping, unresolved = await run_in_threadpool(
+            finder.analyze_keys, keywords, token
+        )
+    except Exception as exc:
+        raise HTTPException(
+            status_code=502, detail=f"Error while resolving the keywords... :: {exc}"
+        )
+    if apply_to_extractor:
+        # The unresolved keywords are left to the next request instead of being mapped to None
+        xml_extractor.detail_name_mapping.update(
+            (keyword, key)
+            for keyword, key in mapping.items()
+            if keyword not in unresolved
+        )
+    return {"result": mapping, "unresolved": unresolved}
+
+
+@router.get("/fuzzy_keyword_finder/stats")
+async def fuzzy_keyword_finder_stats():
+    return keyword_resolver.stats()
+
+
 @router.get("/llm_xml_parser")
-def llm_xml_parser_func(token: str):
+async def llm_xml_parser_func(
+    token: str, file_name: str = "lonca-sample.xml", batched: bool = False
+):
     try:
-        result = llm_xml_parser.parse_xml(token)
+        parser = await run_in_threadpool(llm_xml_parser.get)
+        if batched:
+            result = await parser.parse_xml_batched(token, file_name)
+        else:
+            result = await run_in_threadpool(parser.parse_xml, token, file_name)
         return {"result": result}
     except Exception as exc:
         raise HTTPException(
@@ -0,0 +1,122 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Hashable, List
+
+MISSING = object()
+
+
+class CacheBackend:
+    """
+    Interface of the cache backends, get returns MISSING for the absent or expired keys
+    """
+
+    def get(self, key: Hashable) -> Any:
+        raise NotImplementedError
+
+    def peek(self, key: Hashable) -> Any:
+        """Same as get without touching the recency or the metrics"""
+        raise NotImplementedError
+
+    def set(self, key: Hashable, value: Any) -> None:
+        raise NotImplementedError
+
+    def delete(self, key: Hashable) -> None:
+        raise NotImplementedError
+
+    def clear(self) -> None:
+        raise NotImplementedError
+
+    def keys(self) -> List[Hashable]:
+        raise NotImplementedError
+
+    def stats(self) -> dict:
+        raise NotImplementedError
+
+
+class LRUTTLCache(CacheBackend):
+    """
+    Thread safe in-process LRU cache with an optional time to live, counts hits, misses, evictions and expirations.
+    The time to live counts from the last set, or from the last get with sliding so only the idle entries expire
+    """
+
+    def __init__(self, max_size: int, ttl: float = None, sliding: bool = False):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.sliding = sliding
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def _is_expired(self, expires_at: float) -> bool:
+        return expires_at is not None and expires_at <= time.monotonic()
+
+    def get(self, key: Hashable) -> Any:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and self._is_expired(entry[1]):
+                del self._entries[key]
+                self.expirations += 1
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return MISSING
+            if self.sliding and entry[1] is not None:
+                self._entries[key] = (entry[0], time.monotonic() + self.ttl)
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def peek(self, key: Hashable) -> Any:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or self._is_expired(entry[1]):
+                return MISSING
+            return entry[0]
+
+    def set(self, key: Hashable, value: Any) -> None:
+        expires_at = None if self.ttl is None else time.monotonic() + self.ttl
+        with self._lock:
+            self._entries[key] = (value, expires_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def __getstate__(self) -> dict:
+        # Picklable for the worker processes, the copy gets a lock of its own
+        with self._lock:
+            state = dict(self.__dict__, _entries=OrderedDict(self._entries))
+        del state["_lock"]
+        return state
+
+    def __setstate__(self, state: dict) -> None:
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+    def delete(self, key: Hashable) -> None:
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def keys(self) -> List[Hashable]:
+        with self._lock:
+            return list(self._entries)
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "max_size": self.max_size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else None,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+        }
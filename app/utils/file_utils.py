@@ -0,0 +1,19 @@
+import hashlib
+
+
+def file_content_hash(file_path: str, block_size: int = 1024 * 1024) -> str:
+    """
+    This function hashes the content of the file block by block without reading it to memory at once
+
+    Args:
+        - file_path : str
+        - block_size : int
+
+    Returns:
+        - hexdigest : str (sha256 of the content)
+    """
+    content_hash = hashlib.sha256()
+    with open(file_path, "rb") as file:
+        for block in iter(lambda: file.read(block_size), b""):
+            content_hash.update(block)
+    return content_hash.hexdigest()
@@ -0,0 +1,21 @@
+from itertools import islice
+from typing import Iterable, Iterator
+
+
+def chunked(iterable: Iterable, chunk_size: int) -> Iterator[list]:
+    """
+    This function splits the given iterable into lists of at most chunk_size items without consuming it at once
+
+    Args:
+        - iterable : Iterable
+        - chunk_size : int
+
+    Yields:
+        - chunk : list
+    """
+    iterator = iter(iterable)
+    while True:
+        chunk = list(islice(iterator, chunk_size))
+        if not chunk:
+            return
+        yield chunk
@@ -0,0 +1,267 @@
+import bisect
+import threading
+import time
+from typing import Dict, Iterable, Iterator, Tuple
+
+# Default histogram buckets in seconds, same as the Prometheus client libraries
+DEFAULT_BUCKETS = (
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.075,
+    0.1,
+    0.25,
+    0.5,
+    0.75,
+    1.0,
+    2.5,
+    5.0,
+    7.5,
+    10.0,
+)
+
+
+def _escape_label_value(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(labelnames: Tuple[str, ...], labelvalues: tuple, **extra) -> str:
+    pairs = list(zip(labelnames, labelvalues)) + list(extra.items())
+    if not pairs:
+        return ""
+    return (
+        "{"
+        + ",".join(f'{name}="{_escape_label_value(value)}"' for name, value in pairs)
+        + "}"
+    )
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value))
+
+
+class Metric:
+    TYPE = None
+
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def _label_values(self, labels: Dict[str, str]) -> tuple:
+        if set(labels) != set(self.labelnames):
+            raise TypeError(
+                f"Wrong labels for the metric {self.name} :: expected {self.labelnames}, got {tuple(labels)}"
+            )
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    @property
+    def family_name(self) -> str:
+        # The name of the HELP, TYPE and sample lines
+        return self.name
+
+    def _render_samples(self) -> Iterator[str]:
+        raise NotImplementedError
+
+    def render(self) -> str:
+        lines = [
+            f"# HELP {self.family_name} {self.documentation}",
+            f"# TYPE {self.family_name} {self.TYPE}",
+        ]
+        lines.extend(self._render_samples())
+        return "\n".join(lines)
+
+
+class Counter(Metric):
+    """
+    Monotonically increasing value, e.g. the number of ingested products
+    """
+
+    TYPE = "counter"
+
+    @property
+    def family_name(self) -> str:
+        # The counters are exposed with the _total suffix on every line like the Prometheus client libraries
+        return self.name if self.name.endswith("_total") else f"{self.name}_total"
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        key = self._label_values(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels) -> float:
+        return self._values.get(self._label_values(labels), 0)
+
+    def _render_samples(self) -> Iterator[str]:
+        with self._lock:
+            values = sorted(self._values.items())
+        for labelvalues, value in values:
+            yield f"{self.family_name}{_format_labels(self.labelnames, labelvalues)} {_format_value(value)}"
+
+
+class Histogram(Metric):
+    """
+    Distribution of the observed values in cumulative buckets with their sum and count, e.g. stage latencies
+    """
+
+    TYPE = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Tuple[str, ...] = (),
+        buckets: Tuple[float, ...] = DEFAULT_BUCKETS,
+    ):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, **labels) -> None:
+        key = self._label_values(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                # Counts per bucket plus the +Inf bucket, the sum and the count
+                state = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            state[0][index] += 1
+            state[1] += value
+            state[2] += 1
+
+    def snapshot(self, **labels) -> dict:
+        """
+        This function returns the sum and count of the observations of the given labels
+        """
+        with self._lock:
+            state = self._values.get(self._label_values(labels))
+            if state is None:
+                return {"sum": 0.0, "count": 0}
+            return {"sum": state[1], "count": state[2]}
+
+    def _render_samples(self) -> Iterator[str]:
+        with self._lock:
+            values = sorted(
+                (labelvalues, (list(state[0]), state[1], state[2]))
+                for labelvalues, state in self._values.items()
+            )
+        for labelvalues, (bucket_counts, total, count) in values:
+            cumulative = 0
+            for upper_bound, bucket_count in zip(
+                self.buckets + (float("inf"),), bucket_counts
+            ):
+                cumulative += bucket_count
+                labels = _format_labels(
+                    self.labelnames, labelvalues, le=_format_value(upper_bound)
+                )
+                yield f"{self.name}_bucket{labels} {cumulative}"
+            labels = _format_labels(self.labelnames, labelvalues)
+            yield f"{self.name}_sum{labels} {_format_value(total)}"
+            yield f"{self.name}_count{labels} {count}"
+
+
+class MetricsRegistry:
+    """
+    Keeps the metrics of the process and renders them in the Prometheus text exposition format.
+    Registering a metric twice returns the existing one so the modules can declare their metrics at import
+    """
+
+    CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def _register(self, metric_class, name: str, *args, **kwargs) -> Metric:
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = metric_class(name, *args, **kwargs)
+            elif not isinstance(metric, metric_class):
+                raise TypeError(
+                    f"The metric {name} is already registered as a {metric.TYPE}"
+                )
+            return metric
+
+    def counter(
+        self, name: str, documentation: str, labelnames: Tuple[str, ...] = ()
+    ) -> Counter:
+        return self._register(Counter, name, documentation, labelnames)
+
+    def histogram(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Tuple[str, ...] = (),
+        buckets: Tuple[float, ...] = DEFAULT_BUCKETS,
+    ) -> Histogram:
+        return self._register(Histogram, name, documentation, labelnames, buckets)
+
+    def render(self) -> str:
+        """
+        This function renders all the metrics in the Prometheus text exposition format
+
+        Returns:
+            - text : str
+        """
+        with self._lock:
+            metrics = sorted(self._metrics.items())
+        return "".join(metric.render() + "\n" for _, metric in metrics)
+
+
+def timed_iter(iterable: Iterable, histogram: Histogram, **labels) -> Iterator:
+    """
+    This function yields the items of the iterable and observes how long producing every item took,
+    e.g. the parse time of every product of a streaming parser
+
+    Args:
+        - iterable : Iterable
+        - histogram : Histogram
+        - labels : the labels of the observations
+
+    Yields:
+        - the items of the iterable
+    """
+    iterator = iter(iterable)
+    while True:
+        start = time.perf_counter()
+        try:
+            item = next(iterator)
+        except StopIteration:
+            return
+        histogram.observe(time.perf_counter() - start, **labels)
+        yield item
+
+
+# The metrics of the process, exposed on GET /metrics
+metrics = MetricsRegistry()
+
+# The metrics of the ingestion path, see Extractor and BulkProductWriter
+INGESTION_STAGE_SECONDS = metrics.histogram(
+    "lonca_ingestion_stage_seconds",
+    "Latency of the ingestion stages, per product for parse and description, per batch for normalize, dedupe, write and stats",
+    labelnames=("stage",),
+    buckets=(0.0001, 0.00025, 0.0005, 0.001, 0.0025) + DEFAULT_BUCKETS,
+)
+INGESTION_BATCH_SIZE = metrics.histogram(
+    "lonca_ingestion_batch_size",
+    "Number of products sent to mongo per bulk write",
+    buckets=(1, 10, 50, 100, 250, 500, 1000, 2500, 5000, 10000),
+)
+INGESTION_PRODUCTS_PER_SECOND = metrics.histogram(
+    "lonca_ingestion_products_per_second",
+    "Throughput of every ingested file",
+    buckets=(10, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 25000, 50000),
+)
+INGESTION_PRODUCTS = metrics.counter(
+    "lonca_ingestion_products", "Number of products read from the feeds"
+)
+MONGO_ROUND_TRIPS = metrics.counter(
+    "lonca_mongo_round_trips",
+    "Number of mongo round trips of the ingestion",
+    labelnames=("operation",),
+)
@@ -0,0 +1,46 @@
+import re
+import unicodedata
+from functools import lru_cache
+
+# Both the dotted and the dotless i fold to "i", so "LİKRALI", "likralı" and "likrali" are the same word
+TURKISH_FOLDING = str.maketrans(
+    {
+        "İ": "i",
+        "I": "i",
+        "ı": "i",
+        "Ş": "s",
+        "ş": "s",
+        "Ç": "c",
+        "ç": "c",
+        "Ğ": "g",
+        "ğ": "g",
+        "Ö": "o",
+        "ö": "o",
+        "Ü": "u",
+        "ü": "u",
+    }
+)
+NON_WORD_PATTERN = re.compile(r"[\W_]+")
+
+
+@lru_cache(maxsize=4096)
+def fold_turkish(text: str) -> str:
+    """
+    This function normalizes a text for the search, the Turkish letters are folded to ASCII, the other accents are
+    dropped, and the words are lowercased and separated by single spaces. The feeds repeat the same names and
+    descriptions so the results are cached
+
+    Args:
+        - text : str (e.g. "Kruvaze yaka, LİKRALI kumaş")
+
+    Returns:
+        - folded_text : str (e.g. "kruvaze yaka likrali kumas")
+    """
+    folded_text = text.translate(TURKISH_FOLDING).lower()
+    if not folded_text.isascii():
+        folded_text = "".join(
+            char
+            for char in unicodedata.normalize("NFKD", folded_text)
+            if not unicodedata.combining(char)
+        )
+    return NON_WORD_PATTERN.sub(" ", folded_text).strip()
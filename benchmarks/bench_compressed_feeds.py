@@ -0,0 +1,94 @@
+"""
+End-to-end ingestion of compressed feeds streamed through the feed readers against the previous
+decompress-then-parse flow, which writes the decompressed feed to disk first and ingests the plain file.
+It needs a running mongod and uses its own "lonca_benchmark" database
+
+Usage (from the repository root):
+    python -m benchmarks.bench_compressed_feeds [--size 100000]
+"""
+
+import argparse
+import bz2
+import gzip
+import logging
+import os
+import shutil
+import tempfile
+import time
+import zipfile
+
+from app.configs.config import InternalConfig
+from app.database.mongo_odm import Product
+from app.logic._extractor import Extractor
+from benchmarks.synthetic_feed import write_feed
+
+from mongoengine import connect
+
+
+def decompress_to_disk(file_path: str, tmp_dir: str) -> str:
+    # The previous flow, the feed is decompressed next to the archive before it's ingested
+    plain_path = os.path.join(tmp_dir, "decompressed.xml")
+    if file_path.endswith(".zip"):
+        with zipfile.ZipFile(file_path) as archive:
+            member = archive.infolist()[0]
+            with archive.open(member) as source, open(plain_path, "wb") as target:
+                shutil.copyfileobj(source, target)
+        return plain_path
+    opener = gzip.open if file_path.endswith(".gz") else bz2.open
+    with opener(file_path, "rb") as source, open(plain_path, "wb") as target:
+        shutil.copyfileobj(source, target)
+    return plain_path
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--size", type=int, default=100_000)
+    args = parser.parse_args()
+
+    logging.disable(logging.CRITICAL)
+    connect(host=InternalConfig.MONGO_URI.rsplit("/", 1)[0] + "/lonca_benchmark")
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        InternalConfig.ASSETS_DIR_PATH = tmp_dir
+        xml_path = write_feed(os.path.join(tmp_dir, "feed.xml"), args.size)
+        with open(xml_path, "rb") as file:
+            content = file.read()
+        os.remove(xml_path)
+        compressed_files = {
+            "feed.xml.gz": gzip.compress(content),
+            "feed.xml.bz2": bz2.compress(content),
+        }
+        for file_name, compressed in compressed_files.items():
+            with open(os.path.join(tmp_dir, file_name), "wb") as file:
+                file.write(compressed)
+        with zipfile.ZipFile(
+            os.path.join(tmp_dir, "feed.zip"), "w", zipfile.ZIP_DEFLATED
+        ) as archive:
+            archive.writestr("feed.xml", content)
+        print(
+            f"plain feed :: {len(content) / 1024 / 1024:.1f} MB, {args.size} products"
+        )
+
+        # update_changed so every run writes all the products
+        extractor = Extractor(write_mode="update_changed")
+        for file_name in ("feed.xml.gz", "feed.xml.bz2", "feed.zip"):
+            file_path = os.path.join(tmp_dir, file_name)
+            for flow in ("decompress_then_parse", "streamed"):
+                Product.drop_collection()
+                start = time.perf_counter()
+                if flow == "streamed":
+                    report = extractor.extract(file_name)
+                else:
+                    plain_path = decompress_to_disk(file_path, tmp_dir)
+                    report = extractor.extract(os.path.basename(plain_path))
+                    os.remove(plain_path)
+                elapsed = time.perf_counter() - start
+                print(
+                    f"{file_name} {flow}: {elapsed:.2f}s "
+                    f"({report['products'] / elapsed:.0f} products/s)"
+                )
+    Product.drop_collection()
+
+
+if __name__ == "__main__":
+    main()
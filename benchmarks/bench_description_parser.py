@@ -0,0 +1,47 @@
+"""
+Micro-benchmark of the single pass description parser against the BeautifulSoup path
+
+Usage (from the repository root):
+    python -m benchmarks.bench_description_parser [--repeat 2000]
+"""
+
+import argparse
+import timeit
+
+import xml.etree.ElementTree as ET
+
+from app.logic._description_parser import (
+    _parse_items_with_beautifulsoup,
+    _parse_items_with_html_parser,
+)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--repeat", type=int, default=2000)
+    parser.add_argument("--xml-path", default="assets/lonca-sample.xml")
+    args = parser.parse_args()
+
+    descriptions = [
+        description.text.strip()
+        for description in ET.parse(args.xml_path).getroot().iter("Description")
+    ]
+    for description in descriptions:
+        assert _parse_items_with_html_parser(
+            description
+        ) == _parse_items_with_beautifulsoup(description)
+
+    for name, parse in (
+        ("beautifulsoup", _parse_items_with_beautifulsoup),
+        ("html_parser", _parse_items_with_html_parser),
+    ):
+        seconds = timeit.timeit(
+            lambda: [parse(description) for description in descriptions],
+            number=args.repeat,
+        )
+        per_description = seconds / (args.repeat * len(descriptions)) * 1e6
+        print(f"{name}: {per_description:.1f} µs per description")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,142 @@
+"""
+Per product CPU time of the normalization stage, the previous per product closures against the
+ProductFieldMapper in row and columnar mode. The products are read and their descriptions parsed before
+the timed section so only the field mapping is measured
+
+Usage (from the repository root):
+    python -m benchmarks.bench_field_mapping [--size 20000] [--repeat 5]
+"""
+
+import argparse
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import time
+from datetime import datetime
+
+from app.logic._extractor import Extractor
+from app.logic._field_mapping import (
+    FINGERPRINT_EXCLUDED_FIELDS,
+    ProductFieldMapper,
+    extract_sample_size,
+)
+from benchmarks.synthetic_feed import write_feed
+
+
+def legacy_map_product(raw_product: dict) -> dict:
+    # The previous implementation of Extractor._build_product_dict after the fields were read
+    product_details = raw_product["details"]
+    description_dict = raw_product["description"]
+
+    def return_valid_key(_key, _dict):
+        for __key in _dict.keys():
+            if _key in __key:
+                return __key
+            else:
+                None
+
+    def convert_to_float(_variable):
+        try:
+            if "," in _variable or "." in _variable:
+                return float(_variable.replace(",", "."))
+            elif isinstance(_variable, int):
+                return float(_variable)
+            elif isinstance(_variable, str):
+                return float(_variable)
+            else:
+                return _variable
+        except Exception as exc:
+            raise TypeError(f"Error while converting variable:{_variable} :: {exc}")
+
+    now = datetime.now()
+    formatted_now = now.strftime("%Y-%m-%dT%H:%M:%S.%f+00:0")
+    product_dict = {
+        "stock_code": raw_product["stock_code"],
+        "color": [product_details.get("Color", "N/A")],
+        "discounted_price": convert_to_float(
+            product_details.get("DiscountedPrice", "N/A")
+        ),
+        "images": raw_product["images"],
+        "is_discounted": (
+            True
+            if convert_to_float(product_details.get("DiscountedPrice", 0))
+            < convert_to_float(product_details.get("Price", 0))
+            else False
+        ),
+        "name": raw_product["name"],
+        "price": convert_to_float(product_details.get("Price", "N/A")),
+        "price_unit": "USD",
+        "product_type": product_details.get("ProductType", "N/A"),
+        "quantity": int(product_details.get("Quantity", "N/A")),
+        "sample_size": extract_sample_size(
+            description_dict.get("additional_info", None)
+        ),
+        "series": product_details.get("Series", "N/A"),
+        "status": (
+            "Active" if int(product_details.get("Quantity", 0)) > 0 else "Deactive"
+        ),
+        "fabric": description_dict.get(
+            return_valid_key("Kumaş Bilgisi", description_dict), "N/A"
+        ),
+        "model_measurements": description_dict.get(
+            return_valid_key("Model Ölçüleri", description_dict), "N/A"
+        ),
+        "product_measurements": description_dict.get(
+            return_valid_key("Ürün Ölçüleri", description_dict), "N/A"
+        ),
+        "createdAt": formatted_now,
+        "updatedAt": formatted_now,
+        "file_path": raw_product["file_path"],
+    }
+    normalized_fields = {
+        key: value
+        for key, value in product_dict.items()
+        if key not in FINGERPRINT_EXCLUDED_FIELDS
+    }
+    product_dict["fingerprint"] = hashlib.sha1(
+        json.dumps(normalized_fields, sort_keys=True, ensure_ascii=False).encode()
+    ).hexdigest()
+    return product_dict
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--size", type=int, default=20_000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    logging.disable(logging.CRITICAL)
+    extractor = Extractor()
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        xml_path = write_feed(os.path.join(tmp_dir, "feed.xml"), args.size)
+        raw_products = [
+            extractor._read_raw_product(product, xml_path)
+            for product in extractor._iter_product_elements(xml_path)
+        ]
+
+    row_mapper = ProductFieldMapper(columnar=False)
+    columnar_mapper = ProductFieldMapper(columnar=True)
+    scenarios = (
+        ("legacy", lambda: [legacy_map_product(raw) for raw in raw_products]),
+        ("mapper_row", lambda: list(row_mapper.map_products(raw_products))),
+        ("mapper_columnar", lambda: list(columnar_mapper.map_products(raw_products))),
+    )
+
+    expected = None
+    for name, run in scenarios:
+        best = None
+        for _ in range(args.repeat):
+            start = time.process_time()
+            products = run()
+            elapsed = time.process_time() - start
+            best = elapsed if best is None else min(best, elapsed)
+        fingerprints = [product["fingerprint"] for product in products]
+        expected = expected or fingerprints
+        assert fingerprints == expected, f"{name} produced different documents"
+        print(f"{name}: {best / len(raw_products) * 1e6:.1f} µs CPU per product")
+
+
+if __name__ == "__main__":
+    main()
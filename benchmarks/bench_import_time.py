@@ -0,0 +1,95 @@
+"""
+Cold start of the API, the cumulative import time of main measured with python -X importtime in fresh processes.
+It also fails if main imports one of the heavy modules that are only needed by some routes (the LLM clients, bs4),
+those are imported on the first request that uses them
+
+Usage (from the repository root):
+    python -m benchmarks.bench_import_time [--runs 7] [--top 15] [--save-baseline PATH]
+    python -m benchmarks.bench_import_time --baseline PATH [--tolerance 0.2] [--max-ms 1500]
+"""
+
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+
+FORBIDDEN_MODULES = ("langchain", "langchain_core", "langchain_mistralai", "bs4")
+
+
+def measure_once(module: str) -> dict:
+    # Lines of -X importtime are "import time: self [us] | cumulative | imported package"
+    output = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True,
+        text=True,
+        check=True,
+    ).stderr
+    cumulative = {}
+    for line in output.splitlines():
+        if not line.startswith("import time:") or "[us]" in line:
+            continue
+        _, cumulative_us, name = line[len("import time:") :].split("|")
+        cumulative[name.strip()] = int(cumulative_us)
+    return cumulative
+
+
+def find_forbidden(cumulative: dict) -> list:
+    return sorted(name for name in cumulative if name in FORBIDDEN_MODULES)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--module", default="main")
+    parser.add_argument("--runs", type=int, default=7)
+    parser.add_argument("--top", type=int, default=15)
+    parser.add_argument("--save-baseline", metavar="PATH")
+    parser.add_argument("--baseline", metavar="PATH")
+    parser.add_argument("--tolerance", type=float, default=0.2)
+    parser.add_argument("--max-ms", type=float)
+    args = parser.parse_args()
+
+    runs = [measure_once(args.module) for _ in range(args.runs)]
+    import_ms = statistics.median(run[args.module] for run in runs) / 1000
+    print(f"import {args.module}: median {import_ms:.0f}ms over {args.runs} runs")
+    top_modules = sorted(
+        (
+            (statistics.median(run.get(name, 0) for run in runs) / 1000, name)
+            for name in runs[0]
+            if "." not in name and name != args.module
+        ),
+        reverse=True,
+    )[: args.top]
+    for module_ms, name in top_modules:
+        print(f"  {module_ms:8.1f}ms  {name}")
+
+    failures = []
+    forbidden = find_forbidden(runs[0])
+    if forbidden:
+        failures.append(f"imports {', '.join(forbidden)} at startup")
+    if args.max_ms is not None and import_ms > args.max_ms:
+        failures.append(f"{import_ms:.0f}ms is over the {args.max_ms:.0f}ms budget")
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as baseline_file:
+            baseline_ms = json.load(baseline_file)["import_ms"]
+        if import_ms > baseline_ms * (1 + args.tolerance):
+            failures.append(
+                f"{import_ms:.0f}ms is {import_ms / baseline_ms - 1:.0%} slower than "
+                f"the baseline {baseline_ms:.0f}ms"
+            )
+    if args.save_baseline:
+        with open(args.save_baseline, "w", encoding="utf-8") as baseline_file:
+            json.dump(
+                {"module": args.module, "import_ms": round(import_ms, 1)},
+                baseline_file,
+                indent=2,
+            )
+        print(f"saved the baseline to {args.save_baseline}")
+
+    for failure in failures:
+        print(f"REGRESSION: {failure}")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,217 @@
+"""
+End-to-end ingestion benchmark suite on the synthetic feeds of benchmarks.synthetic_feed, from 1k to 1M products.
+The scenarios are measured separately, every run in a fresh interpreter so the peak RSS values are comparable:
+    - parse : streaming the <Product> elements and reading their raw fields, the descriptions included
+    - normalize : mapping the raw products to product records with ProductFieldMapper
+    - ingest : Extractor.extract end to end, against the in-memory CountingCollection or a local mongod
+Every run records the throughput, the peak RSS and the mongo round trips. The results can be saved as a JSON baseline
+and later runs compared against it, the command exits with 1 when a scenario regressed beyond the tolerance
+
+Usage (from the repository root):
+    python -m benchmarks.bench_ingestion_suite --save-baseline benchmarks/baseline.json
+    python -m benchmarks.bench_ingestion_suite --baseline benchmarks/baseline.json [--tolerance 0.2]
+    python -m benchmarks.bench_ingestion_suite --sizes 1000 1000000 --backend mongo
+    python -m benchmarks.bench_ingestion_suite --incomplete-details 0.3
+"""
+
+import argparse
+import json
+import logging
+import os
+import resource
+import sys
+import tempfile
+import time
+from itertools import cycle, islice
+
+from benchmarks.synthetic_feed import write_feed
+from benchmarks.worker_process import print_worker_result, worker_output
+
+SCENARIOS = ("parse", "normalize", "ingest")
+BACKENDS = ("mock", "mongo")
+# The normalize scenario cycles through this many raw products so the raw products of 1M don't have to fit in memory
+NORMALIZE_POOL_SIZE = 10_000
+
+
+# Every runner returns the number of products and the seconds of the measured part
+
+
+def run_parse(extractor, xml_path: str, size: int) -> tuple:
+    start = time.perf_counter()
+    count = 0
+    for product in extractor._iter_product_elements(xml_path):
+        extractor._read_raw_product(product, xml_path)
+        count += 1
+    return count, time.perf_counter() - start
+
+
+def run_normalize(extractor, xml_path: str, size: int) -> tuple:
+    pool = list(
+        islice(
+            (
+                extractor._read_raw_product(product, xml_path)
+                for product in extractor._iter_product_elements(xml_path)
+            ),
+            NORMALIZE_POOL_SIZE,
+        )
+    )
+    start = time.perf_counter()
+    count = sum(
+        1 for _ in extractor.field_mapper.map_products(islice(cycle(pool), size))
+    )
+    return count, time.perf_counter() - start
+
+
+def run_ingest(extractor, xml_path: str, size: int) -> tuple:
+    start = time.perf_counter()
+    count = extractor.extract(os.path.basename(xml_path))["products"]
+    return count, time.perf_counter() - start
+
+
+def run_worker(scenario: str, backend: str, xml_path: str, size: int) -> dict:
+    from app.configs.config import InternalConfig
+    from app.database.mongo_odm import CatalogStats, Product
+    from app.logic._extractor import Extractor
+    from app.utils.metrics_utils import MONGO_ROUND_TRIPS
+
+    logging.disable(logging.CRITICAL)
+    InternalConfig.ASSETS_DIR_PATH = os.path.dirname(xml_path)
+    if scenario == "ingest":
+        if backend == "mock":
+            from benchmarks.mock_collection import install_counting_collections
+
+            install_counting_collections()
+        else:
+            from mongoengine import connect
+
+            connect(
+                host=InternalConfig.MONGO_URI.rsplit("/", 1)[0] + "/lonca_benchmark"
+            )
+            Product.drop_collection()
+            CatalogStats.drop_collection()
+
+    extractor = Extractor()
+    runner = {"parse": run_parse, "normalize": run_normalize, "ingest": run_ingest}
+    count, elapsed = runner[scenario](extractor, xml_path, size)
+    if scenario == "ingest" and backend == "mongo":
+        Product.drop_collection()
+        CatalogStats.drop_collection()
+    return {
+        "products": count,
+        "seconds": round(elapsed, 3),
+        "products_per_second": round(count / elapsed),
+        "peak_rss_mb": round(
+            resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1
+        ),
+        "round_trips": int(
+            sum(
+                MONGO_ROUND_TRIPS.value(operation=operation)
+                for operation in ("find", "bulk_write", "aggregate")
+            )
+        ),
+    }
+
+
+def find_regressions(results: dict, baseline: dict, tolerance: float) -> list:
+    """
+    This function compares the results against the baseline, a run regressed when its throughput dropped
+    or its peak RSS grew by more than the tolerance, or when it needed more mongo round trips
+
+    Args:
+        - results : dict (run key to result)
+        - baseline : dict (run key to result)
+        - tolerance : float (e.g. 0.2 for 20%)
+
+    Returns:
+        - regressions : List[str]
+    """
+    regressions = []
+    for key, result in results.items():
+        expected = baseline.get(key)
+        if expected is None:
+            continue
+        if result["products_per_second"] < expected["products_per_second"] * (
+            1 - tolerance
+        ):
+            regressions.append(
+                f"{key} throughput {result['products_per_second']} < {expected['products_per_second']} products/s"
+            )
+        if result["peak_rss_mb"] > expected["peak_rss_mb"] * (1 + tolerance):
+            regressions.append(
+                f"{key} peak RSS {result['peak_rss_mb']} > {expected['peak_rss_mb']} MB"
+            )
+        if result["round_trips"] > expected["round_trips"]:
+            regressions.append(
+                f"{key} round trips {result['round_trips']} > {expected['round_trips']}"
+            )
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "--sizes", nargs="+", type=int, default=[1_000, 10_000, 100_000]
+    )
+    parser.add_argument("--scenarios", nargs="+", choices=SCENARIOS, default=SCENARIOS)
+    parser.add_argument("--backend", choices=BACKENDS, default="mock")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument(
+        "--incomplete-details",
+        type=float,
+        default=0.0,
+        help="share of the products with missing or empty optional details",
+    )
+    parser.add_argument("--baseline", help="JSON results to compare the run against")
+    parser.add_argument("--save-baseline", help="writes the JSON results to this path")
+    parser.add_argument("--tolerance", type=float, default=0.2)
+    parser.add_argument(
+        "--worker", nargs=4, metavar=("SCENARIO", "BACKEND", "XML_PATH", "SIZE")
+    )
+    args = parser.parse_args()
+
+    if args.worker:
+        scenario, backend, xml_path, size = args.worker
+        print_worker_result(run_worker(scenario, backend, xml_path, int(size)))
+        return
+
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for size in args.sizes:
+            xml_path = write_feed(
+                os.path.join(tmp_dir, f"feed-{size}.xml"),
+                size,
+                args.seed,
+                args.incomplete_details,
+            )
+            for scenario in args.scenarios:
+                result = worker_output(
+                    "benchmarks.bench_ingestion_suite",
+                    scenario,
+                    args.backend,
+                    xml_path,
+                    size,
+                )
+                key = f"{scenario}/{args.backend}/{size}"
+                if args.incomplete_details:
+                    # Not compared with the baselines of the complete feeds
+                    key += f"/incomplete-{args.incomplete_details}"
+                results[key] = result
+                print(f"{key} {json.dumps(result, sort_keys=True)}")
+            os.remove(xml_path)
+
+    if args.save_baseline:
+        with open(args.save_baseline, "w") as file:
+            json.dump(results, file, indent=2, sort_keys=True)
+        print(f"Saved the baseline to {args.save_baseline}")
+    if args.baseline:
+        with open(args.baseline) as file:
+            regressions = find_regressions(results, json.load(file), args.tolerance)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        if regressions:
+            sys.exit(1)
+        print("No regressions against the baseline")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+"""
+Per request overhead of the LLM calls with the pooled clients and chains against building them on every call,
+measured against a local fake LLM server
+
+Usage (from the repository root):
+    python -m benchmarks.bench_llm_client_pool [--requests 200]
+"""
+
+import argparse
+import logging
+import time
+
+from benchmarks.fake_llm_server import FakeLLMServer
+
+from app.configs.config import InternalConfig
+from app.utils.decyhper_utils import Cipher
+
+from cryptography.fernet import Fernet
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=200)
+    args = parser.parse_args()
+
+    logging.disable(logging.CRITICAL)
+    token = Fernet.generate_key()
+    InternalConfig.MISTRAL_API_KEY = Cipher(token).encrypt("fake-api-key")
+    token = token.decode()
+
+    with FakeLLMServer(reply=lambda prompt: "* Color *") as server:
+        InternalConfig.MISTRAL_ENDPOINT = server.endpoint
+        from app.logic._fuzzy_extractor import FuzzyLLMKeyFinder
+
+        from langchain import PromptTemplate
+        from langchain.chains import LLMChain
+        from langchain_mistralai.chat_models import ChatMistralAI
+
+        key_finder = FuzzyLLMKeyFinder()
+
+        def rebuilt_call():
+            # The previous implementation, decryption, client, prompt and chain on every call
+            decrypted_api_key = Cipher(token).decrypt(InternalConfig.MISTRAL_API_KEY)
+            model = ChatMistralAI(
+                mistral_api_key=decrypted_api_key,
+                model="mistral-small",
+                endpoint=server.endpoint,
+            )
+            prompt_template = PromptTemplate(
+                input_variables=["keyword"], template=key_finder.template
+            )
+            return LLMChain(llm=model, prompt=prompt_template).run("Renk")
+
+        def pooled_call():
+            return key_finder._analyze_key_with_llm("Renk", token)
+
+        for name, call in (("rebuilt", rebuilt_call), ("pooled", pooled_call)):
+            call()  # warm up
+            start = time.perf_counter()
+            for _ in range(args.requests):
+                call()
+            per_request = (time.perf_counter() - start) / args.requests * 1000
+            print(f"{name}: {per_request:.2f} ms per request")
+
+
+if __name__ == "__main__":
+    main()
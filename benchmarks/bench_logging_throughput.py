@@ -0,0 +1,95 @@
+"""
+Extraction throughput with logging on, the previous synchronous handlers (configured once per importing module,
+as the extractor modules and main.py used to do) against the queued logging of configure_logging.
+Every product is logged once like the extractor used to, the products are mapped but not written to mongo
+
+Usage (from the repository root):
+    python -m benchmarks.bench_logging_throughput [--size 20000]
+"""
+
+import argparse
+import json
+import logging
+import os
+import subprocess
+import tempfile
+import time
+from logging.handlers import RotatingFileHandler
+
+from benchmarks.synthetic_feed import write_feed
+from benchmarks.worker_process import print_worker_result, worker_output
+
+MODES = ("off", "sync", "queued")
+
+
+def configure_sync_logging(log_dir: str):
+    # The previous configure_logging
+    logging.basicConfig(
+        level=logging.DEBUG,
+        format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
+    )
+    file_handler = RotatingFileHandler(
+        os.path.join(log_dir, "app.log"), maxBytes=1024 * 1024, backupCount=5
+    )
+    file_handler.setLevel(logging.DEBUG)
+    file_handler.setFormatter(
+        logging.Formatter("%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+    )
+    logging.getLogger("").addHandler(file_handler)
+
+
+def run_worker(mode: str, xml_path: str) -> dict:
+    from app.configs import config
+
+    if mode == "queued":
+        # ASSETS_DIR_PATH and LOG_LEVEL are set by the parent process
+        config.configure_logging()
+    elif mode == "sync":
+        for _ in range(3):
+            configure_sync_logging(config.InternalConfig.ASSETS_DIR_PATH)
+    else:
+        logging.disable(logging.CRITICAL)
+    from app.logic._extractor import Extractor
+
+    logger = logging.getLogger("benchmarks.extractor")
+    extractor = Extractor()
+    start = time.perf_counter()
+    count = 0
+    for product in extractor._iter_products_from_xml_file(xml_path):
+        logger.info(
+            f"Created the product document successfully for {product['stock_code']}"
+        )
+        count += 1
+    elapsed = time.perf_counter() - start
+    return {
+        "mode": mode,
+        "products": count,
+        "products_per_second": round(count / elapsed),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--size", type=int, default=20_000)
+    parser.add_argument("--worker", nargs=2, metavar=("MODE", "XML_PATH"))
+    args = parser.parse_args()
+
+    if args.worker:
+        print_worker_result(run_worker(*args.worker))
+        return
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        xml_path = write_feed(os.path.join(tmp_dir, "feed.xml"), args.size)
+        for mode in MODES:
+            result = worker_output(
+                "benchmarks.bench_logging_throughput",
+                mode,
+                xml_path,
+                env=dict(os.environ, ASSETS_DIR_PATH=tmp_dir, LOG_LEVEL="DEBUG"),
+                stderr=subprocess.DEVNULL,
+            )
+            print(json.dumps(result, sort_keys=True))
+
+
+if __name__ == "__main__":
+    main()
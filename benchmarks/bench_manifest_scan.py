@@ -0,0 +1,103 @@
+"""
+Compares the previous distinct("file_path") scan with the ingestion manifest scan,
+it needs a running mongod and uses its own "lonca_benchmark" database
+
+Usage (from the repository root):
+    python -m benchmarks.bench_manifest_scan [--products 1000000] [--files 10000]
+"""
+
+import argparse
+import logging
+import os
+import tempfile
+import time
+
+from app.configs.config import InternalConfig
+from app.database.mongo_odm import IngestionManifest, Product
+from app.logic._extractor import Extractor
+from app.utils.file_utils import file_content_hash
+from app.utils.iter_utils import chunked
+
+from mongoengine import connect
+
+
+def seed(products: int, file_paths: list) -> None:
+    Product.drop_collection()
+    IngestionManifest.drop_collection()
+    collection = Product._get_collection()
+    for batch in chunked(range(products), 10_000):
+        collection.insert_many(
+            [
+                {
+                    "stock_code": f"{index:08d}",
+                    "name": "Benchmark",
+                    "price": 1.0,
+                    "quantity": 1.0,
+                    "product_type": "Elbise",
+                    "createdAt": "",
+                    "updatedAt": "",
+                    "file_path": file_paths[index % len(file_paths)],
+                }
+                for index in batch
+            ]
+        )
+    IngestionManifest._get_collection().insert_many(
+        [
+            {
+                "file_path": file_path,
+                "size": os.stat(file_path).st_size,
+                "mtime": os.stat(file_path).st_mtime,
+                "content_hash": file_content_hash(file_path),
+                "ingestedAt": "",
+            }
+            for file_path in file_paths
+        ]
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--products", type=int, default=1_000_000)
+    parser.add_argument("--files", type=int, default=10_000)
+    parser.add_argument("--new-files", type=int, default=10)
+    args = parser.parse_args()
+
+    logging.disable(logging.CRITICAL)
+    connect(
+        db="lonca_benchmark",
+        host=f"mongodb://{InternalConfig.MONGO_HOST}:27017/lonca_benchmark",
+    )
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        file_paths = []
+        for index in range(args.files + args.new_files):
+            file_path = os.path.join(tmp_dir, f"feed-{index}.xml")
+            with open(file_path, "w") as file:
+                file.write(f"<Products><!-- {index} --></Products>")
+            file_paths.append(file_path)
+        seed(args.products, file_paths[: args.files])
+
+        start = time.perf_counter()
+        xml_paths = [
+            os.path.join(tmp_dir, file)
+            for file in os.listdir(tmp_dir)
+            if file.endswith(".xml")
+        ]
+        distinct_new = set(xml_paths) - set(Product.objects.distinct("file_path"))
+        distinct_seconds = time.perf_counter() - start
+
+        start = time.perf_counter()
+        xml_paths = [
+            os.path.join(tmp_dir, file)
+            for file in os.listdir(tmp_dir)
+            if file.endswith(".xml")
+        ]
+        manifest_new = Extractor()._find_changed_files(xml_paths)
+        manifest_seconds = time.perf_counter() - start
+
+        assert set(manifest_new) == distinct_new
+        print(f"distinct scan: {distinct_seconds:.3f}s, {len(distinct_new)} new files")
+        print(f"manifest scan: {manifest_seconds:.3f}s, {len(manifest_new)} new files")
+
+
+if __name__ == "__main__":
+    main()
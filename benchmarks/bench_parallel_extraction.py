@@ -0,0 +1,55 @@
+"""
+Scaling benchmark of the process pool extraction for 1, 2, 4 and 8 workers, it measures the parsing and
+normalization of the workers only, so no mongo is needed
+
+Usage (from the repository root):
+    python -m benchmarks.bench_parallel_extraction [--files 16] [--products 5000]
+"""
+
+import argparse
+import logging
+import multiprocessing
+import os
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from benchmarks.synthetic_feed import write_feed
+
+
+def parse_file(xml_path: str) -> int:
+    from app.logic._extractor import Extractor
+
+    logging.disable(logging.CRITICAL)
+    return sum(1 for _ in Extractor()._iter_products_from_xml_file(xml_path))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--files", type=int, default=16)
+    parser.add_argument("--products", type=int, default=5000)
+    parser.add_argument("--workers", nargs="+", type=int, default=[1, 2, 4, 8])
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        xml_paths = [
+            write_feed(os.path.join(tmp_dir, f"feed-{index}.xml"), args.products, index)
+            for index in range(args.files)
+        ]
+        baseline = None
+        for workers in args.workers:
+            start = time.perf_counter()
+            with ProcessPoolExecutor(
+                max_workers=workers, mp_context=multiprocessing.get_context("spawn")
+            ) as executor:
+                products = sum(executor.map(parse_file, xml_paths))
+            elapsed = time.perf_counter() - start
+            baseline = baseline or elapsed
+            print(
+                f"workers={workers} products={products} seconds={elapsed:.2f} "
+                f"speedup={baseline / elapsed:.2f}x"
+            )
+
+
+if __name__ == "__main__":
+    main()
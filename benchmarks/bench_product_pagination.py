@@ -0,0 +1,106 @@
+"""
+Deep page latency of the keyset pagination against skip/limit on a large collection,
+it needs a running mongod and uses its own "lonca_benchmark" database
+
+Usage (from the repository root):
+    python -m benchmarks.bench_product_pagination [--products 1000000] [--pages 1 100 1000 10000]
+"""
+
+import argparse
+import logging
+import time
+
+from app.configs.config import InternalConfig
+from app.database.mongo_odm import Product
+from app.logic._product_reader import LISTING_EXCLUDED_FIELDS, ProductReader
+from app.utils.iter_utils import chunked
+
+from mongoengine import connect
+
+PRODUCT_TYPES = ["Elbise", "T-shirt", "Ceket", "Bluz"]
+
+
+def seed(products: int) -> None:
+    Product.drop_collection()
+    Product.ensure_indexes()
+    collection = Product._get_collection()
+    for batch in chunked(range(products), 10_000):
+        collection.insert_many(
+            [
+                {
+                    "stock_code": f"{index:08d}",
+                    "name": "Benchmark",
+                    "color": ["Siyah"],
+                    "images": [
+                        f"www.aday-butik-resim-sitesi/{index}-{n}.jpeg"
+                        for n in range(3)
+                    ],
+                    "is_discounted": index % 3 == 0,
+                    "price": float(index % 500),
+                    "quantity": float(index % 7),
+                    "product_type": PRODUCT_TYPES[index % len(PRODUCT_TYPES)],
+                    "status": "Active" if index % 7 else "Deactive",
+                    "model_measurements": "Boy: 1.72, Göğüs: 86, Bel: 64, Kalça: 90",
+                    "product_measurements": "Boy: 42 cm Kol: 62 cm",
+                    "createdAt": "",
+                    "updatedAt": "",
+                    "file_path": "benchmark.xml",
+                }
+                for index in batch
+            ]
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--products", type=int, default=1_000_000)
+    parser.add_argument("--page-size", type=int, default=50)
+    parser.add_argument("--pages", nargs="+", type=int, default=[1, 100, 1000, 10000])
+    parser.add_argument("--skip-seed", action="store_true")
+    args = parser.parse_args()
+
+    logging.disable(logging.CRITICAL)
+    connect(
+        db="lonca_benchmark",
+        host=f"mongodb://{InternalConfig.MONGO_HOST}:27017/lonca_benchmark",
+    )
+    if not args.skip_seed:
+        seed(args.products)
+
+    reader = ProductReader()
+    filters = {"product_type": "Elbise", "status": "Active"}
+    for page in args.pages:
+        # The cursor of the page is found outside of the measurement, a client would have it from the previous page
+        cursor_doc = (
+            Product.objects(**filters)
+            .order_by("id")
+            .skip((page - 1) * args.page_size - 1)
+            .only("id")
+            .first()
+            if page > 1
+            else None
+        )
+
+        start = time.perf_counter()
+        list(
+            Product.objects(**filters)
+            .exclude(*LISTING_EXCLUDED_FIELDS)
+            .order_by("id")
+            .skip((page - 1) * args.page_size)
+            .limit(args.page_size)
+            .as_pymongo()
+        )
+        skip_ms = (time.perf_counter() - start) * 1000
+
+        start = time.perf_counter()
+        reader.list_products(
+            **filters,
+            cursor=cursor_doc and str(cursor_doc.id),
+            limit=args.page_size,
+        )
+        keyset_ms = (time.perf_counter() - start) * 1000
+        print(f"page={page} skip/limit={skip_ms:.1f}ms keyset={keyset_ms:.1f}ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+"""
+Compares the ProductRecord ingest representation against the product dicts encoded through the Product document,
+the memory of a batch of products kept in memory and the CPU time of encoding them to raw mongo documents
+
+Usage (from the repository root):
+    python -m benchmarks.bench_product_record [--size 10000]
+"""
+
+import argparse
+import logging
+import os
+import tempfile
+import time
+import tracemalloc
+
+from app.database.mongo_odm import Product
+from app.logic._extractor import Extractor
+from benchmarks.synthetic_feed import write_feed
+
+
+def encode_with_document(product_dict: dict) -> dict:
+    # The previous BulkProductWriter._to_mongo
+    mongo_product_doc = Product(**product_dict)
+    mongo_product_doc.validate()
+    mongo_doc = mongo_product_doc.to_mongo().to_dict()
+    mongo_doc.pop("_id", None)
+    return mongo_doc
+
+
+def measure_memory(build) -> float:
+    tracemalloc.start()
+    products = build()
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return size / len(products)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--size", type=int, default=10_000)
+    args = parser.parse_args()
+
+    logging.disable(logging.CRITICAL)
+    extractor = Extractor()
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        xml_path = write_feed(os.path.join(tmp_dir, "feed.xml"), args.size)
+        raw_products = [
+            extractor._read_raw_product(product, xml_path)
+            for product in extractor._iter_product_elements(xml_path)
+        ]
+
+    mapper = extractor.field_mapper
+    timestamp = mapper.timestamp()
+    records = mapper.map_batch(raw_products, timestamp)
+    dicts = [record.to_dict() for record in records]
+
+    record_bytes = measure_memory(lambda: mapper.map_batch(raw_products, timestamp))
+    dict_bytes = measure_memory(
+        lambda: [
+            record.to_dict() for record in mapper.map_batch(raw_products, timestamp)
+        ]
+    )
+    print(f"memory per product :: dict={dict_bytes:.0f} B record={record_bytes:.0f} B")
+
+    for name, encode, products in (
+        ("document", encode_with_document, dicts),
+        ("record", lambda record: record.to_mongo(), records),
+    ):
+        start = time.process_time()
+        encoded = [encode(product) for product in products]
+        elapsed = time.process_time() - start
+        assert encoded == [record.to_mongo() for record in records]
+        print(f"encode {name}: {elapsed / len(products) * 1e6:.1f} µs CPU per product")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,139 @@
+"""
+Latency of GET /api/search (ProductReader.search_products on the weighted text index) against a case insensitive
+regex scan of the name, fabric and product info fields, both with the same color and product_type facets.
+It needs a running mongod and uses its own "lonca_benchmark" database
+
+Usage (from the repository root):
+    python -m benchmarks.bench_search_latency [--products 1000000] [--repeat 20] [--skip-seed]
+"""
+
+import argparse
+import logging
+import os
+import statistics
+import tempfile
+import time
+
+from app.configs.config import InternalConfig
+from app.database.mongo_odm import Product
+from app.logic._extractor import Extractor
+from app.logic._product_reader import LISTING_EXCLUDED_FIELDS, ProductReader
+from app.utils.iter_utils import chunked
+from benchmarks.synthetic_feed import write_feed
+
+from mongoengine import connect
+
+QUERIES = [
+    ("kruvaze", {}),
+    ("likralı", {}),
+    ("pamuklu", {}),
+    ("KISA KOLLU", {}),
+    ("büzgü", {"product_type": "T-shirt"}),
+    ("triko", {"color": "Siyah"}),
+]
+
+
+def seed(products: int) -> None:
+    # The products of a synthetic feed, inserted without the upserts of the extractor
+    Product.drop_collection()
+    Product.ensure_indexes()
+    collection = Product._get_collection()
+    extractor = Extractor()
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        xml_path = write_feed(os.path.join(tmp_dir, "feed.xml"), products)
+        for batch in chunked(extractor._iter_products_from_xml_file(xml_path), 10_000):
+            collection.insert_many([record.to_mongo() for record in batch])
+
+
+def regex_search(query: str, filters: dict, limit: int) -> dict:
+    # The previous way, every word is looked up with a case insensitive regex over the raw fields
+    match = {
+        "$and": [
+            {
+                "$or": [
+                    {field: {"$regex": word, "$options": "i"}}
+                    for field in ("name", "fabric", "product_info")
+                ]
+            }
+            for word in query.split()
+        ]
+    }
+    match.update(filters)
+    return next(
+        Product._get_collection().aggregate(
+            [
+                {"$match": match},
+                {"$project": {field: 0 for field in LISTING_EXCLUDED_FIELDS}},
+                {
+                    "$facet": {
+                        "items": [{"$limit": limit}],
+                        "total": [{"$count": "count"}],
+                        "color": [
+                            {"$unwind": "$color"},
+                            {"$group": {"_id": "$color", "count": {"$sum": 1}}},
+                        ],
+                        "product_type": [
+                            {"$group": {"_id": "$product_type", "count": {"$sum": 1}}}
+                        ],
+                    }
+                },
+            ]
+        )
+    )
+
+
+def measure(function, repeat: int) -> tuple:
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = function()
+        timings.append((time.perf_counter() - start) * 1000)
+    timings.sort()
+    return (
+        result,
+        statistics.median(timings),
+        timings[max(0, round(len(timings) * 0.95) - 1)],
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--products", type=int, default=1_000_000)
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--limit", type=int, default=ProductReader.DEFAULT_PAGE_SIZE)
+    parser.add_argument("--skip-seed", action="store_true")
+    args = parser.parse_args()
+
+    logging.disable(logging.CRITICAL)
+    connect(
+        db="lonca_benchmark",
+        host=f"mongodb://{InternalConfig.MONGO_HOST}:27017/lonca_benchmark",
+    )
+    if not args.skip_seed:
+        start = time.perf_counter()
+        seed(args.products)
+        print(f"seeded {args.products} products in {time.perf_counter() - start:.0f}s")
+
+    reader = ProductReader()
+
+    def text_search(query, filters):
+        # Measures the query, not the cache
+        reader.cache.clear()
+        return reader.search_products(query, limit=args.limit, **filters)
+
+    for query, filters in QUERIES:
+        results, text_p50, text_p95 = measure(
+            lambda: text_search(query, filters), args.repeat
+        )
+        _, regex_p50, regex_p95 = measure(
+            lambda: regex_search(query, filters, args.limit), args.repeat
+        )
+        print(
+            f"q={query!r} filters={filters} matches={results['total']} "
+            f"text p50={text_p50:.1f}ms p95={text_p95:.1f}ms "
+            f"regex p50={regex_p50:.1f}ms p95={regex_p95:.1f}ms"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+"""
+Compares peak memory and wall time of the streaming iterparse extraction against the full-tree ET.parse path
+
+Usage (from the repository root):
+    python -m benchmarks.bench_streaming_extraction [--sizes 10000 100000 1000000]
+"""
+
+import argparse
+import json
+import logging
+import os
+import resource
+import tempfile
+import time
+
+import xml.etree.ElementTree as ET
+
+from benchmarks.synthetic_feed import write_feed
+from benchmarks.worker_process import print_worker_result, worker_output
+
+
+def run_worker(mode: str, xml_path: str) -> dict:
+    from app.logic._extractor import Extractor
+    from app.utils.iter_utils import chunked
+
+    logging.disable(logging.CRITICAL)
+    extractor = Extractor()
+    start = time.perf_counter()
+    if mode == "tree":
+        # The previous implementation, whole tree and the whole products list in memory
+        root = ET.parse(xml_path).getroot()
+        products = [
+            extractor._build_product_dict(product, xml_path)
+            for product in root.findall("Product")
+        ]
+        count = len(products)
+    else:
+        count = 0
+        for chunk in chunked(extractor._iter_products_from_xml_file(xml_path), 1000):
+            count += len(chunk)
+    elapsed = time.perf_counter() - start
+    return {
+        "mode": mode,
+        "products": count,
+        "seconds": round(elapsed, 3),
+        "peak_rss_mb": round(
+            resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1
+        ),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "--sizes", nargs="+", type=int, default=[10_000, 100_000, 1_000_000]
+    )
+    parser.add_argument("--worker", nargs=2, metavar=("MODE", "XML_PATH"))
+    args = parser.parse_args()
+
+    if args.worker:
+        print_worker_result(run_worker(*args.worker))
+        return
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for size in args.sizes:
+            xml_path = write_feed(os.path.join(tmp_dir, f"feed-{size}.xml"), size)
+            for mode in ("tree", "streaming"):
+                result = worker_output(
+                    "benchmarks.bench_streaming_extraction", mode, xml_path
+                )
+                print(f"size={size} {json.dumps(result, sort_keys=True)}")
+            os.remove(xml_path)
+
+
+if __name__ == "__main__":
+    main()
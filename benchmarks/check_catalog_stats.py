@@ -0,0 +1,105 @@
+"""
+Check of the incremental catalog stats, the batches repeat some stock codes with another status, price and quantity
+like the feeds listing a product twice. After every write the incrementally kept summaries are compared with the ones
+rebuilt from the stored products, in every write mode.
+It needs a running mongod and uses its own "lonca_stats_check" database
+
+Usage (from the repository root):
+    python -m benchmarks.check_catalog_stats [--products 2000] [--batch-size 250] [--duplicates 0.05] [--seed 0]
+"""
+
+import argparse
+import json
+import logging
+import os
+import random
+import sys
+import tempfile
+
+from app.configs.config import InternalConfig
+from app.database.bulk_writer import BulkProductWriter
+from app.database.catalog_stats import CatalogStatsStore
+from app.database.mongo_odm import CatalogStats, Product
+from app.logic._extractor import Extractor
+from benchmarks.synthetic_feed import write_feed
+
+from mongoengine import connect
+
+STATUSES = ("Active", "Deactive")
+
+
+def with_duplicates(products: list, share: float, rng: random.Random) -> list:
+    # The copies land anywhere in the batch, before or after the product they repeat
+    products = list(products)
+    for product_doc in rng.sample(products, int(len(products) * share)):
+        duplicate = dict(product_doc)
+        duplicate["status"] = rng.choice(STATUSES)
+        duplicate["price"] = round(product_doc["price"] * rng.uniform(0.5, 2), 2)
+        duplicate["quantity"] = rng.randint(0, 50)
+        products.insert(rng.randrange(len(products) + 1), duplicate)
+    return products
+
+
+def changed(products: list, share: float, rng: random.Random) -> list:
+    products = [dict(product_doc) for product_doc in products]
+    for product_doc in rng.sample(products, int(len(products) * share)):
+        product_doc["status"] = rng.choice(STATUSES)
+        product_doc["price"] = round(product_doc["price"] * rng.uniform(0.5, 2), 2)
+    return products
+
+
+def summary_json(store: CatalogStatsStore) -> str:
+    # The $inc of the incremental stats keep the integer zeros that $sum of the rebuild returns as floats
+    summary = json.loads(json.dumps(store.summary(), default=str), parse_int=float)
+    return json.dumps(summary, sort_keys=True)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--products", type=int, default=2_000)
+    parser.add_argument("--batch-size", type=int, default=250)
+    parser.add_argument("--duplicates", type=float, default=0.05)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    logging.disable(logging.CRITICAL)
+    connect(host=InternalConfig.MONGO_URI.rsplit("/", 1)[0] + "/lonca_stats_check")
+    rng = random.Random(args.seed)
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        xml_path = write_feed(
+            os.path.join(tmp_dir, "feed.xml"), args.products, args.seed
+        )
+        products = Extractor()._extract_data_from_xml_file(xml_path)
+
+    failures = 0
+    for mode in BulkProductWriter.MODES:
+        Product.drop_collection()
+        CatalogStats.drop_collection()
+        store = CatalogStatsStore()
+        writer = BulkProductWriter(mode, args.batch_size, catalog_stats=store)
+        changed_products = changed(products, 0.2, rng)
+        rounds = (
+            ("first ingestion", products),
+            ("changed products", changed_products),
+            ("changed products again", changed_products),
+        )
+        for name, round_products in rounds:
+            writer.write(
+                with_duplicates(round_products, args.duplicates, rng), xml_path
+            )
+            incremental = summary_json(store)
+            store.rebuild()
+            exact = incremental == summary_json(store)
+            failures += not exact
+            print(
+                f"mode={mode} {name} :: "
+                + ("exact" if exact else "the incremental stats differ")
+            )
+
+    Product.drop_collection()
+    CatalogStats.drop_collection()
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+"""
+Check of the listing indexes, every filter shape of GET /api/products is explained on a synthetic catalog and the
+check fails when the winning plan sorts the matches in memory instead of reading them in _id order from an index.
+It needs a running mongod and uses its own "lonca_index_check" database
+
+Usage (from the repository root):
+    python -m benchmarks.check_listing_indexes [--products 20000] [--seed 0]
+"""
+
+import argparse
+import itertools
+import logging
+import os
+import sys
+import tempfile
+
+from app.configs.config import InternalConfig
+from app.database.mongo_odm import Product
+from app.logic._extractor import Extractor
+from benchmarks.synthetic_feed import write_feed
+
+from mongoengine import connect
+
+# The filter groups of ProductReader.list_products, the price range is a single group
+FILTER_GROUPS = ("product_type", "status", "is_discounted", "series", "color", "price")
+
+
+def find_stages(plan, stage: str) -> list:
+    if isinstance(plan, list):
+        return [found for child in plan for found in find_stages(child, stage)]
+    if not isinstance(plan, dict):
+        return []
+    found = [plan] if plan.get("stage") == stage else []
+    return found + [
+        found_child
+        for value in plan.values()
+        for found_child in find_stages(value, stage)
+    ]
+
+
+def listing_filters(groups: tuple, product_doc: dict) -> dict:
+    # The same query as ProductReader.list_products, with the values of an existing product so every shape matches
+    filters = {}
+    for group in groups:
+        if group == "price":
+            filters["price__gte"] = float(product_doc["price"]) / 2
+            filters["price__lte"] = float(product_doc["price"]) * 2
+        elif group == "color":
+            filters["color"] = product_doc["color"][0]
+        else:
+            filters[group] = product_doc[group]
+    return filters
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--products", type=int, default=20_000)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    logging.disable(logging.CRITICAL)
+    connect(host=InternalConfig.MONGO_URI.rsplit("/", 1)[0] + "/lonca_index_check")
+    Product.drop_collection()
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        xml_path = write_feed(
+            os.path.join(tmp_dir, "feed.xml"), args.products, args.seed
+        )
+        Extractor(write_mode="insert_new").extract_changed_files([xml_path])
+    Product.ensure_indexes()
+    product_doc = Product.objects.order_by("id").first().to_mongo().to_dict()
+
+    failures = 0
+    for size in range(len(FILTER_GROUPS) + 1):
+        for groups in itertools.combinations(FILTER_GROUPS, size):
+            filters = listing_filters(groups, product_doc)
+            # The first page and a page after a cursor
+            for cursor in (None, product_doc["_id"]):
+                if cursor is not None:
+                    filters["id__gt"] = cursor
+                explain = Product.objects(**filters).order_by("id").limit(50).explain()
+                winning_plan = explain["queryPlanner"]["winningPlan"]
+                sorted_in_memory = bool(find_stages(winning_plan, "SORT"))
+                failures += sorted_in_memory
+                index_names = [
+                    stage.get("indexName")
+                    for stage in find_stages(winning_plan, "IXSCAN")
+                ]
+                print(
+                    f"{' + '.join(groups) or 'no filters'}{' after a cursor' if cursor else ''} :: "
+                    f"{', '.join(index_names) or 'collection scan'} "
+                    + ("SORT" if sorted_in_memory else "ok")
+                )
+
+    Product.drop_collection()
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,206 @@
+"""
+Crash and resume check of the checkpointed ingestion. Every run kills the ingestion worker with SIGKILL at a random
+batch, either between the products of the batch and their catalog stats, right after the batch is written or right
+after its checkpoint is saved, restarts it and compares the products and the catalog stats with an ingestion that wasn't interrupted.
+It needs a running mongod and uses its own "lonca_resume_check" and "lonca_resume_reference" databases
+
+Usage (from the repository root):
+    python -m benchmarks.check_resumable_ingestion [--products 20000] [--batch-size 1000] [--runs 5] [--seed 0]
+"""
+
+import argparse
+import logging
+import math
+import os
+import random
+import signal
+import sys
+import tempfile
+
+from benchmarks.synthetic_feed import write_feed
+from benchmarks.worker_process import call_worker, print_worker_result, worker_output
+
+# The module the workers run
+MODULE = "benchmarks.check_resumable_ingestion"
+WRITE_MODES = ("insert_new", "update_changed", "delta")
+CRASH_PHASES = ("stats", "write", "checkpoint")
+# The fields set from the clock, they differ between two ingestions of the same feed
+VOLATILE_FIELDS = ("_id", "createdAt", "updatedAt")
+
+
+def install_crash(extractor, batch: int, phase: str) -> None:
+    # The process is killed without running any cleanup, like an OOM kill or a power loss
+    calls = {"count": 0}
+
+    def crash_after(function):
+        def wrapper(*args, **kwargs):
+            result = function(*args, **kwargs)
+            calls["count"] += 1
+            if calls["count"] == batch:
+                os.kill(os.getpid(), signal.SIGKILL)
+            return result
+
+        return wrapper
+
+    def crash_before(function):
+        def wrapper(*args, **kwargs):
+            calls["count"] += 1
+            if calls["count"] == batch:
+                os.kill(os.getpid(), signal.SIGKILL)
+            return function(*args, **kwargs)
+
+        return wrapper
+
+    if phase == "stats":
+        # The products of the batch are committed, their deltas aren't
+        extractor.catalog_stats.apply = crash_before(extractor.catalog_stats.apply)
+    elif phase == "write":
+        extractor.writer.write_batch = crash_after(extractor.writer.write_batch)
+    else:
+        extractor.checkpoints.save = crash_after(extractor.checkpoints.save)
+
+
+def run_worker(
+    action: str, database: str, xml_path: str, mode: str, batch_size: int, crash: str
+) -> dict:
+    from app.configs.config import InternalConfig
+    from app.database.mongo_odm import (
+        CatalogStats,
+        IngestionCheckpoint,
+        IngestionManifest,
+        Product,
+    )
+    from app.logic._extractor import Extractor
+
+    from mongoengine import connect
+
+    logging.disable(logging.CRITICAL)
+    InternalConfig.EXTRACTION_CHUNK_SIZE = batch_size
+    InternalConfig.EXTRACTION_WORKERS = 1
+    connect(host=InternalConfig.MONGO_URI.rsplit("/", 1)[0] + f"/{database}")
+    documents = (Product, CatalogStats, IngestionCheckpoint, IngestionManifest)
+
+    if action == "drop":
+        for document in documents:
+            document.drop_collection()
+        return {}
+    if action == "ingest":
+        extractor = Extractor(write_mode=mode)
+        if crash != "-":
+            crash_batch, phase = crash.split(":")
+            install_crash(extractor, int(crash_batch), phase)
+        return extractor.extract_changed_files([xml_path])[0]
+
+    def dump(document, key_fields):
+        docs = [
+            {key: value for key, value in doc.items() if key not in VOLATILE_FIELDS}
+            for doc in document._get_collection().find()
+        ]
+        return sorted(docs, key=lambda doc: [str(doc.get(key)) for key in key_fields])
+
+    return {
+        "products": dump(Product, ("stock_code",)),
+        "catalog_stats": dump(CatalogStats, ("product_type", "series", "status")),
+        "checkpoints": IngestionCheckpoint.objects.count(),
+        "manifest": IngestionManifest.objects.count(),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--products", type=int, default=20_000)
+    parser.add_argument("--batch-size", type=int, default=1_000)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--write-mode", choices=WRITE_MODES)
+    parser.add_argument(
+        "--worker",
+        nargs=6,
+        metavar=("ACTION", "DATABASE", "XML_PATH", "MODE", "BATCH_SIZE", "CRASH"),
+    )
+    args = parser.parse_args()
+
+    if args.worker:
+        action, database, xml_path, mode, batch_size, crash = args.worker
+        result = run_worker(action, database, xml_path, mode, int(batch_size), crash)
+        print_worker_result(result)
+        return
+
+    rng = random.Random(args.seed)
+    batches = math.ceil(args.products / args.batch_size)
+    references = {}
+    failures = 0
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        xml_path = write_feed(
+            os.path.join(tmp_dir, "feed.xml"), args.products, args.seed
+        )
+        # The arguments of the drop and dump actions after the database
+        common = (xml_path, "-", args.batch_size, "-")
+        for run in range(1, args.runs + 1):
+            mode = args.write_mode or rng.choice(WRITE_MODES)
+            crash_batch = rng.randint(1, batches)
+            phase = rng.choice(CRASH_PHASES)
+            if mode not in references:
+                worker_output(MODULE, "drop", "lonca_resume_reference", *common)
+                worker_output(
+                    MODULE,
+                    "ingest",
+                    "lonca_resume_reference",
+                    xml_path,
+                    mode,
+                    args.batch_size,
+                    "-",
+                )
+                references[mode] = worker_output(
+                    MODULE, "dump", "lonca_resume_reference", *common
+                )
+
+            worker_output(MODULE, "drop", "lonca_resume_check", *common)
+            crashed = call_worker(
+                MODULE,
+                "ingest",
+                "lonca_resume_check",
+                xml_path,
+                mode,
+                args.batch_size,
+                f"{crash_batch}:{phase}",
+            )
+            report = worker_output(
+                MODULE,
+                "ingest",
+                "lonca_resume_check",
+                xml_path,
+                mode,
+                args.batch_size,
+                "-",
+            )
+            state = worker_output(MODULE, "dump", "lonca_resume_check", *common)
+
+            problems = []
+            if crashed.returncode != -signal.SIGKILL:
+                problems.append(f"the worker wasn't killed ({crashed.returncode})")
+            for key in ("products", "catalog_stats"):
+                if state[key] != references[mode][key]:
+                    problems.append(f"the {key} differ from the reference")
+            if state["checkpoints"] or state["manifest"] != 1:
+                problems.append(
+                    f"{state['checkpoints']} checkpoints and {state['manifest']} manifest entries are left"
+                )
+            if report["resumed"] + report["products"] != args.products:
+                problems.append(
+                    f"{report['resumed']} resumed and {report['products']} ingested products"
+                )
+            failures += bool(problems)
+            print(
+                f"run {run} mode={mode} killed after the {phase} of batch {crash_batch}/{batches} :: "
+                f"resumed={report['resumed']} ingested={report['products']} "
+                + ("; ".join(problems) if problems else "exact")
+            )
+
+        worker_output(MODULE, "drop", "lonca_resume_check", *common)
+        worker_output(MODULE, "drop", "lonca_resume_reference", *common)
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
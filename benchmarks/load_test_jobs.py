@@ -0,0 +1,89 @@
+"""
+Load test of the extraction jobs, it measures the latency of a cheap endpoint while several large extractions run.
+Start the service first (python main.py), the feeds are uploaded through the API
+
+Usage (from the repository root):
+    python -m benchmarks.load_test_jobs [--base-url http://localhost:8000] [--jobs 4] [--products 100000]
+"""
+
+import argparse
+import os
+import statistics
+import tempfile
+import threading
+import time
+
+import requests
+
+from benchmarks.synthetic_feed import write_feed
+
+
+def percentile(latencies: list, percent: float) -> float:
+    latencies = sorted(latencies)
+    return latencies[min(len(latencies) - 1, int(len(latencies) * percent / 100))]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--base-url", default="http://localhost:8000")
+    parser.add_argument("--jobs", type=int, default=4)
+    parser.add_argument("--products", type=int, default=100_000)
+    args = parser.parse_args()
+    api_url = f"{args.base_url}/api"
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        file_names = []
+        for index in range(args.jobs):
+            xml_path = write_feed(
+                os.path.join(tmp_dir, f"load-test-{index}.xml"), args.products, index
+            )
+            with open(xml_path, "rb") as feed:
+                response = requests.post(
+                    f"{api_url}/upload_xml_file", files={"file": feed}
+                )
+            response.raise_for_status()
+            file_names.append(response.json()["filename"])
+
+    job_ids = []
+    for file_name in file_names:
+        response = requests.post(f"{api_url}/jobs", params={"file_name": file_name})
+        response.raise_for_status()
+        job_ids.append(response.json()["job_id"])
+
+    done = threading.Event()
+    latencies = []
+
+    def probe():
+        # A cheap endpoint, it should stay fast while the extractions run
+        with requests.Session() as session:
+            while not done.is_set():
+                start = time.perf_counter()
+                session.get(f"{api_url}/jobs/{job_ids[0]}").raise_for_status()
+                latencies.append(time.perf_counter() - start)
+                time.sleep(0.01)
+
+    probe_thread = threading.Thread(target=probe)
+    probe_thread.start()
+    start = time.perf_counter()
+    while True:
+        states = [
+            requests.get(f"{api_url}/jobs/{job_id}").json()["state"]
+            for job_id in job_ids
+        ]
+        if all(state in ("succeeded", "failed") for state in states):
+            break
+        time.sleep(1)
+    done.set()
+    probe_thread.join()
+
+    print(
+        f"{args.jobs} jobs finished in {time.perf_counter() - start:.1f}s :: {states}"
+    )
+    print(
+        f"probe requests={len(latencies)} p50={statistics.median(latencies) * 1000:.1f}ms "
+        f"p99={percentile(latencies, 99) * 1000:.1f}ms max={max(latencies) * 1000:.1f}ms"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+"""
+In-memory stand-in for the mongo collections of the ingestion, it implements the find and bulk_write calls of
+BulkProductWriter, CatalogStatsStore and ProductVersionStore and counts them so the ingestion benchmarks can run without a mongod
+"""
+
+from collections import Counter
+from types import SimpleNamespace
+from typing import Iterator, List
+
+from app.database.mongo_odm import CatalogStats, Product, ProductVersion
+
+
+def _matches(document: dict, filter: dict) -> bool:
+    for key, value in filter.items():
+        if isinstance(value, dict) and "$in" in value:
+            if document.get(key) not in value["$in"]:
+                return False
+        elif document.get(key) != value:
+            return False
+    return True
+
+
+class CountingCollection:
+    def __init__(self):
+        # The documents by the filter of their upsert, e.g. the stock_code of the products
+        self.documents = {}
+        self.round_trips = Counter()
+
+    def find(self, filter: dict, projection: dict = None) -> Iterator[dict]:
+        self.round_trips["find"] += 1
+        fields = [field for field, value in (projection or {}).items() if value]
+        for document in list(self.documents.values()):
+            if _matches(document, filter):
+                yield (
+                    {field: document[field] for field in fields if field in document}
+                    if fields
+                    else dict(document)
+                )
+
+    def bulk_write(self, operations: List, ordered: bool = True) -> SimpleNamespace:
+        self.round_trips["bulk_write"] += 1
+        result = SimpleNamespace(
+            upserted_count=0, matched_count=0, modified_count=0, upserted_ids={}
+        )
+        for index, operation in enumerate(operations):
+            # pymongo.UpdateOne keeps its arguments in private attributes
+            key = tuple(sorted(operation._filter.items()))
+            update = operation._doc
+            document = self.documents.get(key)
+            if document is None:
+                if not operation._upsert:
+                    continue
+                document = self.documents[key] = dict(operation._filter, _id=index)
+                document.update(update.get("$setOnInsert", {}))
+                result.upserted_count += 1
+                result.upserted_ids[index] = index
+            else:
+                result.matched_count += 1
+            before = dict(document)
+            document.update(update.get("$set", {}))
+            for field, amount in update.get("$inc", {}).items():
+                document[field] = document.get(field, 0) + amount
+            for field, value in update.get("$min", {}).items():
+                document[field] = min(document.get(field, value), value)
+            for field, value in update.get("$max", {}).items():
+                document[field] = max(document.get(field, value), value)
+            for field in update.get("$unset", {}):
+                document.pop(field, None)
+            if index not in result.upserted_ids and document != before:
+                result.modified_count += 1
+        return result
+
+    def find_one_and_update(
+        self, filter: dict, update: dict, upsert: bool = False, **kwargs
+    ) -> dict:
+        # Returns the document after the update, like ReturnDocument.AFTER
+        self.round_trips["update"] += 1
+        key = tuple(sorted(filter.items()))
+        document = self.documents.get(key)
+        if document is None:
+            if not upsert:
+                return None
+            document = self.documents[key] = dict(filter)
+        for field, amount in update.get("$inc", {}).items():
+            document[field] = document.get(field, 0) + amount
+        return dict(document)
+
+
+def install_counting_collections() -> dict:
+    """
+    This function makes the Product, CatalogStats and ProductVersion documents use new CountingCollections instead of
+    the mongo connection
+
+    Returns:
+        - collections : dict (document name to CountingCollection)
+    """
+    collections = {}
+    for document in (Product, CatalogStats, ProductVersion):
+        document._collection = collections[document.__name__] = CountingCollection()
+    return collections
@@ -0,0 +1,185 @@
+"""
+Synthetic Lonca-style XML feed generator used by the benchmarks.
+The feeds look like assets/lonca-sample.xml: Turkish names and descriptions in CDATA blocks, one model in several
+colors, optional details and description items left out, and the <Description> sometimes written before
+<ProductDetails> like the product 62156-02. A share of the products can have incomplete details, their optional details
+are left out or written with an empty value. Price, DiscountedPrice and Quantity are always written, the Product
+schema rejects the products without them
+"""
+
+import random
+from xml.sax.saxutils import quoteattr
+
+NAMES = [
+    "NAKIŞLI ELBİSE",
+    "Büzgü Kollu T-shirt",
+    "Kruvaze Ceket",
+    "Likralı Bluz",
+    "Düğmeli Hırka",
+    "Yüksek Bel Pantolon",
+    "Çizgili Gömlek & Yelek",
+    "Örme Kazak",
+]
+PRODUCT_TYPES = {
+    "NAKIŞLI ELBİSE": "Elbise",
+    "Büzgü Kollu T-shirt": "T-shirt",
+    "Kruvaze Ceket": "Ceket",
+    "Likralı Bluz": "Bluz",
+    "Düğmeli Hırka": "Hırka",
+    "Yüksek Bel Pantolon": "Pantolon",
+    "Çizgili Gömlek & Yelek": "Gömlek",
+    "Örme Kazak": "Kazak",
+}
+COLORS = [
+    "Turuncu",
+    "Sarı",
+    "Ekru",
+    "Vizon",
+    "Siyah",
+    "Kahverengi",
+    "Yeşil",
+    "Gül Kurusu",
+]
+SERIES = ["1S-1M-2L-1XL", "1S-1M-1L-1XL", "1M-1L-1XL", "2S-2M-2L", "STD"]
+SEASONS = ["2023 Kış", "2023 Yaz", "2024 İlkbahar", "2024 Sonbahar"]
+PRODUCT_INFOS = [
+    "Kruvaze yaka, uzun kollu, düşük omuzlu, astarlı, crop boy, tam kalıp, düz kesim, blazer ceket",
+    "v yaka, kısa kollu, pamuklu, terletmez, iç göstermez, parlak kumaş, standart boy, düz kesim",
+    "Yuvarlak yaka, ince askılı, yanı büzgülü, bağcık detaylı, terletmez, likralı kumaş, dar kalıp",
+    "Polo yaka, düğmeli, göğüs ve sırt dekolteli, likralı, triko kumaş, crop boy, dar kesim, bluz",
+    "Balıkçı yaka, yumuşak dokulu, şardonlu, oversize kalıp, uzun boy",
+]
+FABRICS = [
+    "%90 Polyester %10 Likra",
+    "%100 Pamuklu",
+    "Triko",
+    "%95 Viskon %5 Elastan",
+    "",
+]
+# The key variants of the supplier descriptions, e.g. "Ürün Ölçüleri1" and the trailing space of 27356-02
+INFO_KEYS = ["Ürün Bilgisi:", "Ürün Bilgisi: "]
+PRODUCT_MEASUREMENT_KEYS = ["Ürün Ölçüleri:", "Ürün Ölçüleri1:"]
+OPTIONAL_DETAILS = ("ProductType", "Color", "Series", "Season")
+
+
+def _description(rng: random.Random) -> str:
+    items = [
+        f"<li><strong>{rng.choice(INFO_KEYS)}</strong>{rng.choice(PRODUCT_INFOS)}</li>",
+        f"<li><strong>Kumaş Bilgisi:</strong> {rng.choice(FABRICS)}</li>",
+    ]
+    if rng.random() < 0.7:
+        items.append(
+            f"<li><strong>{rng.choice(PRODUCT_MEASUREMENT_KEYS)}</strong>&nbsp;Boy: {rng.randint(40, 120)} cm "
+            f"Kol: {rng.randint(20, 65)} cm</li>"
+        )
+    items.append(
+        f"<li><strong>Model Ölçüleri:</strong> Boy: 1.{rng.randint(65, 80)}, Göğüs: {rng.randint(80, 92)}, "
+        f"Bel: {rng.randint(60, 70)}, Kalça: {rng.randint(86, 96)}</li>"
+    )
+    if rng.random() < 0.8:
+        items.append(
+            f"<li>Modelin üzerindeki ürün <strong>{rng.choice(['S/36', 'M/38', 'STD'])}</strong>&nbsp;bedendir.</li>"
+        )
+    if rng.random() < 0.5:
+        items.append("<li>Bedenler arası +/- 2cm fark olmaktadır.</li>")
+    return (
+        "    <Description>\n<![CDATA[<ul>"
+        + "".join(items)
+        + "</ul>]]>\n</Description>\n"
+    )
+
+
+def _incomplete_details(rng: random.Random, details: dict) -> dict:
+    # Every optional detail is either missing or empty, e.g. <ProductDetail Name="Color" Value=""/>
+    incomplete = {}
+    for detail_name, value in details.items():
+        if detail_name not in OPTIONAL_DETAILS:
+            incomplete[detail_name] = value
+        elif rng.random() < 0.5:
+            incomplete[detail_name] = ""
+    return incomplete
+
+
+def _product(
+    rng: random.Random,
+    model: int,
+    variant: int,
+    name: str,
+    incomplete_details: float = 0.0,
+) -> str:
+    color = rng.choice(COLORS)
+    image_slug = f"{model}-{color.lower().replace(' ', '-')}"
+    images = "".join(
+        f'        <Image Path="www.aday-butik-resim-sitesi/{image_slug}-{index}.jpeg"></Image>\n'
+        for index in range(1, rng.randint(1, 4) + 1)
+    )
+    price = rng.randint(100, 999)
+    discounted_price = rng.choice([price, price // 2, 0])
+    details = {
+        "Price": f"{price // 100},{price % 100:02d}",
+        "DiscountedPrice": (
+            f"{discounted_price // 100},{discounted_price % 100:02d}"
+            if discounted_price
+            else "0"
+        ),
+        "ProductType": PRODUCT_TYPES[name],
+        "Quantity": rng.choice([0, 0, rng.randint(1, 20)]),
+        "Color": color,
+        "Series": rng.choice(SERIES),
+        "Season": rng.choice(SEASONS),
+    }
+    if incomplete_details and rng.random() < incomplete_details:
+        details = _incomplete_details(rng, details)
+    product_details = "".join(
+        f"    <ProductDetail Name={quoteattr(detail_name)} Value={quoteattr(str(value))}/>\n"
+        for detail_name, value in details.items()
+        if detail_name not in OPTIONAL_DETAILS or rng.random() >= 0.1
+    )
+    sections = [
+        f"   <Images>\n{images}    </Images>\n",
+        f"    <ProductDetails>\n{product_details}    </ProductDetails>\n",
+    ]
+    if rng.random() < 0.95:
+        sections.append(_description(rng))
+        if rng.random() < 0.1:
+            # Description before ProductDetails
+            sections[1], sections[2] = sections[2], sections[1]
+    return (
+        f'  <Product ProductId="{model}-{variant:02d}" Name={quoteattr(name)}>\n'
+        + "".join(sections)
+        + "  </Product>\n"
+    )
+
+
+def write_feed(
+    path: str, product_count: int, seed: int = 0, incomplete_details: float = 0.0
+) -> str:
+    """
+    This function writes a feed with the given number of products to path, the output is deterministic for a seed.
+    The products are written one at a time so feeds of millions of products can be generated
+
+    Args:
+        - path : str
+        - product_count : int
+        - seed : int
+        - incomplete_details : float (share of the products without their optional details or with empty values,
+          the feeds of the previous versions are written with 0)
+
+    Returns:
+        - path : str
+    """
+    rng = random.Random(seed)
+    with open(path, "w", encoding="utf-8") as feed:
+        feed.write('<?xml version="1.0"?>\n<Products>\n')
+        model, written = 10000, 0
+        while written < product_count:
+            # Every model comes in one to four colors with the stock codes <model>-01, <model>-02, ...
+            name = rng.choice(NAMES)
+            for variant in range(
+                1, min(rng.randint(1, 4), product_count - written) + 1
+            ):
+                feed.write(_product(rng, model, variant, name, incomplete_details))
+                written += 1
+            model += 1
+        feed.write("</Products>\n")
+    return path
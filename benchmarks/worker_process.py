@@ -0,0 +1,55 @@
+"""
+The fresh interpreter runs of the benchmarks. A benchmark module runs itself with --worker and the arguments of the run,
+the worker prints its result as JSON on stdout and its logs go to stderr. Every run gets its own interpreter so the peak
+RSS values and the logging handlers of the runs don't mix, and the workers import the app so the parent process doesn't
+pay for the app imports
+"""
+
+import json
+import subprocess
+import sys
+
+
+def call_worker(
+    module: str, *args, env: dict = None, stderr=subprocess.PIPE
+) -> subprocess.CompletedProcess:
+    """
+    This function runs the module with --worker and the given arguments in a fresh interpreter
+
+    Args:
+        - module : str (e.g. "benchmarks.bench_ingestion_suite")
+        - args : the arguments of the worker, converted to str
+        - env : dict (optional, the environment of the worker)
+        - stderr : (optional, subprocess.DEVNULL drops the logs of the worker)
+
+    Returns:
+        - completed : subprocess.CompletedProcess (the returncode, the stdout and the stderr of the worker)
+    """
+    return subprocess.run(
+        [sys.executable, "-m", module, "--worker"] + [str(arg) for arg in args],
+        env=env,
+        stdout=subprocess.PIPE,
+        stderr=stderr,
+        text=True,
+    )
+
+
+def worker_output(module: str, *args, env: dict = None, stderr=subprocess.PIPE) -> dict:
+    """
+    This function runs the worker like call_worker and returns its result
+
+    Returns:
+        - result : dict (the JSON the worker printed)
+
+    Raises:
+        - RuntimeError when the worker failed
+    """
+    completed = call_worker(module, *args, env=env, stderr=stderr)
+    if completed.returncode != 0:
+        raise RuntimeError(f"worker {module} {args} failed :: {completed.stderr}")
+    return json.loads(completed.stdout)
+
+
+def print_worker_result(result: dict) -> None:
+    # The stdout of the worker is the result
+    print(json.dumps(result, default=str, sort_keys=True))
@@ -1,24 +1,39 @@
-from app.configs.config import InternalConfig
-from app.configs.config import InternalConfig, configure_logging
+from contextlib import asynccontextmanager
 
-from fastapi import FastAPI
-from app.routers.api import router
-from mongoengine import connect
+from app.configs.config import configure_logging
+from app.database.mongo_connection import connect_mongo, disconnect_mongo
 
-app = FastAPI()
+from fastapi import FastAPI, Response
+from app.routers.api import directory_watcher, router
+from app.utils.metrics_utils import metrics
+from starlette.concurrency import run_in_threadpool
 
-# MongoDB connection settings
-MONGO_URI = f"mongodb://{InternalConfig.MONGO_HOST}:27017/test"
 
-# Create MongoDB instance
-connect(host=MONGO_URI)
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Nothing is initialized at import, the workers start fast and the imports don't need a database
+    configure_logging()
+    connect_mongo()
+    # Reconciles the assets directory on startup and ingests the new and modified feeds as they arrive
+    directory_watcher.start()
+    yield
+    await run_in_threadpool(directory_watcher.stop)
+    disconnect_mongo()
+
+
+app = FastAPI(lifespan=lifespan)
 
 # Include router
 app.include_router(router, prefix="/api", tags=["api"])
 
 
+@app.get("/metrics", include_in_schema=False)
+async def get_metrics():
+    # Prometheus text exposition format
+    return Response(content=metrics.render(), media_type=metrics.CONTENT_TYPE)
+
+
 if __name__ == "__main__":
     import uvicorn
 
-    configure_logging()
     uvicorn.run(app, host="0.0.0.0", port=8000)
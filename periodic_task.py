@@ -1,25 +1,22 @@
-import schedule
-import time
 import logging
 
+from app.logic._directory_watcher import DirectoryWatcher
 from app.logic._extractor import Extractor
-from app.configs.config import InternalConfig, configure_logging
-
-from mongoengine import connect
+from app.configs.config import configure_logging
+from app.database.mongo_connection import connect_mongo
 
 logger = logging.getLogger(__name__)
 
-MONGO_URI = f"mongodb://{InternalConfig.MONGO_HOST}:27017/test"
-
-# Create MongoDB instance
-connect(host=MONGO_URI)
-
 
 if __name__ == "__main__":
     configure_logging()
+    connect_mongo()
     logger.info("Initializing the extractor...")
     xml_extractor = Extractor()
-    logger.info("Initializing the periodic XML extraction...")
-    schedule.every(60).minutes.do(xml_extractor.extract_periodically)
-    while True:
-        schedule.run_pending()
+    logger.info("Initializing the XML directory watcher...")
+    watcher = DirectoryWatcher(xml_extractor)
+    try:
+        # Reconciles the directory with the ingestion manifest, then ingests the changed files as they arrive
+        watcher.run()
+    except KeyboardInterrupt:
+        logger.info("Stopping the XML directory watcher...")
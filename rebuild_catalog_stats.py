@@ -0,0 +1,15 @@
+import logging
+
+from app.database.catalog_stats import CatalogStatsStore
+from app.configs.config import configure_logging
+from app.database.mongo_connection import connect_mongo
+
+logger = logging.getLogger(__name__)
+
+
+if __name__ == "__main__":
+    configure_logging()
+    connect_mongo()
+    logger.info("Rebuilding the catalog stats from the products...")
+    # Recomputes every summary from scratch, run it while no ingestion is running
+    CatalogStatsStore().rebuild()
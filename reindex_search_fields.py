@@ -0,0 +1,23 @@
+import logging
+import os
+
+from app.configs.config import InternalConfig, configure_logging
+from app.database.mongo_connection import connect_mongo
+from app.logic._extractor import Extractor
+from app.logic._feed_readers import is_feed_file
+
+logger = logging.getLogger(__name__)
+
+
+if __name__ == "__main__":
+    configure_logging()
+    connect_mongo()
+    logger.info("Backfilling the search fields of the products...")
+    # Fills product_info and the search fields of the products ingested before GET /api/search existed
+    Extractor().backfill_search_fields(
+        [
+            os.path.join(InternalConfig.ASSETS_DIR_PATH, file_name)
+            for file_name in sorted(os.listdir(InternalConfig.ASSETS_DIR_PATH))
+            if is_feed_file(file_name)
+        ]
+    )